@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+#
+# Cross Platform and Multi Architecture Advanced Binary Emulation Framework
+# Built on top of Unicorn emulator (www.unicorn-engine.org)
+#
+# LAU kaijern (xwings) <kj@qiling.io>
+# NGUYEN Anh Quynh <aquynh@gmail.com>
+# DING tianZe (D1iv3) <dddliv3@gmail.com>
+# SUN bowen (w1tcher) <w1tcher.bupt@gmail.com>
+# CHEN huitao (null) <null@qiling.io>
+# YU tong (sp1ke) <spikeinhouse@gmail.com>
+
+"""
+Benchmarks of the examples/rootfs binaries and the test shellcodes, for every
+arch and os pair: instructions, syscalls and WinAPI calls per second, loader
+time and peak RSS. Run with
+
+    python -m benchmarks -o results.json
+    python -m benchmarks -o new.json --compare results.json
+"""
+
+from .targets import *
+from .measure import *
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+#
+# Cross Platform and Multi Architecture Advanced Binary Emulation Framework
+# Built on top of Unicorn emulator (www.unicorn-engine.org)
+#
+# LAU kaijern (xwings) <kj@qiling.io>
+# NGUYEN Anh Quynh <aquynh@gmail.com>
+# DING tianZe (D1iv3) <dddliv3@gmail.com>
+# SUN bowen (w1tcher) <w1tcher.bupt@gmail.com>
+# CHEN huitao (null) <null@qiling.io>
+# YU tong (sp1ke) <spikeinhouse@gmail.com>
+
+import argparse, json, platform, sys, time
+
+from qiling.core import __version__
+from .targets import *
+from .measure import *
+
+
+def print_result(name, result):
+    if result["status"] != "ok":
+        print("%-30s %s %s" % (name, result["status"], result.get("error", "")))
+    else:
+        print("%-30s %12.0f insn/s %9.0f syscall/s %9.0f winapi/s  load %7.3fs  run %7.3fs  rss %7d KB" % (name,
+              result["instructions_per_sec"], result["syscalls_per_sec"], result["winapi_per_sec"],
+              result["load_time"], result["run_time"], result["peak_rss_kb"]))
+
+
+# import time, instructions per second and load time against an earlier results file
+def print_compare(import_result, results, baseline):
+    print("\n%-30s %10s %10s" % ("compared to baseline", "insn/s", "load"))
+    if "qiling_seconds" in baseline.get("import", {}):
+        print("%-30s %10s %9.2fx" % ("import qiling", "", baseline["import"]["qiling_seconds"] / import_result["qiling_seconds"]))
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if result["status"] != "ok" or old == None or old["status"] != "ok":
+            continue
+        print("%-30s %9.2fx %9.2fx" % (name, result["instructions_per_sec"] / old["instructions_per_sec"],
+              old["load_time"] / result["load_time"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog = "python -m benchmarks")
+    parser.add_argument('-o', '--output', required=False, metavar="FILE", help='write the results as json to FILE')
+    parser.add_argument('-k', '--filter', required=False, action='append', default=[], help='only targets whose name contains FILTER')
+    parser.add_argument('--repeat', required=False, type=int, default=3, help='timed runs of each target, the fastest counts')
+    parser.add_argument('--timeout', required=False, type=float, default=300, help='seconds before a target is killed')
+    parser.add_argument('--compare', required=False, metavar="FILE", help='json results of an earlier run to compare to')
+    options = parser.parse_args()
+
+    targets = dict((name, kwargs) for name, kwargs in QL_BENCH_TARGETS.items()
+                   if not options.filter or any(f in name for f in options.filter))
+
+    import_result = ql_bench_import(options.repeat)
+    print("%-30s %7.3fs  unicorn %7.3fs  qiling %7.3fs  %s" % ("import qiling", import_result["seconds"],
+          import_result["unicorn_seconds"], import_result["qiling_seconds"],
+          " ".join(import_result["modules"]) or "without capstone and keystone"))
+
+    results = ql_bench_run(targets, options.repeat, options.timeout, print_result)
+
+    if options.compare:
+        with open(options.compare) as f:
+            print_compare(import_result, results, json.load(f))
+
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump({"version": __version__, "python": sys.version.split()[0], "machine": platform.machine(),
+                       "date": time.strftime("%Y-%m-%d %H:%M:%S"), "repeat": options.repeat, "import": import_result, "results": results},
+                      f, indent = 2, sort_keys = True)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+#
+# Cross Platform and Multi Architecture Advanced Binary Emulation Framework
+# Built on top of Unicorn emulator (www.unicorn-engine.org)
+#
+# LAU kaijern (xwings) <kj@qiling.io>
+# NGUYEN Anh Quynh <aquynh@gmail.com>
+# DING tianZe (D1iv3) <dddliv3@gmail.com>
+# SUN bowen (w1tcher) <w1tcher.bupt@gmail.com>
+# CHEN huitao (null) <null@qiling.io>
+# YU tong (sp1ke) <spikeinhouse@gmail.com>
+
+import os, sys, time, json, shutil, tempfile, resource, subprocess, multiprocessing
+from multiprocessing.connection import wait
+
+from qiling import *
+
+
+QL_BENCH_IMPORT = """
+import sys, time, json
+begin = time.perf_counter()
+import unicorn
+middle = time.perf_counter()
+import qiling
+end = time.perf_counter()
+print(json.dumps({"seconds": end - begin, "unicorn_seconds": middle - begin, "qiling_seconds": end - middle,
+                  "modules": sorted(m for m in sys.modules if m.split(".")[0] in ("capstone", "keystone"))}))
+"""
+
+
+# seconds to import qiling in a fresh interpreter, the fastest of @repeat, split
+# in unicorn and qiling itself, and the capstone and keystone modules that came with it
+def ql_bench_import(repeat = 5):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    best = None
+    for _ in range(repeat):
+        out = subprocess.check_output([sys.executable, "-c", QL_BENCH_IMPORT], cwd = root)
+        result = json.loads(out.decode())
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    return best
+
+
+# time @repeat loads and runs of a target, then run it once more with ql.stats;
+# the rates are the counts over the fastest run
+def ql_bench_target(kwargs, repeat = 3):
+    result = {}
+    load_time = run_time = None
+
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        ql = Qiling(output = "off", consolelog = False, **kwargs)
+        loaded = time.perf_counter()
+        ql.run()
+        end = time.perf_counter()
+
+        load_time = min(load_time or loaded - begin, loaded - begin)
+        run_time = min(run_time or end - loaded, end - loaded)
+
+    result["load_time"] = load_time
+    result["run_time"] = run_time
+    result["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # the stats hooks slow the emulation down, so the counting run is not timed
+    ql = Qiling(output = "off", consolelog = False, **kwargs)
+    ql.stats_start()
+    ql.run()
+    stats = ql.stats.dump()
+
+    result["instructions"] = stats["instructions"]
+    result["syscalls"] = stats["syscall_calls"]
+    result["winapi"] = stats["winapi_calls"]
+    result["instructions_per_sec"] = stats["instructions"] / run_time
+    result["syscalls_per_sec"] = stats["syscall_calls"] / run_time
+    result["winapi_per_sec"] = stats["winapi_calls"] / run_time
+    return result
+
+
+def ql_bench_worker(conn, kwargs, repeat):
+    # guest output would mix with the report
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+
+    # a target marked scratch writes into its rootfs, it gets a copy of it
+    kwargs = dict(kwargs)
+    scratch = None
+    if kwargs.pop("scratch", False):
+        scratch = tempfile.mkdtemp()
+        rootfs = os.path.join(scratch, os.path.basename(kwargs["rootfs"]))
+        shutil.copytree(kwargs["rootfs"], rootfs, symlinks = True)
+        kwargs["filename"] = [os.path.join(rootfs, os.path.relpath(f, kwargs["rootfs"])) for f in kwargs["filename"]]
+        kwargs["rootfs"] = rootfs
+
+    try:
+        result = ql_bench_target(kwargs, repeat)
+        result["status"] = "ok"
+    except Exception as e:
+        result = {"status": "error", "error": "%s: %s" % (type(e).__name__, e)}
+    finally:
+        if scratch != None:
+            shutil.rmtree(scratch, ignore_errors = True)
+    conn.send(result)
+    conn.close()
+
+
+# benchmark every target of @targets, name => Qiling keyword arguments, each in a
+# process of its own so peak RSS is its own and a hung target can be killed
+def ql_bench_run(targets, repeat = 3, timeout = 300, callback = None):
+    ctx = multiprocessing.get_context("fork")
+    results = {}
+
+    for name, kwargs in targets.items():
+        recv, send = ctx.Pipe(False)
+        p = ctx.Process(target = ql_bench_worker, args = (send, kwargs, repeat), daemon = True)
+        p.start()
+        send.close()
+
+        if wait([recv, p.sentinel], timeout or None):
+            try:
+                result = recv.recv()
+            except EOFError:
+                result = {"status": "error", "error": "worker exited with %s" % p.exitcode}
+        else:
+            p.kill()
+            result = {"status": "timeout"}
+
+        p.join()
+        recv.close()
+        results[name] = result
+        if callback != None:
+            callback(name, result)
+
+    return results
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+#
+# Cross Platform and Multi Architecture Advanced Binary Emulation Framework
+# Built on top of Unicorn emulator (www.unicorn-engine.org)
+#
+# LAU kaijern (xwings) <kj@qiling.io>
+# NGUYEN Anh Quynh <aquynh@gmail.com>
+# DING tianZe (D1iv3) <dddliv3@gmail.com>
+# SUN bowen (w1tcher) <w1tcher.bupt@gmail.com>
+# CHEN huitao (null) <null@qiling.io>
+# YU tong (sp1ke) <spikeinhouse@gmail.com>
+
+import os
+from binascii import unhexlify
+
+QL_BENCH_ROOTFS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples", "rootfs")
+
+
+# name => Qiling keyword arguments of a benchmark target; a target that writes
+# into its rootfs is run in a copy of it, see ql_bench_worker
+def ql_bench_binary(rootfs, binary, scratch = False):
+    rootfs = os.path.join(QL_BENCH_ROOTFS, rootfs)
+    kwargs = {"filename": [os.path.join(rootfs, "bin", binary)], "rootfs": rootfs}
+    if scratch:
+        kwargs["scratch"] = True
+    return kwargs
+
+
+def ql_bench_shellcode(shellcode, archtype, ostype):
+    return {"shellcoder": unhexlify(shellcode), "archtype": archtype, "ostype": ostype}
+
+
+QL_BENCH_TARGETS = {
+    "x86_linux_hello":              ql_bench_binary("x86_linux", "x86_hello"),
+    "x86_linux_hello_static":       ql_bench_binary("x86_linux", "x86_hello_static"),
+    "x86_linux_multithreading":     ql_bench_binary("x86_linux", "x86_multithreading"),
+    "x8664_linux_hello":            ql_bench_binary("x8664_linux", "x8664_hello"),
+    "x8664_linux_hello_static":     ql_bench_binary("x8664_linux", "x8664_hello_static"),
+    "arm_linux_hello":              ql_bench_binary("arm_linux", "arm_hello"),
+    "arm_linux_hello_static":       ql_bench_binary("arm_linux", "arm_hello_static"),
+    "arm64_linux_hello":            ql_bench_binary("arm64_linux", "arm64_hello"),
+    "arm64_linux_hello_static":     ql_bench_binary("arm64_linux", "arm64_hello_static"),
+    "mips32el_linux_hello":         ql_bench_binary("mips32el_linux", "mips32el_hello"),
+    "mips32el_linux_hello_static":  ql_bench_binary("mips32el_linux", "mips32el_hello_static"),
+    "x8664_freebsd_hello_asm":      ql_bench_binary("x8664_freebsd", "x8664_hello_asm"),
+    # both write test.file into their rootfs
+    "x86_macos_hello_usercorn":     ql_bench_binary("x86_macos", "x86_hello_usercorn", scratch = True),
+    "x8664_macos_hello_usercorn":   ql_bench_binary("x8664_macos", "x8664_hello_usercorn", scratch = True),
+    "x86_windows_hello":            ql_bench_binary("x86_windows", "x86_hello.exe"),
+    "x86_windows_multithread":      ql_bench_binary("x86_windows", "MultiThread.exe"),
+    "x8664_windows_hello":          ql_bench_binary("x8664_windows", "x8664_hello.exe"),
+
+    "x86_linux_shellcode":          ql_bench_shellcode("31c050682f2f7368682f62696e89e3505389e1b00bcd80", "x86", "linux"),
+    "x8664_linux_shellcode":        ql_bench_shellcode("31c048bbd19d9691d08c97ff48f7db53545f995257545eb03b0f05", "x8664", "linux"),
+    "arm64_linux_shellcode":        ql_bench_shellcode("420002ca210080d2400080d2c81880d2010000d4e60300aa01020010020280d2681980d2010000d4410080d2420002cae00306aa080380d2010000d4210400f165ffff54e0000010420002ca210001caa81b80d2010000d4020004d27f0000012f62696e2f736800", "arm64", "linux"),
+    "mips32el_linux_shellcode":     ql_bench_shellcode("ffff0628ffffd004ffff05280110e4270ff08424ab0f02240c0101012f62696e2f7368", "mips32el", "linux"),
+    "x8664_macos_shellcode":        ql_bench_shellcode("4831f65648bf2f2f62696e2f7368574889e74831d24831c0b00248c1c828b03b0f05", "x8664", "macos"),
+}
@@ -23,7 +23,7 @@ class ARM64(Arch):
     def stack_push(self, value):
         SP = self.ql.uc.reg_read(UC_ARM64_REG_SP)
         SP -= 8
-        self.ql.uc.mem_write(SP, self.ql.pack64(value))
+        self.ql.mem_write(SP, self.ql.pack64(value))
         self.ql.uc.reg_write(UC_ARM64_REG_SP, SP)
         return SP
 
@@ -42,7 +42,7 @@ class ARM64(Arch):
 
     def stack_write(self, offset, data):
         SP = self.ql.uc.reg_read(UC_ARM64_REG_SP)
-        return self.ql.uc.mem_write(SP + offset, self.ql.pack64(data))
+        return self.ql.mem_write(SP + offset, self.ql.pack64(data))
 
     # set PC
     def set_pc(self, value):
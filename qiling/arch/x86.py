@@ -60,7 +60,7 @@ class X86(Arch):
     def stack_push(self, value):
         SP = self.ql.uc.reg_read(UC_X86_REG_ESP)
         SP -= 4
-        self.ql.uc.mem_write(SP, self.ql.pack32(value))
+        self.ql.mem_write(SP, self.ql.pack32(value))
         self.ql.uc.reg_write(UC_X86_REG_ESP, SP)
         return SP
 
@@ -78,7 +78,7 @@ class X86(Arch):
 
     def stack_write(self, offset, data):
         SP = self.ql.uc.reg_read(UC_X86_REG_ESP)
-        return self.ql.uc.mem_write(SP + offset, self.ql.pack32(data))
+        return self.ql.mem_write(SP + offset, self.ql.pack32(data))
 
 
     # set PC
@@ -109,7 +109,7 @@ class X8664(Arch):
     def stack_push(self, value):
         SP = self.ql.uc.reg_read(UC_X86_REG_RSP)
         SP -= 8
-        self.ql.uc.mem_write(SP, self.ql.pack64(value))
+        self.ql.mem_write(SP, self.ql.pack64(value))
         self.ql.uc.reg_write(UC_X86_REG_RSP, SP)
         return SP
 
@@ -127,7 +127,7 @@ class X8664(Arch):
 
     def stack_write(self, offset, data):
         SP = self.ql.uc.reg_read(UC_X86_REG_RSP)
-        return self.ql.uc.mem_write(SP + offset, self.ql.pack64(data))
+        return self.ql.mem_write(SP + offset, self.ql.pack64(data))
 
     # set PC
     def set_pc(self, value):
@@ -168,7 +168,7 @@ def ql_x86_setup_gdt_segment(ql, uc, GDT_ADDR, GDT_LIMIT, seg_reg, index, SEGMEN
 
     # map GDT table
     if ql.ostype in (QL_LINUX, QL_FREEBSD) and GDTTYPE == "DS":
-            ql.dprint("OS Type:", ql.ostype)
+            ql.dprint("OS Type: %s", ql.ostype)
             uc.mem_map(GDT_ADDR, GDT_LIMIT)
     
     if ql.ostype == QL_WINDOWS and GDTTYPE == "FS":
@@ -10,12 +10,15 @@
 # CHEN huitao (null) <null@qiling.io>
 # YU tong (sp1ke) <spikeinhouse@gmail.com>
 
-import sys, struct, os, platform, importlib
+import sys, struct, os, re, platform, importlib, time, bisect
+from collections import OrderedDict
 from unicorn import *
 
 from qiling.arch.filetype import *
 from qiling.os.posix.filestruct import *
 from qiling.exception import *
+from qiling.log import *
+from qiling.mapinfo import *
 from qiling.utils import *
 from qiling.os.utils import *
 from qiling.arch.utils import *
@@ -36,21 +39,16 @@ class Qiling:
     elf_entry = 0
     new_stack = 0
     brk_address = 0
+    brk_start = 0
     mmap_start = 0
     shellcode_init = 0
     output = ''
     consolelog = True
-    file_des = []
     stdin = ql_file('stdin', sys.stdin.fileno())
     stdout = ql_file('stdout', sys.stdout.fileno())
     stderr = ql_file('stderr', sys.stderr.fileno())
-    sigaction_act = []
     child_processes = False
-    patch_bin = []
-    patch_lib = []
-    patched_lib = []
     loadbase = 0
-    map_info = []
     timeout = 0
     until_addr = 0
     byte = 0
@@ -63,7 +61,6 @@ class Qiling:
     log_file_name = None
     separate_log_file = False
     current_path = '/'
-    fs_mapper = []
     reg_dir = None
     reg_diff = None
     exit_code = 0
@@ -72,7 +69,7 @@ class Qiling:
     def __init__(self, filename = None, rootfs = None, argv = [], env = {}, 
                  shellcoder = None, ostype = None, archtype = None, libcache = False,
                  output = None, consolelog = True, stdin = 0, stdout = 0, stderr = 0,
-                 log_file = None, separate_log_file = False):
+                 log_file = None, separate_log_file = False, reusable = False):
         self.output = None
         self.ostype = ostype
         self.archtype = archtype
@@ -84,6 +81,30 @@ class Qiling:
         self.libcache = libcache
         self.consolelog = consolelog
         self.platform = platform.system()
+        self.user_syscall = {}
+        self.syscall_table = None
+        self.disasm_engines = {}
+        self.disasm_cache = OrderedDict()
+        self.log = QlLogger(self)
+        self.tracer = None
+        self.checkpointer = None
+        self.coverage = None
+        self.stats = None
+        # runtime state, one set per instance
+        self.file_des = []
+        self.sigaction_act = []
+        self.patch_bin = []
+        self.patch_lib = []
+        self.patched_lib = []
+        self.map_info = QlMapInfo()
+        # (address, size, host mmap, pointer) of guest memory mapped from files
+        self.mmap_ptrs = []
+        self.fs_mapper = []
+        # handles of the unicorn hooks added through the hook_* methods
+        self.uc_hooks = []
+        # with reusable, run() saves the state reset() goes back to
+        self.reusable = reusable
+        self.reset_state = None
 
         if log_file != None and type(log_file) == str:
             if log_file[0] != '/':
@@ -132,8 +153,7 @@ class Qiling:
             self.file_des[1] = self.stdout
             self.file_des[2] = self.stderr
             
-            for _ in range(256):
-                self.sigaction_act.append(0)
+            self.sigaction_act = [0] * 256
 
         if not ql_is_valid_arch(self.arch):
             raise QlErrorArch(f"Invalid Arch {self.arch}")
@@ -175,48 +195,36 @@ class Qiling:
 
 
     def run(self):
+        if self.reusable and self.reset_state == None:
+            from qiling.snapshot import ql_save
+            self.reset_state = ql_save(self)
+
         self.__enable_bin_patch()
 
         runner = self.build_os_execution("runner")
-        runner(self)
+        begin = time.perf_counter()
+        try:
+            runner(self)
+        finally:
+            self.log.flush()
+            if self.tracer != None:
+                self.tracer.flush()
+            if self.stats != None:
+                self.stats.run_time += time.perf_counter() - begin
+                if self.stats.path != None:
+                    self.stats.dump_text(self.stats.path)
 
 
-    def nprint(self, *args, **kw):
-        if self.thread_management != None and self.thread_management.cur_thread != None:
-            fd = self.thread_management.cur_thread.log_file_fd
-        else:
-            fd = self.log_file_fd
-
-        if (self.consolelog == False or self.output == QL_OUT_OFF):
-            pass
-        elif self.consolelog == False and self.log_file_name:
-            print(*args, **kw, file = fd)
-            if self.errmsg == 1:
-                printerrmsg = ''.join(args) 
-                print("!!! ERROR " + printerrmsg, file = fd)
-                self.errmsg = 0
-        elif (self.log_file_name and self.consolelog):
-            print(*args, **kw, file = fd)
-            print(*args, **kw)
-            if self.errmsg == 1:
-                printerrmsg = ''.join(args) 
-                print("!!! ERROR " + printerrmsg, file = fd)
-                print("!!! ERROR " + printerrmsg)
-                self.errmsg = 0
-        else:
-            print(*args, **kw)
-            if self.errmsg == 1:
-                printerrmsg = ''.join(args) 
-                print("!!! ERROR " + printerrmsg)
-                self.errmsg = 0                    
-        
-        if fd != None:
-            fd.flush()
+    # msg % args is only formatted when the record is emitted
+    def nprint(self, msg, *args):
+        self.log.log(QL_LOG_INFO, msg, args)
+        if self.errmsg == 1:
+            self.log.log(QL_LOG_ERROR, "!!! ERROR " + (str(msg) % args if args else str(msg)))
+            self.errmsg = 0
 
 
-    def dprint(self, *args, **kw):
-        if self.output in (QL_OUT_DEBUG, QL_OUT_DUMP):
-            self.nprint(*args, **kw)
+    def dprint(self, msg, *args):
+        self.log.log(QL_LOG_DEBUG, msg, args)
 
 
     def asm2bytes(self, runasm, arm_thumb = None):
@@ -224,58 +232,65 @@ class Qiling:
         return ql_asm2bytes(self,  self.arch, runasm, arm_thumb)
 
 
+    # every hook goes through here, reset() removes the ones added during run()
+    def __hook_add(self, *args):
+        h = self.uc.hook_add(*args)
+        self.uc_hooks.append(h)
+        return h
+
+
     def hook_code(self, callback, user_data = None, begin = 1, end = 0):
         if user_data is None:
             user_data = self
-        self.uc.hook_add(UC_HOOK_CODE, callback, user_data, begin, end)
+        return self.__hook_add(UC_HOOK_CODE, callback, user_data, begin, end)
 
 
     def hook_intr(self, callback, user_data = None, begin = 1, end = 0):
         if user_data is None:
             user_data = self
-        self.uc.hook_add(UC_HOOK_INTR, callback, user_data, begin, end)
+        return self.__hook_add(UC_HOOK_INTR, callback, user_data, begin, end)
 
 
     def hook_block(self, callback, user_data = None, begin = 1, end = 0):
         if user_data is None:
             user_data = self
-        self.uc.hook_add(UC_HOOK_BLOCK, callback, user_data, begin, end)
+        return self.__hook_add(UC_HOOK_BLOCK, callback, user_data, begin, end)
 
 
     def hook_mem_unmapped(self, callback, user_data = None, begin = 1, end = 0):
         if user_data is None:
             user_data = self
-        self.uc.hook_add(UC_HOOK_MEM_UNMAPPED, callback, user_data, begin, end)
+        return self.__hook_add(UC_HOOK_MEM_UNMAPPED, callback, user_data, begin, end)
 
 
     def hook_mem_read_invalid(self, callback, user_data = None, begin = 1, end = 0):
         if user_data is None:
             user_data = self
-        self.uc.hook_add(UC_HOOK_MEM_READ_INVALID, callback, user_data, begin, end)
+        return self.__hook_add(UC_HOOK_MEM_READ_INVALID, callback, user_data, begin, end)
 
 
     def hook_mem_write_invalid(self, callback, user_data = None, begin = 1, end = 0):
         if user_data is None:
             user_data = self
-        self.uc.hook_add(UC_HOOK_MEM_WRITE_INVALID, callback, user_data, begin, end)
+        return self.__hook_add(UC_HOOK_MEM_WRITE_INVALID, callback, user_data, begin, end)
 
 
     def hook_mem_fetch_invalid(self, callback, user_data = None, begin = 1, end = 0):
         if user_data is None:
             user_data = self
-        self.uc.hook_add(UC_HOOK_MEM_FETCH_INVALID, callback, user_data, begin, end)
+        return self.__hook_add(UC_HOOK_MEM_FETCH_INVALID, callback, user_data, begin, end)
 
 
     def hook_mem_invalid(self, callback, user_data = None, begin = 1, end = 0):
         if user_data is None:
             user_data = self
-        self.uc.hook_add(UC_HOOK_MEM_VALID, callback, user_data, begin, end)
+        return self.__hook_add(UC_HOOK_MEM_VALID, callback, user_data, begin, end)
 
 
     def hook_insn(self, callback, user_data = None, begin = 1, end = 0, arg1 = 0):
         if user_data is None:
             user_data = self
-        self.uc.hook_add(UC_HOOK_INSN, callback, user_data, begin, end, arg1)
+        return self.__hook_add(UC_HOOK_INSN, callback, user_data, begin, end, arg1)
 
     
     def stack_push(self, data):
@@ -339,6 +354,12 @@ class Qiling:
             raise
 
 
+    # pack the pointers @values back to back, in one go
+    def pack_ptrs(self, values):
+        values = list(values)
+        return struct.pack(self.__ptrs_format(len(values)), *values)
+
+
     def unpack(self, data):
         if self.archbit == 64:
             return self.unpack64(data)
@@ -372,9 +393,87 @@ class Qiling:
 
     # write @data to memory address @addr
     def mem_write(self, addr, data):
+        if self.checkpointer != None:
+            self.checkpointer.dirty(addr, len(data))
         return self.uc.mem_write(addr, data)
 
 
+    # read every (addr, size) of @ranges, the data comes back in the same order;
+    # ranges that touch the same or neighbouring pages are read in one go
+    def mem_read_many(self, ranges):
+        ranges = list(ranges)
+        result = [bytearray() for addr, size in ranges]
+
+        runs = []
+        for i in sorted(range(len(ranges)), key = lambda i: ranges[i][0]):
+            addr, size = ranges[i]
+            if size <= 0:
+                continue
+            if runs and (addr >> 12) - ((runs[-1][1] - 1) >> 12) <= 1:
+                runs[-1][1] = max(runs[-1][1], addr + size)
+                runs[-1][2].append(i)
+            else:
+                runs.append([addr, addr + size, [i]])
+
+        for run_s, run_e, members in runs:
+            data = self.uc.mem_read(run_s, run_e - run_s)
+            for i in members:
+                offset = ranges[i][0] - run_s
+                result[i] = data[offset : offset + ranges[i][1]]
+        return result
+
+
+    # write every (addr, data) of @writes, later ones win where they overlap;
+    # writes that follow on from each other go to unicorn as one
+    def mem_write_many(self, writes):
+        writes = [(addr, data) for addr, data in writes if len(data)]
+        if not writes:
+            return
+
+        runs = []
+        for addr, data in sorted(writes, key = lambda w: w[0]):
+            if runs and addr <= runs[-1][1]:
+                runs[-1][1] = max(runs[-1][1], addr + len(data))
+            else:
+                runs.append([addr, addr + len(data)])
+
+        starts = [run[0] for run in runs]
+        buffers = [bytearray(run[1] - run[0]) for run in runs]
+        for addr, data in writes:
+            i = bisect.bisect_right(starts, addr) - 1
+            offset = addr - starts[i]
+            buffers[i][offset : offset + len(data)] = data
+
+        for addr, data in zip(starts, buffers):
+            self.mem_write(addr, bytes(data))
+
+
+    # read @count pointers from memory address @addr
+    def mem_read_ptrs(self, addr, count):
+        return struct.unpack(self.__ptrs_format(count), self.uc.mem_read(addr, count * self.pointersize))
+
+
+    # write the pointers @values to memory address @addr
+    def mem_write_ptrs(self, addr, values):
+        return self.mem_write(addr, self.pack_ptrs(values))
+
+
+    # read the NULL terminated array of pointers at memory address @addr, like
+    # argv and envp, without the NULL
+    def mem_read_ptr_list(self, addr):
+        data = ql_read_terminated(self.uc, addr, self.pointersize)
+        return struct.unpack(self.__ptrs_format(len(data) // self.pointersize), data)
+
+
+    def __ptrs_format(self, count):
+        if self.archbit == 64:
+            return '%dQ' % count
+        elif self.archbit == 32:
+            return '%dI' % count
+        else:
+            raise
+
+
     # get PC register
     @property
     def pc(self):
@@ -423,51 +522,153 @@ class Qiling:
 
     def __enable_bin_patch(self):
         for addr, code in self.patch_bin:
-            self.uc.mem_write(self.loadbase + addr, code)
+            self.mem_write(self.loadbase + addr, code)
 
 
     def enable_lib_patch(self):
         for addr, code, filename in self.patch_lib:
-            self.uc.mem_write(self.__get_lib_base(filename) + addr, code)
+            self.mem_write(self.__get_lib_base(filename) + addr, code)
+
+
+    # snapshot registers, memory, fds and the heap/thread state of the emulator,
+    # and write it to the file @snapshot if given
+    def save(self, snapshot = None):
+        from qiling.snapshot import ql_save, ql_dump_snapshot
+        saved_states = ql_save(self)
+        if snapshot != None:
+            ql_dump_snapshot(saved_states, snapshot)
+        return saved_states
+
+
+    # restore @saved_states from save(), or the file @snapshot. Hooks added since
+    # save(), like the ones of run(), are removed so the next run() adds them once
+    def restore(self, saved_states = None, snapshot = None):
+        from qiling.snapshot import ql_restore, ql_load_snapshot
+        if snapshot != None:
+            saved_states = ql_load_snapshot(self, snapshot)
+        ql_restore(self, saved_states)
+
+
+    # put a reusable instance back to the state its first run() started from,
+    # without loading the binary again. Hooks added by the runners and by
+    # callbacks during run() are removed, the ones added before run() stay
+    def reset(self):
+        from qiling.snapshot import ql_restore
+        if self.reset_state == None:
+            raise QlErrorBase("reset() needs a Qiling(reusable = True) that has run")
+
+        if self.checkpointer != None:
+            self.checkpointer.stop()
+            self.checkpointer = None
+
+        ql_restore(self, self.reset_state)
 
 
+    # save a snapshot that rollback() restores by rewriting only the pages written
+    # since, for running the same code over and over
+    def checkpoint(self):
+        from qiling.snapshot import QlCheckpoint
+        if self.checkpointer != None:
+            self.checkpointer.stop()
+        self.checkpointer = QlCheckpoint(self)
+        self.checkpointer.start()
+
+
+    def rollback(self):
+        self.checkpointer.rollback()
+
+
+    # binary trace of blocks, syscalls and, with mem, memory accesses into path
+    def trace_start(self, path, mem = False):
+        from qiling.trace import QlTrace
+        self.trace_stop()
+        self.tracer = QlTrace(self, path, mem)
+        self.tracer.start()
+
+
+    def trace_stop(self):
+        if self.tracer != None:
+            self.tracer.stop()
+            self.tracer = None
+
+
+    # collect block coverage into ql.coverage, an edge bitmap plus the blocks for
+    # ql.coverage.dump_drcov()
+    def coverage_start(self, map_size = None):
+        from qiling.coverage import QlCoverage, QL_COVERAGE_MAP_SIZE
+        self.coverage_stop()
+        self.coverage = QlCoverage(self, map_size or QL_COVERAGE_MAP_SIZE)
+        self.coverage.start()
+
+
+    # ql.coverage stays around to be read or dumped
+    def coverage_stop(self):
+        if self.coverage != None:
+            self.coverage.stop()
+
+
+    # count syscalls, WinAPI calls and, with blocks, emulated blocks and
+    # instructions into ql.stats; with path, ql.stats.dump_text(path) after run()
+    def stats_start(self, blocks = True, path = None):
+        from qiling.stats import QlStats
+        self.stats_stop()
+        self.stats = QlStats(self, blocks, path)
+        self.stats.start()
+
+
+    # ql.stats stays around to be read or dumped
+    def stats_stop(self):
+        if self.stats != None:
+            self.stats.stop()
+
+
+    # hook @callback(ql) at each address in @addr; the unicorn hooks are bounded to
+    # the exact address so code elsewhere never calls back into python
     def hook_address(self, callback, *addr):
-        def _ql_callback_instruction(uc, addr, size, self):
-            if (addr in callback_instruction):
-                callback_func(self)
-        callback_instruction = []
+        def _ql_callback_address(uc, addr, size, ql):
+            callback(ql)
+
         for i in addr:
             if isinstance(i, int):
-                callback_instruction.append(i)
-        callback_func = callback
-        self.uc.hook_add(UC_HOOK_CODE, _ql_callback_instruction, self)
+                self.__hook_add(UC_HOOK_CODE, _ql_callback_address, self, i, i)
 
 
     def hook_mem_read(self, callback, addr = None):
         def _ql_callback_instruction(uc, access, addr, size, value, ql):
-            if callback_instruction == None or (addr == callback_instruction):
-                callback_func(self)
-        callback_instruction = addr
-        callback_func = callback
-        self.uc.hook_add(UC_HOOK_MEM_READ, _ql_callback_instruction, self)
+            callback(ql)
+        self.__hook_mem(UC_HOOK_MEM_READ, _ql_callback_instruction, addr)
 
 
     def hook_mem_write(self, callback, addr = None):
         def _ql_callback_instruction(uc, access, addr, size, value, ql):
-            if callback_instruction == None  or (addr == callback_instruction):
-                callback_func(self)
-        callback_instruction = addr
-        callback_func = callback
-        self.uc.hook_add(UC_HOOK_MEM_WRITE, _ql_callback_instruction, self)
+            callback(ql)
+        self.__hook_mem(UC_HOOK_MEM_WRITE, _ql_callback_instruction, addr)
 
 
     def hook_mem_fetch(self, callback, addr = None):
         def _ql_callback_instruction(uc, access, addr, size, value, ql):
-            if callback_instruction == None or (addr == callback_instruction):
-                callback_func(self)
-        callback_instruction = addr
-        callback_func = callback
-        self.uc.hook_add(UC_HOOK_MEM_FETCH, _ql_callback_instruction, self)
+            callback(ql)
+        self.__hook_mem(UC_HOOK_MEM_FETCH, _ql_callback_instruction, addr)
+
+
+    # addr None hooks every access, otherwise only accesses starting at @addr
+    def __hook_mem(self, hook_type, callback, addr):
+        if addr == None:
+            return self.__hook_add(hook_type, callback, self)
+        else:
+            return self.__hook_add(hook_type, callback, self, addr, addr)
+
+
+    # replace the handler of syscall @syscall_num with @callback
+    # callback(ql, uc, param0, param1, param2, param3, param4, param5)
+    def set_syscall(self, syscall_num, callback):
+        self.user_syscall[syscall_num] = callback
+        if self.syscall_table is not None:
+            self.syscall_table[syscall_num] = callback
+            if self.tracer != None:
+                self.tracer.hook_syscall_table()
+            if self.stats != None:
+                self.stats.hook_syscall_table()
 
 
     def set_timeout(self, microseconds):
@@ -478,49 +679,98 @@ class Qiling:
         self.until_addr = until_addr
 
 
+    # stop the emulation for good, like exit_group does, so the thread
+    # schedulers do not start it again
+    def stop(self):
+        self.uc.emu_stop()
+        self.RUN = False
+        if self.thread_management != None:
+            from qiling.os.linux.thread import THREAD_EVENT_EXIT_GROUP_EVENT
+            td = self.thread_management.cur_thread
+            td.stop()
+            td.stop_event = THREAD_EVENT_EXIT_GROUP_EVENT
+
+
     def insert_map_info(self, mem_s, mem_e, mem_info):
-        tmp_map_info = []
-        insert_flag = 0
-        map_info = self.map_info
-        if len(map_info) == 0:
-            tmp_map_info.append([mem_s, mem_e, mem_info])
+        self.map_info.insert(mem_s, mem_e, mem_info)
+
+
+    # (start, end, info) of the ql.map_info region holding @addr, None if there is none
+    def mem_region_at(self, addr):
+        return self.map_info.lookup(addr)
+
+
+    # addresses where @needle matches in mapped memory, lowest first: bytes are
+    # searched as they are, a str or a compiled bytes pattern as a regex. Bytes
+    # are reported at every address they start at, overlapping ones included; a
+    # regex is scanned like finditer() and its matches do not overlap.
+    # @regions limits the search to a list of (begin, end) ranges or to the
+    # regions labelled with a file name in map_info. Memory is read @chunk_size
+    # bytes at a time plus enough of the next chunk to catch a match crossing
+    # into it: len(needle) - 1 for bytes, @overlap for a regex
+    def mem_search(self, needle, regions = None, chunk_size = 0x100000, overlap = 0x1000):
+        if isinstance(needle, (bytes, bytearray)):
+            needle = bytes(needle)
+            if not needle:
+                return
+            pattern = None
+            overlap = len(needle) - 1
+        elif isinstance(needle, str):
+            pattern = re.compile(needle.encode())
         else:
-            for s, e, info in map_info:
-                if e <= mem_s:
-                    tmp_map_info.append([s, e, info])
-                    continue
-                if s >= mem_e:
-                    if insert_flag == 0:
-                        insert_flag = 1
-                        tmp_map_info.append([mem_s, mem_e, mem_info])
-                    tmp_map_info.append([s, e, info])
-                    continue
-                if s < mem_s:
-                    tmp_map_info.append([s, mem_s, info])
-
-                if s == mem_s:
-                    pass
-                
-                if insert_flag == 0:
-                    insert_flag = 1
-                    tmp_map_info.append([mem_s, mem_e, mem_info])
-                
-                if e > mem_e:
-                    tmp_map_info.append([mem_e, e, info])
-                
-                if e == mem_e:
-                    pass
-            if insert_flag == 0:
-                tmp_map_info.append([mem_s, mem_e, mem_info])
-        map_info = []
-        map_info.append(tmp_map_info[0])
-        for s, e, info in tmp_map_info[1 : ]:
-            if s == map_info[-1][1] and info == map_info[-1][2]:
-                map_info[-1][1] = e
+            pattern = needle
+
+        for begin, end in self.__search_ranges(regions):
+            pos = begin
+            # end of the last regex match, the next chunk goes on scanning from there
+            match_end = begin
+            while pos < end:
+                stop = min(pos + chunk_size, end)
+                data = self.uc.mem_read(pos, min(stop + overlap, end) - pos)
+                # only matches starting in this chunk, the next one reports the rest
+                limit = stop - pos
+                if pattern == None:
+                    i = data.find(needle)
+                    while 0 <= i < limit:
+                        yield pos + i
+                        i = data.find(needle, i + 1)
+                else:
+                    for m in pattern.finditer(data, max(match_end - pos, 0)):
+                        if m.start() >= limit:
+                            break
+                        yield pos + m.start()
+                        match_end = pos + m.end()
+                pos = stop
+
+
+    # mapped ranges to search, contiguous ones joined so matches can span them
+    def __search_ranges(self, regions):
+        mapped = []
+        for begin, end, perms in sorted(self.uc.mem_regions()):
+            if mapped and begin <= mapped[-1][1]:
+                mapped[-1][1] = max(mapped[-1][1], end + 1)
             else:
-                map_info.append([s, e, info])
-        self.map_info = map_info
-    
+                mapped.append([begin, end + 1])
+
+        if regions == None:
+            return [tuple(r) for r in mapped]
+
+        if isinstance(regions, str):
+            regions = [(s, e) for s, e, info in self.map_info
+                       if info == regions or os.path.split(info)[1] == regions]
+
+        ranges = []
+        for begin, end in sorted(regions):
+            for m_begin, m_end in mapped:
+                b, e = max(begin, m_begin), min(end, m_end)
+                if b >= e:
+                    continue
+                if ranges and b <= ranges[-1][1]:
+                    ranges[-1][1] = max(ranges[-1][1], e)
+                else:
+                    ranges.append([b, e])
+        return [tuple(r) for r in ranges]
+
 
     def show_map_info(self):
         for s, e, info in self.map_info:
@@ -528,10 +778,7 @@ class Qiling:
     
 
     def __get_lib_base(self, filename):
-        for s, e, info in self.map_info:
-            if os.path.split(info)[1] == filename:
-                return s
-        return -1
+        return self.map_info.base_of(filename)
 
 
     def add_fs_mapper(self, fm, to):
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+#
+# Cross Platform and Multi Architecture Advanced Binary Emulation Framework
+# Built on top of Unicorn emulator (www.unicorn-engine.org)
+#
+# LAU kaijern (xwings) <kj@qiling.io>
+# NGUYEN Anh Quynh <aquynh@gmail.com>
+# DING tianZe (D1iv3) <dddliv3@gmail.com>
+# SUN bowen (w1tcher) <w1tcher.bupt@gmail.com>
+# CHEN huitao (null) <null@qiling.io>
+# YU tong (sp1ke) <spikeinhouse@gmail.com>
+
+"""
+Block coverage. Edges between blocks are counted AFL style in a fixed size
+bitmap, every block seen is kept for a drcov file that Lighthouse and other
+coverage viewers load, with the modules taken from ql.map_info.
+"""
+
+import struct
+
+from unicorn import *
+
+
+# bytes in the edge bitmap, a power of two
+QL_COVERAGE_MAP_SIZE = 1 << 16
+
+QL_DRCOV_BB = struct.Struct("<IHH")
+
+
+class QlCoverage:
+    def __init__(self, ql, map_size = QL_COVERAGE_MAP_SIZE):
+        self.ql = ql
+        self.mask = map_size - 1
+        self.bitmap = bytearray(map_size)
+        self.prev = 0
+        # block address => block size
+        self.blocks = {}
+        self.hook = None
+
+
+    def start(self):
+        self.hook = self.ql.uc.hook_add(UC_HOOK_BLOCK, self.__hook_block)
+
+
+    def stop(self):
+        if self.hook != None:
+            self.ql.uc.hook_del(self.hook)
+            self.hook = None
+
+
+    # clear the bitmap and the previous block, e.g. before every fuzzing input
+    def reset(self):
+        self.bitmap[:] = bytes(len(self.bitmap))
+        self.prev = 0
+
+
+    # runs for every executed block: index the bitmap with the hash of the previous
+    # and the current block, nothing is allocated unless the block is new
+    def __hook_block(self, uc, address, size, user_data):
+        cur = ((address >> 4) ^ (address << 8)) & self.mask
+        bitmap = self.bitmap
+        i = cur ^ self.prev
+        bitmap[i] = (bitmap[i] + 1) & 0xff
+        self.prev = cur >> 1
+        if address not in self.blocks:
+            self.blocks[address] = size
+
+
+    # module path => [base, end] from ql.map_info, anonymous memory is left out
+    def modules(self):
+        modules = {}
+        for s, e, info in self.ql.map_info:
+            if not info:
+                continue
+            if info in modules:
+                modules[info][0] = min(modules[info][0], s)
+                modules[info][1] = max(modules[info][1], e)
+            else:
+                modules[info] = [s, e]
+        return modules
+
+
+    # write the blocks as a drcov version 2 file, blocks outside of any module
+    # are dropped
+    def dump_drcov(self, path):
+        modules = sorted(self.modules().items(), key = lambda m: m[1][0])
+
+        bbs = []
+        for address, size in sorted(self.blocks.items()):
+            for mod_id, (name, (base, end)) in enumerate(modules):
+                if base <= address < end:
+                    bbs.append(QL_DRCOV_BB.pack(address - base, min(size, 0xffff), mod_id))
+                    break
+
+        with open(path, "wb") as f:
+            f.write(b"DRCOV VERSION: 2\n")
+            f.write(b"DRCOV FLAVOR: qiling\n")
+            f.write(b"Module Table: version 2, count %d\n" % len(modules))
+            f.write(b"Columns: id, base, end, entry, checksum, timestamp, path\n")
+            for mod_id, (name, (base, end)) in enumerate(modules):
+                f.write(b"%3d, 0x%016x, 0x%016x, 0x%016x, 0x%08x, 0x%08x, %s\n" %
+                        (mod_id, base, end, 0, 0, 0, name.encode()))
+            f.write(b"BB Table: %d bbs\n" % len(bbs))
+            f.write(b"".join(bbs))
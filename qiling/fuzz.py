@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+#
+# Cross Platform and Multi Architecture Advanced Binary Emulation Framework
+# Built on top of Unicorn emulator (www.unicorn-engine.org)
+#
+# LAU kaijern (xwings) <kj@qiling.io>
+# NGUYEN Anh Quynh <aquynh@gmail.com>
+# DING tianZe (D1iv3) <dddliv3@gmail.com>
+# SUN bowen (w1tcher) <w1tcher.bupt@gmail.com>
+# CHEN huitao (null) <null@qiling.io>
+# YU tong (sp1ke) <spikeinhouse@gmail.com>
+
+"""
+Persistent mode fuzzing. The target runs once up to the start address, where a
+checkpoint is taken. Every input is then written by a callback and run from the
+start to the exit address in the same process, and the checkpoint rolled back,
+so the loader, the libraries and the os setup are paid for only once.
+"""
+
+import os, time, random
+
+from unicorn import *
+
+from qiling.exception import *
+
+
+# inputs are never grown past this size
+QL_FUZZ_MAX_SIZE = 0x1000
+
+QL_FUZZ_INTERESTING = (0x00, 0x01, 0x7f, 0x80, 0xff, 0x7fff, 0x8000, 0xffff, 0x7fffffff, 0x80000000, 0xffffffff)
+
+
+# havoc style mutation: a few random flips, overwrites, insertions and deletions
+def ql_fuzz_mutate(data, max_size = QL_FUZZ_MAX_SIZE):
+    data = bytearray(data)
+
+    for _ in range(random.randint(1, 4)):
+        op = random.randrange(6) if data else 4
+        pos = random.randrange(len(data)) if data else 0
+
+        if op == 0:
+            data[pos] ^= 1 << random.randrange(8)
+        elif op == 1:
+            data[pos] = random.randrange(0x100)
+        elif op == 2:
+            size = random.choice((1, 2, 4))
+            value = random.choice(QL_FUZZ_INTERESTING) & ((1 << size * 8) - 1)
+            data[pos : pos + size] = value.to_bytes(size, random.choice(("little", "big")))
+        elif op == 3:
+            del data[pos : pos + random.randint(1, 16)]
+        elif op == 4:
+            data[pos : pos] = os.urandom(random.randint(1, 16))
+        else:
+            size = random.randint(1, 16)
+            data[pos : pos] = data[pos : pos + size]
+
+    return bytes(data[:max_size])
+
+
+class QlFuzzer:
+    """
+    Fuzz the code between @begin and @end of the target loaded in @ql.
+
+    place_input(ql, data) writes an input into the emulated process, through
+    ql.mem_write or register writes. Inputs are mutated from @seeds with
+    mutate(data), ql_fuzz_mutate by default. An input whose run raises UcError is
+    a crash, one that stops before @end a hang; with @crash_dir set, the first
+    input of every distinct (pc, error) crash is written there.
+    """
+    def __init__(self, ql, begin, end, place_input, seeds = (b"",), mutate = None,
+                 crash_dir = None, timeout = 0, count = 0):
+        self.ql = ql
+        self.begin = begin
+        self.end = end
+        self.place_input = place_input
+        self.corpus = list(seeds) or [b""]
+        self.mutate = mutate or ql_fuzz_mutate
+        self.crash_dir = crash_dir
+        # budget of one run, in microseconds and instructions
+        self.timeout = timeout
+        self.count = count
+        # (pc, errno) => first crashing input
+        self.crashes = {}
+        self.stats = {"execs": 0, "crashes": 0, "unique_crashes": 0, "hangs": 0, "execs_per_sec": 0, "elapsed": 0}
+        self.ready = False
+
+
+    # run the target up to begin and take the checkpoint every input starts from
+    def start(self):
+        def hook_begin(uc, address, size, user_data):
+            if not self.ready:
+                self.ready = True
+                self.ql.checkpoint()
+                self.ql.stop()
+
+        hook = self.ql.uc.hook_add(UC_HOOK_CODE, hook_begin, None, self.begin, self.begin)
+        self.ql.run()
+        self.ql.uc.hook_del(hook)
+
+        if not self.ready:
+            raise QlErrorBase("Fuzzing start address 0x%x was never reached" % self.begin)
+
+
+    # run the target on @data, returns None or the UcError it crashed with
+    def run_one(self, data):
+        self.ql.rollback()
+        self.place_input(self.ql, data)
+        self.stats["execs"] += 1
+
+        try:
+            self.ql.uc.emu_start(self.begin, self.end, self.timeout, self.count)
+        except UcError as e:
+            self.__crash(data, e)
+            return e
+
+        if self.ql.pc != self.end:
+            self.stats["hangs"] += 1
+        return None
+
+
+    def __crash(self, data, e):
+        self.stats["crashes"] += 1
+        key = (self.ql.pc, e.errno)
+        if key in self.crashes:
+            return
+
+        self.crashes[key] = data
+        self.stats["unique_crashes"] += 1
+        if self.crash_dir != None:
+            with open(os.path.join(self.crash_dir, "crash_%x_%d" % key), "wb") as f:
+                f.write(data)
+
+
+    # fuzz for @iterations inputs or @seconds, forever when both are 0; report()
+    # is called with the stats once a second
+    def run(self, iterations = 0, seconds = 0):
+        if not self.ready:
+            self.start()
+
+        begin = last = time.time()
+        last_execs = self.stats["execs"]
+        n = 0
+
+        while (not iterations or n < iterations) and (not seconds or time.time() - begin < seconds):
+            self.run_one(self.mutate(random.choice(self.corpus)))
+            n += 1
+
+            now = time.time()
+            if now - last >= 1:
+                self.stats["execs_per_sec"] = int((self.stats["execs"] - last_execs) / (now - last))
+                self.stats["elapsed"] = now - begin
+                last, last_execs = now, self.stats["execs"]
+                self.report(self.stats)
+
+        return self.crashes
+
+
+    def report(self, stats):
+        print("[+] %d execs, %d exec/s, %d crashes (%d unique), %d hangs" % (stats["execs"],
+                stats["execs_per_sec"], stats["crashes"], stats["unique_crashes"], stats["hangs"]))
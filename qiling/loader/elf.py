@@ -13,6 +13,8 @@
 import sys
 import os
 import string
+import struct
+import mmap
 
 from qiling.arch.filetype import *
 from qiling.exception import *
@@ -24,6 +26,11 @@ PT_INTERP = 3
 ET_EXEC = 2
 ET_DYN = 3
 
+SHT_SYMTAB = 2
+SHT_DYNSYM = 11
+
+ELFDATA2MSB = 2
+
 AT_NULL = 0
 AT_IGNORE = 1
 AT_EXECFD = 2
@@ -51,22 +58,129 @@ AT_EXECFN = 31
 FILE_DES = []
 MMAP_START = 0
 
+# typedef struct elf32_hdr {                typedef struct elf64_hdr {
+# unsigned char e_ident[EI_NIDENT];         unsigned char e_ident[16];
+# Elf32_Half    e_type;                     Elf64_Half    e_type;
+# Elf32_Half    e_machine;                  Elf64_Half    e_machine;
+# Elf32_Word    e_version;                  Elf64_Word    e_version;
+# Elf32_Addr    e_entry;                    Elf64_Addr    e_entry;
+# Elf32_Off     e_phoff;                    Elf64_Off     e_phoff;
+# Elf32_Off     e_shoff;                    Elf64_Off     e_shoff;
+# Elf32_Word    e_flags;                    Elf64_Word    e_flags;
+# Elf32_Half    e_ehsize;                   Elf64_Half    e_ehsize;
+# Elf32_Half    e_phentsize;                Elf64_Half    e_phentsize;
+# Elf32_Half    e_phnum;                    Elf64_Half    e_phnum;
+# Elf32_Half    e_shentsize;                Elf64_Half    e_shentsize;
+# Elf32_Half    e_shnum;                    Elf64_Half    e_shnum;
+# Elf32_Half    e_shstrndx;                 Elf64_Half    e_shstrndx;
+# } Elf32_Ehdr;                             } Elf64_Ehdr;
+ELF_EHDR_FIELDS = ('e_ident', 'e_type', 'e_machine', 'e_version', 'e_entry', 'e_phoff', 'e_shoff',
+                   'e_flags', 'e_ehsize', 'e_phentsize', 'e_phnum', 'e_shentsize', 'e_shnum', 'e_shstrndx')
+
+# typedef struct elf32_phdr {               typedef struct elf64_phdr {
+# Elf32_Word    p_type;                     Elf64_Word  p_type;
+# Elf32_Off     p_offset;                   Elf64_Word  p_flags;
+# Elf32_Addr    p_vaddr;                    Elf64_Off   p_offset;
+# Elf32_Addr    p_paddr;                    Elf64_Addr  p_vaddr;
+# Elf32_Word    p_filesz;                   Elf64_Addr  p_paddr;
+# Elf32_Word    p_memsz;                    Elf64_Xword p_filesz;
+# Elf32_Word    p_flags;                    Elf64_Xword p_memsz;
+# Elf32_Word    p_align;                    Elf64_Xword p_align;
+# } Elf32_Phdr;                             } Elf64_Phdr;
+ELF32_PHDR_FIELDS = ('p_type', 'p_offset', 'p_vaddr', 'p_paddr', 'p_filesz', 'p_memsz', 'p_flags', 'p_align')
+ELF64_PHDR_FIELDS = ('p_type', 'p_flags', 'p_offset', 'p_vaddr', 'p_paddr', 'p_filesz', 'p_memsz', 'p_align')
+
+# typedef struct elf32_shdr {               typedef struct elf64_shdr {
+# Elf32_Word    sh_name;                    Elf64_Word  sh_name;
+# Elf32_Word    sh_type;                    Elf64_Word  sh_type;
+# Elf32_Word    sh_flags;                   Elf64_Xword sh_flags;
+# Elf32_Addr    sh_addr;                    Elf64_Addr  sh_addr;
+# Elf32_Off     sh_offset;                  Elf64_Off   sh_offset;
+# Elf32_Word    sh_size;                    Elf64_Xword sh_size;
+# Elf32_Word    sh_link;                    Elf64_Word  sh_link;
+# Elf32_Word    sh_info;                    Elf64_Word  sh_info;
+# Elf32_Word    sh_addralign;               Elf64_Xword sh_addralign;
+# Elf32_Word    sh_entsize;                 Elf64_Xword sh_entsize;
+# } Elf32_Shdr;                             } Elf64_Shdr;
+ELF_SHDR_FIELDS = ('sh_name', 'sh_type', 'sh_flags', 'sh_addr', 'sh_offset', 'sh_size',
+                   'sh_link', 'sh_info', 'sh_addralign', 'sh_entsize')
+
+# typedef struct elf32_sym {                typedef struct elf64_sym {
+# Elf32_Word    st_name;                    Elf64_Word    st_name;
+# Elf32_Addr    st_value;                   unsigned char st_info;
+# Elf32_Word    st_size;                    unsigned char st_other;
+# unsigned char st_info;                    Elf64_Half    st_shndx;
+# unsigned char st_other;                   Elf64_Addr    st_value;
+# Elf32_Half    st_shndx;                   Elf64_Xword   st_size;
+# } Elf32_Sym;                              } Elf64_Sym;
+ELF32_SYM_FIELDS = ('st_name', 'st_value', 'st_size', 'st_info', 'st_other', 'st_shndx')
+ELF64_SYM_FIELDS = ('st_name', 'st_info', 'st_other', 'st_shndx', 'st_value', 'st_size')
+
+# (archbit, byte order) => precompiled header, program header, section header
+# and symbol formats, with the field names they unpack to
+ELF_STRUCTS = {}
+for _order in ('<', '>'):
+    ELF_STRUCTS[(32, _order)] = (
+        (struct.Struct(_order + '16sHHIIIIIHHHHHH'), ELF_EHDR_FIELDS),
+        (struct.Struct(_order + 'IIIIIIII'), ELF32_PHDR_FIELDS),
+        (struct.Struct(_order + 'IIIIIIIIII'), ELF_SHDR_FIELDS),
+        (struct.Struct(_order + 'IIIBBH'), ELF32_SYM_FIELDS))
+    ELF_STRUCTS[(64, _order)] = (
+        (struct.Struct(_order + '16sHHIQQQIHHHHHH'), ELF_EHDR_FIELDS),
+        (struct.Struct(_order + 'IIQQQQQQ'), ELF64_PHDR_FIELDS),
+        (struct.Struct(_order + 'IIQQQQIIQQ'), ELF_SHDR_FIELDS),
+        (struct.Struct(_order + 'IBBHQQ'), ELF64_SYM_FIELDS))
+
+
+# a section header, its 'data' is only sliced out of the file once it is read
+class ELFSection(dict):
+    def __init__(self, elf, fields):
+        dict.__init__(self, fields)
+        self.elf = elf
+
+    def __missing__(self, key):
+        if key != 'data':
+            raise KeyError(key)
+        self['data'] = self.elf.getelfdata(self['sh_offset'], self['sh_size'])
+        return self['data']
+
+
 class ELFParse:
+    """
+    The file is mapped rather than read and the tables are decoded with the
+    precompiled formats of ELF_STRUCTS: the header and the program headers on
+    load, the section headers and the symbols only once they are asked for.
+    close() drops the mapping once nothing more is read from the file.
+    """
     def __init__(self, path, ql):
         self.path = os.path.abspath(path)
         self.ql = ql
 
         with open(path, "rb") as f:
-            elfdata = f.read()
+            try:
+                self.elfdata = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # empty files, and files that can not be mapped
+                self.elfdata = f.read()
 
-        self.elfdata = elfdata.ljust(52, b'\x00')        
+        try:
+            self.ident = self.getident()
 
-        self.ident = self.getident()
+            if self.ident[ : 4] != b'\x7fELF':
+                raise QlErrorELFFormat("ERROR: NOT a ELF")
 
-        if self.ident[ : 4] != b'\x7fELF':
-            raise QlErrorELFFormat("ERROR: NOT a ELF")
+            order = '>' if self.ident[5] == ELFDATA2MSB else '<'
+            self.ehdr_struct, self.phdr_struct, self.shdr_struct, self.sym_struct = ELF_STRUCTS[(ql.archbit, order)]
 
-        self.elfhead = self.parse_header(ql)
+            self.elfhead = self.unpack_table(self.ehdr_struct, 0, 1, self.ehdr_struct[0].size)[0]
+
+            self.phdrs = self.unpack_table(self.phdr_struct, self.elfhead['e_phoff'], self.elfhead['e_phnum'], self.elfhead['e_phentsize'])
+        except Exception:
+            self.close()
+            raise
+        self.shdrs = None
+        self.sections = None
+        self.symbols = None
 
     def getident(self):
         return self.elfdata[0 : 19]
@@ -74,302 +188,77 @@ class ELFParse:
     def getelfdata(self, offest, size):
         return self.elfdata[offest : offest + size]
 
-    def parse_header32(self, ql):
-        # typedef struct elf32_hdr{
-        # unsigned char	e_ident[EI_NIDENT];
-        # Elf32_Half	e_type;
-        # Elf32_Half	e_machine;
-        # Elf32_Word	e_version;
-        # Elf32_Addr	e_entry;  /* Entry point */
-        # Elf32_Off	e_phoff;
-        # Elf32_Off	e_shoff;
-        # Elf32_Word	e_flags;
-        # Elf32_Half	e_ehsize;
-        # Elf32_Half	e_phentsize;
-        # Elf32_Half	e_phnum;
-        # Elf32_Half	e_shentsize;
-        # Elf32_Half	e_shnum;
-        # Elf32_Half	e_shstrndx;
-        # } Elf32_Ehdr;
-
-        # /* 32-bit ELF base types. */
-        # typedef uint32_t Elf32_Addr;
-        # typedef uint16_t Elf32_Half;
-        # typedef uint32_t Elf32_Off;
-        # typedef int32_t  Elf32_Sword;
-        # typedef uint32_t Elf32_Word;
-
-        data = self.elfdata
-        index = 0
-        head = {}
-        head['e_ident'] = data[index : index + 16]
-        index += 16
-        head['e_type'] = self.ql.unpack16(data[index : index + 2])
-        index += 2
-        head['e_machine'] = self.ql.unpack16(data[index : index + 2])
-        index += 2
-        head['e_version'] = self.ql.unpack32(data[index : index + 4])
-        index += 4
-        head['e_entry'] = self.ql.unpack32(data[index : index + 4])
-        index += 4
-        head['e_phoff'] = self.ql.unpack32(data[index : index + 4])
-        index += 4
-        head['e_shoff'] = self.ql.unpack32(data[index : index + 4])
-        index += 4
-        head['e_flags'] = self.ql.unpack32(data[index : index + 4])
-        index += 4
-        head['e_ehsize'] = self.ql.unpack16(data[index : index + 2])
-        index += 2
-        head['e_phentsize'] = self.ql.unpack16(data[index : index + 2])
-        index += 2
-        head['e_phnum'] = self.ql.unpack16(data[index : index + 2])
-        index += 2
-        head['e_shentsize'] = self.ql.unpack16(data[index : index + 2])
-        index += 2
-        head['e_shnum'] = self.ql.unpack16(data[index : index + 2])
-        index += 2
-        head['e_shstrndx'] = self.ql.unpack16(data[index : index + 2])
-        index += 2
-        return head
-
-    def parse_header64(self, ql):
-        # typedef struct elf64_hdr {
-        # unsigned char	e_ident[16];		/* ELF "magic number" */
-        # Elf64_Half e_type;
-        # Elf64_Half e_machine;
-        # Elf64_Word e_version;
-        # Elf64_Addr e_entry;		/* Entry point virtual address */
-        # Elf64_Off e_phoff;		/* Program header table file offset */
-        # Elf64_Off e_shoff;		/* Section header table file offset */
-        # Elf64_Word e_flags;
-        # Elf64_Half e_ehsize;
-        # Elf64_Half e_phentsize;
-        # Elf64_Half e_phnum;
-        # Elf64_Half e_shentsize;
-        # Elf64_Half e_shnum;
-        # Elf64_Half e_shstrndx;
-        # } Elf64_Ehdr;
-
-        # /* 64-bit ELF base types. */
-        # typedef uint64_t Elf64_Addr;
-        # typedef uint16_t Elf64_Half;
-        # typedef int16_t	 Elf64_SHalf;
-        # typedef uint64_t Elf64_Off;
-        # typedef int32_t	 Elf64_Sword;
-        # typedef uint32_t Elf64_Word;
-        # typedef uint64_t Elf64_Xword;
-        # typedef int64_t  Elf64_Sxword;
-
-        data = self.elfdata
-        index = 0
-        head = {}
-        head['e_ident'] = data[index : index + 16]
-        index += 16
-        head['e_type'] = ql.unpack16(data[index : index + 2])
-        index += 2
-        head['e_machine'] = ql.unpack16(data[index : index + 2])
-        index += 2
-        head['e_version'] = ql.unpack32(data[index : index + 4])
-        index += 4
-        head['e_entry'] = ql.unpack64(data[index : index + 8])
-        index += 8
-        head['e_phoff'] = ql.unpack64(data[index : index + 8])
-        index += 8
-        head['e_shoff'] = ql.unpack64(data[index : index + 8])
-        index += 8
-        head['e_flags'] = ql.unpack32(data[index : index + 4])
-        index += 4
-        head['e_ehsize'] = ql.unpack16(data[index : index + 2])
-        index += 2
-        head['e_phentsize'] = ql.unpack16(data[index : index + 2])
-        index += 2
-        head['e_phnum'] = ql.unpack16(data[index : index + 2])
-        index += 2
-        head['e_shentsize'] = ql.unpack16(data[index : index + 2])
-        index += 2
-        head['e_shnum'] = ql.unpack16(data[index : index + 2])
-        index += 2
-        head['e_shstrndx'] = ql.unpack16(data[index : index + 2])
-        index += 2
-        return head
+    # @num entries of @entsize bytes from @offset as dicts, in one pass when the
+    # entries are exactly the size of the format. A table cut short by the end
+    # of the file reads as zeros past it, tiny files overlap their headers
+    def unpack_table(self, table_struct, offset, num, entsize):
+        fmt, fields = table_struct
+        if num == 0:
+            return []
+        if offset >= len(self.elfdata):
+            raise QlErrorELFFormat("ERROR: ELF table past the end of the file")
+
+        size = max(num * entsize, (num - 1) * entsize + fmt.size)
+        data = self.elfdata[offset : offset + size].ljust(size, b'\x00')
+        if entsize == fmt.size:
+            return [dict(zip(fields, entry)) for entry in fmt.iter_unpack(data)]
+        return [dict(zip(fields, fmt.unpack_from(data, i * entsize))) for i in range(num)]
+
+    # release the mapping of the file, nothing can be read from it afterwards
+    def close(self):
+        if isinstance(self.elfdata, mmap.mmap):
+            self.elfdata.close()
+        self.elfdata = None
 
     def parse_header(self, ql):
-        if ql.archbit == 64:
-            return self.parse_header64(ql)
-        elif ql.archbit == 32:
-            return self.parse_header32(ql)
-
-    def parse_section_header32(self, ql):
-        # typedef struct elf32_shdr {
-        # Elf32_Word	sh_name;
-        # Elf32_Word	sh_type;
-        # Elf32_Word	sh_flags;
-        # Elf32_Addr	sh_addr;
-        # Elf32_Off	sh_offset;
-        # Elf32_Word	sh_size;
-        # Elf32_Word	sh_link;
-        # Elf32_Word	sh_info;
-        # Elf32_Word	sh_addralign;
-        # Elf32_Word	sh_entsize;
-        # } Elf32_Shdr;
-
-        # /* 32-bit ELF base types. */
-        # typedef uint32_t Elf32_Addr;
-        # typedef uint16_t Elf32_Half;
-        # typedef uint32_t Elf32_Off;
-        # typedef int32_t  Elf32_Sword;
-        # typedef uint32_t Elf32_Word;
-
-        Ssize = self.elfhead['e_shentsize']
-        Snum = self.elfhead['e_shnum']
-        Sdata = self.elfdata[self.elfhead['e_shoff'] : self.elfhead['e_shoff'] + Snum * Ssize]
-
-        for i in range(Snum):
-            S = {}
-            S['sh_name'] = ql.unpack32(Sdata[i * Ssize : i * Ssize + 4])
-            S['sh_type'] = ql.unpack32(Sdata[i * Ssize + 4 : i * Ssize + 8])
-            S['sh_flags'] = ql.unpack32(Sdata[i * Ssize + 8 : i * Ssize + 12])
-            S['sh_addr'] = ql.unpack32(Sdata[i * Ssize + 12 : i * Ssize + 16])
-            S['sh_offset'] = ql.unpack32(Sdata[i * Ssize + 16 : i * Ssize + 20])
-            S['sh_size'] = ql.unpack32(Sdata[i * Ssize + 20 : i * Ssize + 24])
-            S['sh_link'] = ql.unpack32(Sdata[i * Ssize + 24 : i * Ssize + 28])
-            S['sh_info'] = ql.unpack32(Sdata[i * Ssize + 28 : i * Ssize + 32])
-            S['sh_addralign'] = ql.unpack32(Sdata[i * Ssize + 32 : i * Ssize + 36])
-            S['sh_entsize'] = ql.unpack32(Sdata[i * Ssize + 36 : i * Ssize + 40])
-            S['data'] = self.elfdata[S['sh_offset'] : S['sh_offset'] + S['sh_size']]
-            yield S
-        return
-
-    def parse_section_header64(self, ql):
-        # typedef struct elf64_shdr {
-        # Elf64_Word sh_name;		/* Section name, index in string tbl */
-        # Elf64_Word sh_type;		/* Type of section */
-        # Elf64_Xword sh_flags;		/* Miscellaneous section attributes */
-        # Elf64_Addr sh_addr;		/* Section virtual addr at execution */
-        # Elf64_Off sh_offset;		/* Section file offset */
-        # Elf64_Xword sh_size;		/* Size of section in bytes */
-        # Elf64_Word sh_link;		/* Index of another section */
-        # Elf64_Word sh_info;		/* Additional section information */
-        # Elf64_Xword sh_addralign;	/* Section alignment */
-        # Elf64_Xword sh_entsize;	/* Entry size if section holds table */
-        # } Elf64_Shdr;
-
-        # /* 64-bit ELF base types. */
-        # typedef uint64_t Elf64_Addr;
-        # typedef uint16_t Elf64_Half;
-        # typedef int16_t	 Elf64_SHalf;
-        # typedef uint64_t Elf64_Off;
-        # typedef int32_t	 Elf64_Sword;
-        # typedef uint32_t Elf64_Word;
-        # typedef uint64_t Elf64_Xword;
-        # typedef int64_t  Elf64_Sxword;
-
-        Ssize = self.elfhead['e_shentsize']
-        Snum = self.elfhead['e_shnum']
-        Sdata = self.elfdata[self.elfhead['e_shoff'] : self.elfhead['e_shoff'] + Snum * Ssize]
-
-        for i in range(Snum):
-            S = {}
-            S['sh_name'] = ql.unpack32(Sdata[i * Ssize : i * Ssize + 4])
-            S['sh_type'] = ql.unpack32(Sdata[i * Ssize + 4 : i * Ssize + 8])
-            S['sh_flags'] = ql.unpack64(Sdata[i * Ssize + 8 : i * Ssize + 16])
-            S['sh_addr'] = ql.unpack64(Sdata[i * Ssize + 16 : i * Ssize + 24])
-            S['sh_offset'] = ql.unpack64(Sdata[i * Ssize + 24 : i * Ssize + 32])
-            S['sh_size'] = ql.unpack64(Sdata[i * Ssize + 32 : i * Ssize + 40])
-            S['sh_link'] = ql.unpack32(Sdata[i * Ssize + 40 : i * Ssize + 44])
-            S['sh_info'] = ql.unpack32(Sdata[i * Ssize + 44 : i * Ssize + 48])
-            S['sh_addralign'] = ql.unpack64(Sdata[i * Ssize + 48 : i * Ssize + 56])
-            S['sh_entsize'] = ql.unpack64(Sdata[i * Ssize + 56 : i * Ssize + 64])
-            S['data'] = self.elfdata[S['sh_offset'] : S['sh_offset'] + S['sh_size']]
-            yield S
-        return
+        return self.elfhead
+
+    def parse_program_header(self, ql):
+        return iter(self.phdrs)
 
     def parse_section_header(self, ql):
-        if ql.archbit == 64:
-            return self.parse_section_header64(ql)
-        elif ql.archbit == 32:
-            return self.parse_section_header32(ql)
-
-    def parse_program_header32(self, ql):
-        # typedef struct elf32_phdr{
-        # Elf32_Word	p_type;
-        # Elf32_Off	p_offset;
-        # Elf32_Addr	p_vaddr;
-        # Elf32_Addr	p_paddr;
-        # Elf32_Word	p_filesz;
-        # Elf32_Word	p_memsz;
-        # Elf32_Word	p_flags;
-        # Elf32_Word	p_align;
-        # } Elf32_Phdr;
-
-        # /* 32-bit ELF base types. */
-        # typedef uint32_t Elf32_Addr;
-        # typedef uint16_t Elf32_Half;
-        # typedef uint32_t Elf32_Off;
-        # typedef int32_t  Elf32_Sword;
-        # typedef uint32_t Elf32_Word;
-
-        Psize = self.elfhead['e_phentsize']
-        Pnum = self.elfhead['e_phnum']
-        Pdata = self.elfdata[self.elfhead['e_phoff'] : self.elfhead['e_phoff'] + Pnum * Psize]
-
-        for i in range(Pnum):
-            P = {}
-            P['p_type'] = ql.unpack32(Pdata[i * Psize : i * Psize + 4 ])
-            P['p_offset'] = ql.unpack32(Pdata[i * Psize + 4 : i * Psize + 8 ])
-            P['p_vaddr'] = ql.unpack32(Pdata[i * Psize + 8 : i * Psize + 12 ])
-            P['p_paddr'] = ql.unpack32(Pdata[i * Psize + 12 : i * Psize + 16 ])
-            P['p_filesz'] = ql.unpack32(Pdata[i * Psize + 16 : i * Psize + 20 ])
-            P['p_memsz'] = ql.unpack32(Pdata[i * Psize + 20 : i * Psize + 24 ])
-            P['p_flags'] = ql.unpack32(Pdata[i * Psize + 24 : i * Psize + 28 ])
-            P['p_align'] = ql.unpack32(Pdata[i * Psize + 28 : i * Psize + 32])
-            yield P
-        return
-
-    def parse_program_header64(self, ql):
-        # typedef struct elf64_phdr {
-        # Elf64_Word p_type;
-        # Elf64_Word p_flags;
-        # Elf64_Off p_offset;		/* Segment file offset */
-        # Elf64_Addr p_vaddr;		/* Segment virtual address */
-        # Elf64_Addr p_paddr;		/* Segment physical address */
-        # Elf64_Xword p_filesz;		/* Segment size in file */
-        # Elf64_Xword p_memsz;		/* Segment size in memory */
-        # Elf64_Xword p_align;		/* Segment alignment, file & memory */
-        # } Elf64_Phdr;
-
-        # /* 64-bit ELF base types. */
-        # typedef uint64_t Elf64_Addr;
-        # typedef uint16_t Elf64_Half;
-        # typedef int16_t	 Elf64_SHalf;
-        # typedef uint64_t Elf64_Off;
-        # typedef int32_t	 Elf64_Sword;
-        # typedef uint32_t Elf64_Word;
-        # typedef uint64_t Elf64_Xword;
-        # typedef int64_t  Elf64_Sxword;
-
-        Psize = self.elfhead['e_phentsize']
-        Pnum = self.elfhead['e_phnum']
-        Pdata = self.elfdata[self.elfhead['e_phoff'] : self.elfhead['e_phoff'] + Pnum * Psize]
-
-        for i in range(Pnum):
-            P = {}
-            P['p_type'] = ql.unpack32(Pdata[i * Psize : i * Psize + 4 ])
-            P['p_flags'] = ql.unpack32(Pdata[i * Psize + 4 : i * Psize + 8 ])
-            P['p_offset'] = ql.unpack64(Pdata[i * Psize + 8 : i * Psize + 16 ])
-            P['p_vaddr'] = ql.unpack64(Pdata[i * Psize + 16 : i * Psize + 24 ])
-            P['p_paddr'] = ql.unpack64(Pdata[i * Psize + 24 : i * Psize + 32 ])
-            P['p_filesz'] = ql.unpack64(Pdata[i * Psize + 32 : i * Psize + 40 ])
-            P['p_memsz'] = ql.unpack64(Pdata[i * Psize + 40 : i * Psize + 48 ])
-            P['p_align'] = ql.unpack64(Pdata[i * Psize + 48 : i * Psize + 56])
-            yield P
-        return
+        if self.shdrs == None:
+            shdrs = self.unpack_table(self.shdr_struct, self.elfhead['e_shoff'], self.elfhead['e_shnum'], self.elfhead['e_shentsize'])
+            self.shdrs = [ELFSection(self, S) for S in shdrs]
+        return iter(self.shdrs)
+
+    def getstr(self, offset):
+        end = self.elfdata.find(b'\x00', offset)
+        if end < 0:
+            end = len(self.elfdata)
+        return self.elfdata[offset : end].decode('utf-8', errors = 'ignore')
+
+    # section header named @name, None when there is none
+    def get_section(self, name):
+        if self.sections == None:
+            shdrs = list(self.parse_section_header(self.ql))
+            self.sections = {}
+            if self.elfhead['e_shstrndx'] < len(shdrs):
+                strtab = shdrs[self.elfhead['e_shstrndx']]['sh_offset']
+                for S in shdrs:
+                    self.sections.setdefault(self.getstr(strtab + S['sh_name']), S)
+        return self.sections.get(name)
+
+    # name => symbol of .symtab and .dynsym, .symtab wins
+    def get_symbols(self):
+        if self.symbols == None:
+            shdrs = list(self.parse_section_header(self.ql))
+            self.symbols = {}
+            for sh_type in (SHT_SYMTAB, SHT_DYNSYM):
+                for S in shdrs:
+                    if S['sh_type'] != sh_type or S['sh_link'] >= len(shdrs):
+                        continue
+                    strtab = shdrs[S['sh_link']]['sh_offset']
+                    entsize = S['sh_entsize'] or self.sym_struct[0].size
+                    for sym in self.unpack_table(self.sym_struct, S['sh_offset'], S['sh_size'] // entsize, entsize):
+                        if sym['st_name'] != 0:
+                            self.symbols.setdefault(self.getstr(strtab + sym['st_name']), sym)
+        return self.symbols
+
+    # symbol named @name, None when there is none
+    def get_symbol(self, name):
+        return self.get_symbols().get(name)
 
-    def parse_program_header(self, ql):
-        if ql.archbit == 64:
-            return self.parse_program_header64(ql)
-        elif ql.archbit == 32:
-            return self.parse_program_header32(ql)
 
 class ELFLoader(ELFParse):
     def __init__(self, path, ql):
@@ -386,20 +275,14 @@ class ELFLoader(ELFParse):
 
     def copy_str(self, uc, addr, l):
         l_addr = []
+        writes = []
         s_addr = addr
         for i in l:
             s_addr = s_addr - len(i) - 1
-            # if isinstance(i, bytes):
-            #     # ql.nprint(type(b'\x00'))
-            # ql.nprint(type(i))
-            # ql.nprint(i)
-            # ql.nprint(type(i.encode()))
-            # ql.nprint(type(addr))
-            #     uc.mem_write(s_addr, i + b'\x00')
-            # else:
-            
-            uc.mem_write(s_addr, i.encode() + b'\x00')
+            writes.append((s_addr, i.encode() + b'\x00'))
             l_addr.append(s_addr)
+        # the strings sit back to back below addr, one write for all of them
+        self.ql.mem_write_many(writes)
         return l_addr, s_addr
 
     def alignment(self, val, ql):
@@ -450,6 +333,7 @@ class ELFLoader(ELFParse):
             loadbase = 0
         elif elfhead['e_type'] != ET_DYN:
             ql.nprint(">>> Some error in head e_type!")
+            self.close()
             return -1
 
         uc.mem_map(loadbase + mem_start, mem_end - mem_start)
@@ -459,6 +343,7 @@ class ELFLoader(ELFParse):
             if i['p_type'] == PT_LOAD:
                 uc.mem_write(loadbase + i['p_vaddr'], super().getelfdata(i['p_offset'], i['p_filesz']))
                 ql.dprint(">>> load 0x%x - 0x%x"%(loadbase + i['p_vaddr'], loadbase + i['p_vaddr'] + i['p_filesz']))
+        self.close()
 
 
         entry_point = elfhead['e_entry'] + loadbase
@@ -467,6 +352,7 @@ class ELFLoader(ELFParse):
 
 
         ql.brk_address = mem_end + loadbase
+        ql.brk_start = ql.brk_address
 
         # Load interpreter if there is an interpreter
         interp_base = 0
@@ -501,6 +387,7 @@ class ELFLoader(ELFParse):
             for i in interp.parse_program_header(ql):
                 if i['p_type'] == PT_LOAD:
                     uc.mem_write(interp_base + i['p_vaddr'], interp.getelfdata(i['p_offset'], i['p_filesz']))
+            interp.close()
             entry_point = interphead['e_entry'] + interp_base
 
         # Set MMAP addr
@@ -525,10 +412,7 @@ class ELFLoader(ELFParse):
         if len(argv) != 0:
             argv_addr, new_stack = self.copy_str(uc, stack_addr, argv)
 
-            if ql.archbit == 32:
-                elf_table += b''.join([ql.pack32(_) for _ in argv_addr])
-            elif ql.archbit == 64:
-                elf_table += b''.join([ql.pack64(_) for _ in argv_addr])
+            elf_table += ql.pack_ptrs(argv_addr)
 
         if ql.archbit == 32:
             elf_table += ql.pack32(0)
@@ -539,10 +423,7 @@ class ELFLoader(ELFParse):
         # Set env
         if len(env) != 0:
             env_addr, new_stack = self.copy_str(uc, new_stack, [key + '=' + value for key, value in env.items()])
-            if ql.archbit == 32:
-                elf_table += b''.join([ql.pack32(_) for _ in env_addr])
-            elif ql.archbit == 64:
-                elf_table += b''.join([ql.pack64(_) for _ in env_addr])
+            elf_table += ql.pack_ptrs(env_addr)
 
         if ql.archbit == 32:
             elf_table += ql.pack32(0)
@@ -77,8 +77,10 @@ class Process:
         dll_base = self.ql.DLL_LAST_ADDR
         dll_len = align(len(bytes(data)), 0x1000)
         self.ql.DLL_SIZE += dll_len
-        self.ql.uc.mem_map(dll_base, dll_len)
-        self.ql.uc.mem_write(dll_base, bytes(data))
+        # with libcache the image is shared with every other emulator loading it
+        if not (self.ql.libcache and QL_MEM_MAP_FILE and ql_mem_map_image(self.ql, self.ql.uc, dll_base, data, fcache)):
+            self.ql.uc.mem_map(dll_base, dll_len)
+            self.ql.uc.mem_write(dll_base, bytes(data))
         self.ql.DLL_LAST_ADDR += dll_len
 
         # add dll to ldr data
@@ -197,9 +199,11 @@ class Process:
             flink.InInitializationOrderModuleList['Flink'] = ldr_table_entry.base + 4 * self.ql.pointersize
             blink.InInitializationOrderModuleList['Blink'] = ldr_table_entry.base + 4 * self.ql.pointersize
 
-            self.ql.uc.mem_write(flink.base, flink.bytes())
-            self.ql.uc.mem_write(blink.base, blink.bytes())
-            self.ql.uc.mem_write(ldr_table_entry.base, ldr_table_entry.bytes())
+            self.ql.mem_write_many([
+                (flink.base, flink.bytes()),
+                (blink.base, blink.bytes()),
+                (ldr_table_entry.base, ldr_table_entry.bytes()),
+            ])
         else:
             flink = self.ldr_list[-1]
             blink = self.LDR
@@ -217,9 +221,11 @@ class Process:
             flink.InInitializationOrderLinks['Flink'] = ldr_table_entry.base + 4 * self.ql.pointersize
             blink.InInitializationOrderModuleList['Blink'] = ldr_table_entry.base + 4 * self.ql.pointersize
 
-            self.ql.uc.mem_write(flink.base, flink.bytes())
-            self.ql.uc.mem_write(blink.base, blink.bytes())
-            self.ql.uc.mem_write(ldr_table_entry.base, ldr_table_entry.bytes())
+            self.ql.mem_write_many([
+                (flink.base, flink.bytes()),
+                (blink.base, blink.bytes()),
+                (ldr_table_entry.base, ldr_table_entry.bytes()),
+            ])
 
         self.ldr_list.append(ldr_table_entry)
 
@@ -310,15 +316,9 @@ class PE(Process):
         for entry in self.pe.DIRECTORY_ENTRY_IMPORT:
             dll_name = entry.dll
             super().load_dll(dll_name)
-            for imp in entry.imports:
-                # fix IAT
-                # self.ql.nprint(imp.name)
-                # self.ql.nprint(self.import_address_table[imp.name])
-                if self.ql.arch == QL_X86:
-                    address = self.ql.pack32(self.import_address_table[imp.name])
-                else:
-                    address = self.ql.pack64(self.import_address_table[imp.name])
-                self.ql.uc.mem_write(imp.address, address)
+            # fix IAT, the thunks of a dll mostly follow on from each other
+            self.ql.mem_write_many(
+                (imp.address, self.ql.pack(self.import_address_table[imp.name])) for imp in entry.imports)
 
         self.ql.nprint(">>> Done with loading %s" % self.path)
         self.filepath = b"D:\\" + bytes(self.path.replace("/", "\\"), "utf-8")
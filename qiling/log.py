@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+#
+# Cross Platform and Multi Architecture Advanced Binary Emulation Framework
+# Built on top of Unicorn emulator (www.unicorn-engine.org)
+#
+# LAU kaijern (xwings) <kj@qiling.io>
+# NGUYEN Anh Quynh <aquynh@gmail.com>
+# DING tianZe (D1iv3) <dddliv3@gmail.com>
+# SUN bowen (w1tcher) <w1tcher.bupt@gmail.com>
+# CHEN huitao (null) <null@qiling.io>
+# YU tong (sp1ke) <spikeinhouse@gmail.com>
+
+"""
+Buffered log output of a Qiling instance. Records are formatted only when their
+level is enabled and are written by a background thread, so the emulator never
+waits on the console or the log file.
+"""
+
+import sys, os, queue, threading, atexit
+
+from qiling.arch.filetype import *
+
+
+QL_LOG_DEBUG    = 10
+QL_LOG_INFO     = 20
+QL_LOG_ERROR    = 40
+QL_LOG_OFF      = 100
+
+# lines waiting for the writer thread, the emulator blocks once it is full
+QL_LOG_BUFFER_SIZE = 0x4000
+
+
+# one writer thread serves every Qiling instance of the process, so instances do
+# not keep a thread alive and the thread does not keep instances alive
+class QlLogWriter:
+    def __init__(self):
+        self.buffer = queue.Queue(QL_LOG_BUFFER_SIZE)
+        self.thread = None
+        # the error the writer thread stopped writing on
+        self.error = None
+
+
+    # raises the error of the writer once it failed, instead of buffering for it
+    def put(self, fd, line):
+        if self.error != None:
+            raise self.error
+        if self.thread == None:
+            self.thread = threading.Thread(target = self.__write, daemon = True)
+            self.thread.start()
+        self.buffer.put((fd, line))
+
+
+    # wait until every buffered line has been written
+    def flush(self):
+        if self.thread != None:
+            self.buffer.join()
+
+
+    def __write(self):
+        buffer = self.buffer
+        while True:
+            records = [buffer.get()]
+            # write whatever piled up in one go
+            while len(records) < QL_LOG_BUFFER_SIZE:
+                try:
+                    records.append(buffer.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                if self.error == None:
+                    self.__write_records(records)
+            except Exception as e:
+                # e.g. stdout piped into head or a full disk, later lines are dropped
+                self.error = e
+            finally:
+                for _ in records:
+                    buffer.task_done()
+
+
+    def __write_records(self, records):
+        files = set()
+        for fd, line in records:
+            if fd != None:
+                fd.write(line)
+                files.add(fd)
+            sys.stdout.write(line)
+
+        for fd in files:
+            fd.flush()
+        sys.stdout.flush()
+
+
+ql_log_writer = QlLogWriter()
+atexit.register(lambda: ql_log_writer.flush())
+
+
+# log argument that joins items, each formatted with fmt, only when the record
+# is formatted
+class QlLogJoin:
+    def __init__(self, sep, items, fmt = "%s"):
+        self.sep = sep
+        self.items = items
+        self.fmt = fmt
+
+
+    def __str__(self):
+        return self.sep.join(self.fmt % item for item in self.items)
+
+
+class QlLogger:
+    def __init__(self, ql):
+        self.ql = ql
+
+
+    # level of the least important record that is emitted, follows ql.output
+    def level(self):
+        if not self.ql.consolelog or self.ql.output == QL_OUT_OFF:
+            return QL_LOG_OFF
+        elif self.ql.output in (QL_OUT_DEBUG, QL_OUT_DUMP):
+            return QL_LOG_DEBUG
+        else:
+            return QL_LOG_INFO
+
+
+    def enabled(self, level):
+        return level >= self.level()
+
+
+    # msg % args is only built when the level is enabled
+    def log(self, level, msg, args = ()):
+        if level < self.level():
+            return
+
+        msg = str(msg)
+        if args:
+            msg = msg % args
+
+        # tag lines with the emulated thread once the main thread is not alone
+        thread_management = self.ql.thread_management
+        if thread_management != None and thread_management.cur_thread != None and \
+                (thread_management.cur_thread is not thread_management.main_thread or \
+                len(thread_management.running_thread_list) + len(thread_management.blocking_thread_list) > 1):
+            msg = "[Thread %i] %s" % (thread_management.cur_thread.thread_id, msg)
+
+        ql_log_writer.put(self.ql.log_file_fd, msg + "\n")
+
+
+    def flush(self):
+        ql_log_writer.flush()
+
+
+    # call in the child after os.fork(): the writer thread did not survive the fork,
+    # and the child gets a log file of its own
+    def fork(self):
+        global ql_log_writer
+        ql_log_writer = QlLogWriter()
+        if self.ql.log_file_name != None:
+            self.ql.log_file_fd = open(self.ql.log_file_name + "_" + str(os.getpid()) + ".qlog", 'w+')
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+#
+# Cross Platform and Multi Architecture Advanced Binary Emulation Framework
+# Built on top of Unicorn emulator (www.unicorn-engine.org)
+#
+# LAU kaijern (xwings) <kj@qiling.io>
+# NGUYEN Anh Quynh <aquynh@gmail.com>
+# DING tianZe (D1iv3) <dddliv3@gmail.com>
+# SUN bowen (w1tcher) <w1tcher.bupt@gmail.com>
+# CHEN huitao (null) <null@qiling.io>
+# YU tong (sp1ke) <spikeinhouse@gmail.com>
+
+"""
+Index of the labelled memory regions of an emulator, ql.map_info. Regions never
+overlap and are kept sorted in parallel start, end and label lists, so inserting
+and looking up an address is a binary search plus a splice around the hit,
+instead of rebuilding and scanning the whole map.
+"""
+
+import os
+from bisect import bisect_left, bisect_right
+
+
+class QlMapInfo:
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.infos = []
+        # file name => base address, rebuilt after the map changed
+        self.bases = None
+
+
+    def __len__(self):
+        return len(self.starts)
+
+
+    # (start, end, info) of every region by address
+    def __iter__(self):
+        return zip(self.starts, self.ends, self.infos)
+
+
+    def copy(self):
+        map_info = QlMapInfo()
+        map_info.starts = list(self.starts)
+        map_info.ends = list(self.ends)
+        map_info.infos = list(self.infos)
+        return map_info
+
+
+    def clear(self):
+        self.starts, self.ends, self.infos = [], [], []
+        self.bases = None
+
+
+    # label [mem_s, mem_e) with mem_info: regions it overlaps are cut back or
+    # replaced, and neighbours with the same label are merged with it
+    def insert(self, mem_s, mem_e, mem_info):
+        starts, ends, infos = self.starts, self.ends, self.infos
+
+        # regions i .. j - 1 overlap the new one
+        i = bisect_right(ends, mem_s)
+        j = bisect_left(starts, mem_e)
+
+        pieces = []
+        if i > 0:
+            pieces.append([starts[i - 1], ends[i - 1], infos[i - 1]])
+        if i < j and starts[i] < mem_s:
+            pieces.append([starts[i], mem_s, infos[i]])
+        pieces.append([mem_s, mem_e, mem_info])
+        if i < j and ends[j - 1] > mem_e:
+            pieces.append([mem_e, ends[j - 1], infos[j - 1]])
+        if j < len(starts):
+            pieces.append([starts[j], ends[j], infos[j]])
+
+        merged = [pieces[0]]
+        for piece in pieces[1 : ]:
+            if piece[0] == merged[-1][1] and piece[2] == merged[-1][2]:
+                merged[-1][1] = piece[1]
+            else:
+                merged.append(piece)
+
+        lo = max(i - 1, 0)
+        hi = min(j + 1, len(starts))
+        starts[lo : hi] = [piece[0] for piece in merged]
+        ends[lo : hi] = [piece[1] for piece in merged]
+        infos[lo : hi] = [piece[2] for piece in merged]
+        self.bases = None
+
+
+    # drop the labels of [mem_s, mem_e), regions it overlaps are cut back
+    def remove(self, mem_s, mem_e):
+        starts, ends, infos = self.starts, self.ends, self.infos
+
+        i = bisect_right(ends, mem_s)
+        j = bisect_left(starts, mem_e)
+        if i >= j:
+            return
+
+        pieces = []
+        if starts[i] < mem_s:
+            pieces.append((starts[i], mem_s, infos[i]))
+        if ends[j - 1] > mem_e:
+            pieces.append((mem_e, ends[j - 1], infos[j - 1]))
+
+        starts[i : j] = [piece[0] for piece in pieces]
+        ends[i : j] = [piece[1] for piece in pieces]
+        infos[i : j] = [piece[2] for piece in pieces]
+        self.bases = None
+
+
+    # (start, end, info) of the region holding address, None if unlabelled
+    def lookup(self, address):
+        i = bisect_right(self.starts, address) - 1
+        if i >= 0 and address < self.ends[i]:
+            return (self.starts[i], self.ends[i], self.infos[i])
+        return None
+
+
+    # lowest address a file named filename is mapped at, -1 if it is not
+    def base_of(self, filename):
+        if self.bases == None:
+            self.bases = {}
+            for s, info in zip(self.starts, self.infos):
+                self.bases.setdefault(os.path.split(info)[1], s)
+        return self.bases.get(filename, -1)
@@ -16,12 +16,6 @@ import sys
 from unicorn import *
 from unicorn.x86_const import *
 
-from capstone import *
-from capstone.x86_const import *
-
-from keystone import *
-from keystone.x86_const import *
-
 from struct import pack
 import os
 
@@ -44,33 +38,25 @@ QL_X8664_EMU_END = 0xffffffffffffffff
 
 def hook_syscall(uc, ql):
     syscall_num  = uc.reg_read(UC_X86_REG_RAX)
-    param0 = uc.reg_read(UC_X86_REG_RDI)
-    param1 = uc.reg_read(UC_X86_REG_RSI)
-    param2 = uc.reg_read(UC_X86_REG_RDX)
-    param3 = uc.reg_read(UC_X86_REG_R10)
-    param4 = uc.reg_read(UC_X86_REG_R8)
-    param5 = uc.reg_read(UC_X86_REG_R9)
-    pc = uc.reg_read(UC_X86_REG_RIP)
-
-    freebsd_syscall_numb_list = []
-    freebsd_syscall_func_list = []
-
-    for i in X8664_FREEBSD_SYSCALL:
-        freebsd_syscall_numb_list.append(i[0])
-        freebsd_syscall_func_list.append(i[1])
-
-    if any(freebsd_syscall_numb == syscall_num for freebsd_syscall_numb in freebsd_syscall_numb_list):
-        freebsd_syscall_index = freebsd_syscall_numb_list.index(syscall_num)
-        FREEBSD_SYSCALL_FUNC= eval(freebsd_syscall_func_list[freebsd_syscall_index])
+    FREEBSD_SYSCALL_FUNC = ql.syscall_table.get(syscall_num)
+
+    if FREEBSD_SYSCALL_FUNC is not None:
+        param0 = uc.reg_read(UC_X86_REG_RDI)
+        param1 = uc.reg_read(UC_X86_REG_RSI)
+        param2 = uc.reg_read(UC_X86_REG_RDX)
+        param3 = uc.reg_read(UC_X86_REG_R10)
+        param4 = uc.reg_read(UC_X86_REG_R8)
+        param5 = uc.reg_read(UC_X86_REG_R9)
         try:
             FREEBSD_SYSCALL_FUNC(ql, uc, param0, param1, param2, param3, param4, param5)
         except:
             ql.errmsg = 1
-            ql.nprint("SYSCALL: ", freebsd_syscall_func_list[freebsd_syscall_index])
+            ql.nprint("SYSCALL: %s", FREEBSD_SYSCALL_FUNC.__name__)
             uc.emu_stop()
             if ql.output in (QL_OUT_DEBUG, QL_OUT_DUMP):
                 raise
     else:
+        pc = uc.reg_read(UC_X86_REG_RIP)
         ql.nprint("0x%x: syscall number = 0x%x(%d) not implement." %(pc, syscall_num, syscall_num))
 
 
@@ -101,6 +87,7 @@ def runner(ql):
     ql.uc.reg_write(UC_X86_REG_RSP, ql.stack_address)
     ql.uc.reg_write(UC_X86_REG_RDI, ql.stack_address + 8)
     ql_setup(ql)
+    ql_setup_syscall_table(ql, X8664_FREEBSD_SYSCALL, globals())
     ql.hook_insn(hook_syscall, ql, 1, 0, UC_X86_INS_SYSCALL)
     ql_x8664_setup_gdt_segment_ds(ql, ql.uc)
     ql_x8664_setup_gdt_segment_cs(ql, ql.uc)
@@ -119,7 +106,7 @@ def runner(ql):
             ql.show_map_info()
 
             buf = ql.uc.mem_read(ql.pc, 8)
-            ql.nprint(">>> ", [hex(_) for _ in buf])
+            ql.nprint(">>> %s", [hex(_) for _ in buf])
             ql_hook_code_disasm(ql.uc, ql.pc, 64, ql)
         ql.errmsg = 1
         ql.nprint("%s" % e)  
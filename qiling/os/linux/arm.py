@@ -17,12 +17,6 @@ import sys
 from unicorn import *
 from unicorn.arm_const import *
 
-from capstone import *
-from capstone.arm_const import *
-
-from keystone import *
-from keystone.arm_const import *
-
 from struct import pack
 import os
 
@@ -53,32 +47,20 @@ def ql_arm_check_thumb(uc, reg_cpsr):
 
 def hook_syscall(uc, intno, ql):
     syscall_num = uc.reg_read(UC_ARM_REG_R7)
-    param0 = uc.reg_read(UC_ARM_REG_R0)
-    param1 = uc.reg_read(UC_ARM_REG_R1)
-    param2 = uc.reg_read(UC_ARM_REG_R2)
-    param3 = uc.reg_read(UC_ARM_REG_R3)
-    param4 = uc.reg_read(UC_ARM_REG_R4)
-    param5 = uc.reg_read(UC_ARM_REG_R5)
-    reg_cpsr = uc.reg_read(UC_ARM_REG_CPSR)
-    pc = uc.reg_read(UC_ARM_REG_PC)
-
-    ql_arm_check_thumb(uc, reg_cpsr)
-
-    linux_syscall_numb_list = []
-    linux_syscall_func_list = []
-
-    for i in ARM_LINUX_SYSCALL:
-        linux_syscall_numb_list.append(i[0])
-        linux_syscall_func_list.append(i[1])
-
-    if any(linux_syscall_numb == syscall_num for linux_syscall_numb in linux_syscall_numb_list):
-        linux_syscall_index = linux_syscall_numb_list.index(syscall_num)
-        LINUX_SYSCALL_FUNC= eval(linux_syscall_func_list[linux_syscall_index])
+    LINUX_SYSCALL_FUNC = ql.syscall_table.get(syscall_num)
+
+    if LINUX_SYSCALL_FUNC is not None:
+        param0 = uc.reg_read(UC_ARM_REG_R0)
+        param1 = uc.reg_read(UC_ARM_REG_R1)
+        param2 = uc.reg_read(UC_ARM_REG_R2)
+        param3 = uc.reg_read(UC_ARM_REG_R3)
+        param4 = uc.reg_read(UC_ARM_REG_R4)
+        param5 = uc.reg_read(UC_ARM_REG_R5)
         try:
             LINUX_SYSCALL_FUNC(ql, uc, param0, param1, param2, param3, param4, param5)
         except:
             ql.errmsg = 1
-            ql.nprint("SYSCALL: ", linux_syscall_func_list[linux_syscall_index])
+            ql.nprint("SYSCALL: %s", LINUX_SYSCALL_FUNC.__name__)
             
             if ql.output in (QL_OUT_DEBUG, QL_OUT_DUMP):
                 td = ql.thread_management.cur_thread
@@ -87,6 +69,7 @@ def hook_syscall(uc, intno, ql):
                 uc.emu_stop()
                 raise
     else:
+        pc = uc.reg_read(UC_ARM_REG_PC)
         ql.nprint("0x%x: syscall number = 0x%x(%d) not implement." %(pc, syscall_num, syscall_num))
         if ql.output in (QL_OUT_DEBUG, QL_OUT_DUMP):
             td = ql.thread_management.cur_thread
@@ -99,7 +82,7 @@ def exec_shellcode(ql, uc, start, shellcode):
     if ql.shellcode_init == 0:
         uc.mem_map(QL_SHELLCODE_ADDR, QL_SHELLCODE_LEN)
         ql.shellcode_init = 1
-    uc.mem_write(QL_SHELLCODE_ADDR + start, shellcode)
+    ql.mem_write(QL_SHELLCODE_ADDR + start, shellcode)
 
 
 def ql_arm_enable_vfp(uc):
@@ -155,11 +138,11 @@ def ql_syscall_arm_settls(ql, uc, address, null0, null1, null2, null3, null4):
     codelen = 0
     if mode == UC_MODE_THUMB:
         codelen = 1
-    uc.mem_write(SP - 4, ql.pack32(PC + codelen))
+    ql.mem_write(SP - 4, ql.pack32(PC + codelen))
     uc.reg_write(UC_ARM_REG_SP, SP - 4)
     uc.reg_write(UC_ARM_REG_PC, QL_SHELLCODE_ADDR + codestart + codelen)
 
-    uc.mem_write(QL_KERNEL_GET_TLS_ADDR + 12, ql.pack32(address))
+    ql.mem_write(QL_KERNEL_GET_TLS_ADDR + 12, ql.pack32(address))
     uc.reg_write(UC_ARM_REG_R0, address)
 
 
@@ -202,12 +185,12 @@ def ql_arm_thread_set_tls(ql, th, arg):
     codelen = 0
     if mode == UC_MODE_THUMB:
         codelen = 1
-    uc.mem_write(SP - 4, ql.pack32(PC + codelen))
-    uc.mem_write(SP - 8, ql.pack32(old_r0))
+    ql.mem_write(SP - 4, ql.pack32(PC + codelen))
+    ql.mem_write(SP - 8, ql.pack32(old_r0))
     uc.reg_write(UC_ARM_REG_SP, SP - 8)
     uc.reg_write(UC_ARM_REG_PC, QL_SHELLCODE_ADDR + codestart + codelen)
 
-    uc.mem_write(QL_KERNEL_GET_TLS_ADDR + 12, ql.pack32(address))
+    ql.mem_write(QL_KERNEL_GET_TLS_ADDR + 12, ql.pack32(address))
     uc.reg_write(UC_ARM_REG_R0, address)
 
 
@@ -231,12 +214,13 @@ def loader_shellcode(ql):
         ql.stack_size = 2 * 1024 * 1024
         uc.mem_map(ql.stack_address, ql.stack_size)
     ql.stack_address  = (ql.stack_address + 0x200000 - 0x1000)
-    ql.uc.mem_write(ql.stack_address, ql.shellcoder) 
+    ql.mem_write(ql.stack_address, ql.shellcoder) 
 
 
 def runner(ql):
     ql.uc.reg_write(UC_ARM_REG_SP, ql.stack_address)
     ql_setup(ql)
+    ql_setup_syscall_table(ql, ARM_LINUX_SYSCALL, globals())
     ql.hook_intr(hook_syscall, ql)
     ql_arm_enable_vfp(ql.uc)
     ql_arm_init_kernel_get_tls(ql.uc)
@@ -278,7 +262,7 @@ def runner(ql):
             ql.show_map_info()
 
             buf = ql.uc.mem_read(ql.pc, 8)
-            ql.nprint(">>> ", [hex(_) for _ in buf])
+            ql.nprint(">>> %s", [hex(_) for _ in buf])
             ql_hook_code_disasm(ql.uc, ql.pc, 64, ql)
         ql.errmsg = 1
         ql.nprint("%s" % e)  
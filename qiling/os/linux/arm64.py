@@ -16,12 +16,6 @@ import sys
 from unicorn import *
 from unicorn.arm64_const import *
 
-from capstone import *
-from capstone.arm64_const import *
-
-from keystone import *
-from keystone.arm64_const import *
-
 from struct import pack
 import os
 
@@ -42,33 +36,25 @@ QL_ARM64_EMU_END = 0xffffffffffffffff
 
 def hook_syscall(uc, intno, ql):
     syscall_num  = uc.reg_read(UC_ARM64_REG_X8)
-    param0 = uc.reg_read(UC_ARM64_REG_X0)
-    param1 = uc.reg_read(UC_ARM64_REG_X1)
-    param2 = uc.reg_read(UC_ARM64_REG_X2)
-    param3 = uc.reg_read(UC_ARM64_REG_X3)
-    param4 = uc.reg_read(UC_ARM64_REG_X4)
-    param5 = uc.reg_read(UC_ARM64_REG_X5)
-    pc = uc.reg_read(UC_ARM64_REG_PC)
-
-    linux_syscall_numb_list = []
-    linux_syscall_func_list = []
-
-    for i in ARM64_LINUX_SYSCALL:
-        linux_syscall_numb_list.append(i[0])
-        linux_syscall_func_list.append(i[1])
-
-    if any(linux_syscall_numb == syscall_num for linux_syscall_numb in linux_syscall_numb_list):
-        linux_syscall_index = linux_syscall_numb_list.index(syscall_num)
-        LINUX_SYSCALL_FUNC= eval(linux_syscall_func_list[linux_syscall_index])
+    LINUX_SYSCALL_FUNC = ql.syscall_table.get(syscall_num)
+
+    if LINUX_SYSCALL_FUNC is not None:
+        param0 = uc.reg_read(UC_ARM64_REG_X0)
+        param1 = uc.reg_read(UC_ARM64_REG_X1)
+        param2 = uc.reg_read(UC_ARM64_REG_X2)
+        param3 = uc.reg_read(UC_ARM64_REG_X3)
+        param4 = uc.reg_read(UC_ARM64_REG_X4)
+        param5 = uc.reg_read(UC_ARM64_REG_X5)
         try:
             LINUX_SYSCALL_FUNC(ql, uc, param0, param1, param2, param3, param4, param5)
         except:
             ql.errmsg = 1
-            ql.nprint("SYSCALL: ", linux_syscall_func_list[linux_syscall_index])
+            ql.nprint("SYSCALL: %s", LINUX_SYSCALL_FUNC.__name__)
             if ql.output in (QL_OUT_DEBUG, QL_OUT_DUMP):
                 uc.emu_stop()
                 raise
     else:
+        pc = uc.reg_read(UC_ARM64_REG_PC)
         ql.nprint("0x%x: syscall number = 0x%x(%d) not implement." %(pc, syscall_num, syscall_num))
         if ql.output in (QL_OUT_DEBUG, QL_OUT_DUMP):
             uc.emu_stop()
@@ -106,6 +92,7 @@ def loader_shellcode(ql):
 def runner(ql):
     ql.uc.reg_write(UC_ARM64_REG_SP, ql.stack_address)
     ql_setup(ql)
+    ql_setup_syscall_table(ql, ARM64_LINUX_SYSCALL, globals())
     ql.hook_intr(hook_syscall, ql)
     ql_arm64_enable_vfp(ql.uc)
     if (ql.until_addr == 0):
@@ -121,7 +108,7 @@ def runner(ql):
             ql.show_map_info()
 
             buf = ql.uc.mem_read(ql.pc, 8)
-            ql.nprint(">>> ", [hex(_) for _ in buf])
+            ql.nprint(">>> %s", [hex(_) for _ in buf])
             ql_hook_code_disasm(ql.uc, ql.pc, 64, ql)
         ql.errmsg = 1
         ql.nprint("%s" % e)  
@@ -16,12 +16,6 @@ import sys
 from unicorn import *
 from unicorn.mips_const import *
 
-from capstone import *
-from capstone.mips_const import *
-
-from keystone import *
-from keystone.mips_const import *
-
 from struct import pack
 import os
 
@@ -47,40 +41,33 @@ QL_MIPSEL_EMU_END = 0x8fffffff
 
 def hook_syscall(uc, intno, ql):
     syscall_num = uc.reg_read(UC_MIPS_REG_V0)
-    param0 = uc.reg_read(UC_MIPS_REG_A0)
-    param1 = uc.reg_read(UC_MIPS_REG_A1)
-    param2 = uc.reg_read(UC_MIPS_REG_A2)
-    param3 = uc.reg_read(UC_MIPS_REG_A3)
-    param4 = uc.reg_read(UC_MIPS_REG_SP)
-    param4 = param4 + 0x10
-    param5 = uc.reg_read(UC_MIPS_REG_SP)
-    param5 = param5 + 0x14
-    pc = uc.reg_read(UC_MIPS_REG_PC)
 
     if intno != 0x11:
         ql.nprint("got interrupt 0x%x ???" %intno)
         uc.emu_stop()
         return
 
-    linux_syscall_numb_list = []
-    linux_syscall_func_list = []
-
-    for i in MIPS32EL_LINUX_SYSCALL:
-        linux_syscall_numb_list.append(i[0])
-        linux_syscall_func_list.append(i[1])
-
-    if any(linux_syscall_numb == syscall_num for linux_syscall_numb in linux_syscall_numb_list):
-        linux_syscall_index = linux_syscall_numb_list.index(syscall_num)
-        LINUX_SYSCALL_FUNC= eval(linux_syscall_func_list[linux_syscall_index])
+    LINUX_SYSCALL_FUNC = ql.syscall_table.get(syscall_num)
+
+    if LINUX_SYSCALL_FUNC is not None:
+        param0 = uc.reg_read(UC_MIPS_REG_A0)
+        param1 = uc.reg_read(UC_MIPS_REG_A1)
+        param2 = uc.reg_read(UC_MIPS_REG_A2)
+        param3 = uc.reg_read(UC_MIPS_REG_A3)
+        param4 = uc.reg_read(UC_MIPS_REG_SP)
+        param4 = param4 + 0x10
+        param5 = uc.reg_read(UC_MIPS_REG_SP)
+        param5 = param5 + 0x14
         try:
             LINUX_SYSCALL_FUNC(ql, uc, param0, param1, param2, param3, param4, param5)
         except:
             ql.errmsg = 1
-            ql.nprint("SYSCALL: ", linux_syscall_func_list[linux_syscall_index])
+            ql.nprint("SYSCALL: %s", LINUX_SYSCALL_FUNC.__name__)
             if ql.output in (QL_OUT_DEBUG, QL_OUT_DUMP):
                 uc.emu_stop()
                 raise
     else:
+        pc = uc.reg_read(UC_MIPS_REG_PC)
         ql.nprint("0x%x: syscall number = 0x%x(%d) not implement." %(pc, syscall_num, syscall_num))
         if ql.output in (QL_OUT_DEBUG, QL_OUT_DUMP):
             uc.emu_stop()
@@ -184,10 +171,10 @@ lab1:
     sc = b"\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\xf8\xff\xbf\xaf\xf4\xff\xa4\xaf\xf0\xff\xa5\xaf\xec\xff\xa6\xaf\xe8\xff\xa7\xaf\xe4\xff\xa2\xaf\xe0\xff\xa3\xaf\xdc\xff\xa8\xaf\xff\xff\x06(\xff\xff\xd0\x04\x8c\x00\xe5'<\x00\xe8'\xfc\xff\xa4\x8f\x08\x00\x06$\t\xf8\x00\x01\x00\x00\x00\x00\xf8\xff\xbf\x8f\xf4\xff\xa4\x8f\xf0\xff\xa5\x8f\xec\xff\xa6\x8f\xe8\xff\xa7\x8f\xe4\xff\xa2\x8f\xe0\xff\xa3\x8f\xdc\xff\xa8\x8f\x00\x00\x00\x08\x00\x00\x00\x00%8\x00\x00%8\x00\x00\t\x00\x00\x10\x00\x00\x00\x00%\x10\xe0\x00%\x18\xa0\x00!\x18b\x00%\x10\xe0\x00!\x10\x82\x00\x00\x00c\x80\x00\x00C\xa0\x01\x00\xe7$%\x10\xe0\x00%\x18\xc0\x00+\x10C\x00\xf4\xff@\x14\x00\x00\x00\x00\x00\x00\x00\x00\x08\x00\xe0\x03\x00\x00\x00\x00".replace(b'\x00\x00\x00\x08', ql.pack32(0x08000000 ^ (addr // 4)), 1)
     sc = shellcode + sc[len(shellcode) :] + store_code
 
-    uc.mem_write(QL_SHELLCODE_ADDR, sc)
-    uc.mem_write(addr, b'\x00\x00\xc0\x0b\x00\x00\x00\x00')
+    ql.mem_write(QL_SHELLCODE_ADDR, sc)
+    ql.mem_write(addr, b'\x00\x00\xc0\x0b\x00\x00\x00\x00')
     sp = uc.reg_read(UC_MIPS_REG_SP)
-    uc.mem_write(sp - 4, ql.pack32(addr))
+    ql.mem_write(sp - 4, ql.pack32(addr))
 
 
 def ql_syscall_mips32el_set_thread_area(ql, uc, sta_area, null0, null1, null2, null3, null4):
@@ -219,12 +206,13 @@ def loader_shellcode(ql):
         ql.stack_size = 2 * 1024 * 1024
         uc.mem_map(ql.stack_address, ql.stack_size)
     ql.stack_address =  ql.stack_address  + 0x200000 - 0x1000
-    ql.uc.mem_write(ql.stack_address, ql.shellcoder) 
+    ql.mem_write(ql.stack_address, ql.shellcoder) 
 
 
 def runner(ql):
     ql.uc.reg_write(UC_MIPS_REG_SP, ql.new_stack)
     ql_setup(ql)
+    ql_setup_syscall_table(ql, MIPS32EL_LINUX_SYSCALL, globals())
     ql.hook_intr(hook_syscall, ql)
     if (ql.until_addr == 0):
         ql.until_addr = QL_MIPSEL_EMU_END
@@ -239,7 +227,7 @@ def runner(ql):
             ql.show_map_info()
 
             buf = ql.uc.mem_read(ql.pc, 8)
-            ql.nprint(">>> ", [hex(_) for _ in buf])
+            ql.nprint(">>> %s", [hex(_) for _ in buf])
             ql_hook_code_disasm(ql.uc, ql.pc, 64, ql)
         ql.errmsg = 1
         ql.nprint("%s" % e)  
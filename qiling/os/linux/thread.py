@@ -52,10 +52,6 @@ class Thread:
         self.thread_management = None
         self.current_path = ql.current_path
 
-        self.log_file_fd = None
-        if ql.separate_log_file and ql.log_file_name != None:
-            self.log_file_fd = open(ql.log_file_name + "_" + str(os.getpid()) + '.' + str(self.thread_id) + ".qlog", 'w+')
-            
         # For each thread, the kernel maintains two attributes (addresses)
         # called set_child_tid and clear_child_tid.  These two attributes
         # contain the value NULL by default.
@@ -93,7 +89,7 @@ class Thread:
         self.robust_list_head_len = None
 
         if self.set_child_tid_address != None:
-            self.ql.uc.mem_write(self.set_child_tid_address, ql.pack32(self.thread_id))
+            self.ql.mem_write(self.set_child_tid_address, ql.pack32(self.thread_id))
 
         GLOBAL_THREAD_ID += 1
     
@@ -161,7 +157,7 @@ class Thread:
     
     def _on_stop(self):
         if self.clear_child_tid_address != None:
-            self.ql.uc.mem_write(self.clear_child_tid_address, self.ql.pack32(0))
+            self.ql.mem_write(self.clear_child_tid_address, self.ql.pack32(0))
 
     def stop(self):
         self._on_stop()
@@ -230,10 +226,6 @@ class Thread:
         global GLOBAL_THREAD_ID
         GLOBAL_THREAD_ID = os.getpid()
     
-    def set_thread_log_file(self, log_file):
-        if self.ql.separate_log_file and log_file != None:
-            self.log_file_fd = open(log_file + "_" +str(os.getpid()) + '.' + str(self.thread_id) + ".qlog", 'w+')
-    
     def get_current_path(self):
         return self.current_path
     
@@ -368,3 +360,30 @@ class ThreadManagement:
         self.running_thread_list = []
         self.blocking_thread_list = []
         self.ending_thread_list = []
+
+    # the attributes of the manager and of every thread it knows, and the next
+    # tid; threads only rebind their attributes, so shallow copies are enough
+    def save(self):
+        threads = {}
+        for t in self.running_thread_list + self.blocking_thread_list + self.ending_thread_list + [self.cur_thread, self.main_thread]:
+            if t != None:
+                threads[id(t)] = t
+
+        saved_state = {}
+        saved_state["manager"] = dict(self.__dict__)
+        for name in ("running_thread_list", "blocking_thread_list", "ending_thread_list"):
+            saved_state["manager"][name] = list(getattr(self, name))
+        saved_state["threads"] = [(t, dict(t.__dict__)) for t in threads.values()]
+        saved_state["thread_id"] = GLOBAL_THREAD_ID
+        return saved_state
+
+    # threads created after the snapshot are not on any of the restored lists
+    def restore(self, saved_state):
+        global GLOBAL_THREAD_ID
+        self.__dict__.update(saved_state["manager"])
+        for name in ("running_thread_list", "blocking_thread_list", "ending_thread_list"):
+            setattr(self, name, list(getattr(self, name)))
+        for t, saved_thread in saved_state["threads"]:
+            t.__dict__.clear()
+            t.__dict__.update(saved_thread)
+        GLOBAL_THREAD_ID = saved_state["thread_id"]
@@ -16,12 +16,6 @@ import sys
 from unicorn import *
 from unicorn.x86_const import *
 
-from capstone import *
-from capstone.x86_const import *
-
-from keystone import *
-from keystone.x86_const import *
-
 from struct import pack
 import os
 
@@ -44,30 +38,20 @@ QL_X86_EMU_END = 0x8fffffff
 
 def hook_syscall(uc, intno, ql):
     syscall_num  = uc.reg_read(UC_X86_REG_EAX)
-    param0 = uc.reg_read(UC_X86_REG_EBX)
-    param1 = uc.reg_read(UC_X86_REG_ECX)
-    param2 = uc.reg_read(UC_X86_REG_EDX)
-    param3 = uc.reg_read(UC_X86_REG_ESI)
-    param4 = uc.reg_read(UC_X86_REG_EDI)
-    param5 = uc.reg_read(UC_X86_REG_EBP)
-    pc = uc.reg_read(UC_X86_REG_EIP)
-
-
-    linux_syscall_numb_list = []
-    linux_syscall_func_list = []
-
-    for i in X86_LINUX_SYSCALL:
-        linux_syscall_numb_list.append(i[0])
-        linux_syscall_func_list.append(i[1])
-
-    if any(linux_syscall_numb == syscall_num for linux_syscall_numb in linux_syscall_numb_list):
-        linux_syscall_index = linux_syscall_numb_list.index(syscall_num)
-        LINUX_SYSCALL_FUNC= eval(linux_syscall_func_list[linux_syscall_index])
+    LINUX_SYSCALL_FUNC = ql.syscall_table.get(syscall_num)
+
+    if LINUX_SYSCALL_FUNC is not None:
+        param0 = uc.reg_read(UC_X86_REG_EBX)
+        param1 = uc.reg_read(UC_X86_REG_ECX)
+        param2 = uc.reg_read(UC_X86_REG_EDX)
+        param3 = uc.reg_read(UC_X86_REG_ESI)
+        param4 = uc.reg_read(UC_X86_REG_EDI)
+        param5 = uc.reg_read(UC_X86_REG_EBP)
         try:
             LINUX_SYSCALL_FUNC(ql, uc, param0, param1, param2, param3, param4, param5)
         except:
             ql.errmsg = 1
-            ql.nprint("SYSCALL: ", linux_syscall_func_list[linux_syscall_index])
+            ql.nprint("SYSCALL: %s", LINUX_SYSCALL_FUNC.__name__)
 
             td = ql.thread_management.cur_thread
             td.stop()
@@ -77,6 +61,7 @@ def hook_syscall(uc, intno, ql):
                 uc.emu_stop()
                 raise
     else:
+        pc = uc.reg_read(UC_X86_REG_EIP)
         ql.nprint("0x%x: syscall number = 0x%x(%d) not implement." %(pc, syscall_num, syscall_num))
         if ql.output in (QL_OUT_DEBUG, QL_OUT_DUMP):
             uc.emu_stop()
@@ -104,7 +89,7 @@ def ql_x86_syscall_set_thread_area(ql, uc, u_info_addr, null0, null1, null2, nul
     limit = ql.unpack32(u_info[8 : 12])
     ql.nprint("|-->>> set_thread_area base : 0x%x limit is : 0x%x" % (base, limit))
     ql_x86_setup_syscall_set_thread_area(ql, uc, base, limit)
-    uc.mem_write(u_info_addr, ql.pack32(12))
+    ql.mem_write(u_info_addr, ql.pack32(12))
     regreturn = 0
     ql_definesyscall_return(ql, uc, regreturn)
 
@@ -129,12 +114,13 @@ def loader_shellcode(ql):
         ql.stack_size = 2 * 1024 * 1024
         uc.mem_map(ql.stack_address,  ql.stack_size)
     ql.stack_address =  ql.stack_address  + 0x100000
-    ql.uc.mem_write(ql.stack_address, ql.shellcoder)
+    ql.mem_write(ql.stack_address, ql.shellcoder)
 
 
 def runner(ql):
     ql.uc.reg_write(UC_X86_REG_ESP, ql.stack_address)
     ql_setup(ql)
+    ql_setup_syscall_table(ql, X86_LINUX_SYSCALL, globals())
     ql.hook_intr(hook_syscall, ql)
     ql_x86_setup_gdt_segment_ds(ql, ql.uc)
     ql_x86_setup_gdt_segment_cs(ql, ql.uc)
@@ -162,7 +148,7 @@ def runner(ql):
             ql.show_map_info()
 
             buf = ql.uc.mem_read(ql.pc, 8)
-            ql.nprint(">>> ", [hex(_) for _ in buf])
+            ql.nprint(">>> %s", [hex(_) for _ in buf])
             ql_hook_code_disasm(ql.uc, ql.pc, 64, ql)
         ql.errmsg = 1
         ql.nprint("%s" % e)  
@@ -16,12 +16,6 @@ import sys
 from unicorn import *
 from unicorn.x86_const import *
 
-from capstone import *
-from capstone.x86_const import *
-
-from keystone import *
-from keystone.x86_const import *
-
 from struct import pack
 import os
 
@@ -44,34 +38,26 @@ QL_X8664_EMU_END = 0xffffffffffffffff
 
 def hook_syscall(uc, ql):
     syscall_num  = uc.reg_read(UC_X86_REG_RAX)
-    param0 = uc.reg_read(UC_X86_REG_RDI)
-    param1 = uc.reg_read(UC_X86_REG_RSI)
-    param2 = uc.reg_read(UC_X86_REG_RDX)
-    param3 = uc.reg_read(UC_X86_REG_R10)
-    param4 = uc.reg_read(UC_X86_REG_R8)
-    param5 = uc.reg_read(UC_X86_REG_R9)
-    pc = uc.reg_read(UC_X86_REG_RIP)
-
-    linux_syscall_numb_list = []
-    linux_syscall_func_list = []
-
-    for i in X8664_LINUX_SYSCALL:
-        linux_syscall_numb_list.append(i[0])
-        linux_syscall_func_list.append(i[1])
-
-    if any(linux_syscall_numb == syscall_num for linux_syscall_numb in linux_syscall_numb_list):
-        linux_syscall_index = linux_syscall_numb_list.index(syscall_num)
-        LINUX_SYSCALL_FUNC= eval(linux_syscall_func_list[linux_syscall_index])
+    LINUX_SYSCALL_FUNC = ql.syscall_table.get(syscall_num)
+
+    if LINUX_SYSCALL_FUNC is not None:
+        param0 = uc.reg_read(UC_X86_REG_RDI)
+        param1 = uc.reg_read(UC_X86_REG_RSI)
+        param2 = uc.reg_read(UC_X86_REG_RDX)
+        param3 = uc.reg_read(UC_X86_REG_R10)
+        param4 = uc.reg_read(UC_X86_REG_R8)
+        param5 = uc.reg_read(UC_X86_REG_R9)
         try:
             LINUX_SYSCALL_FUNC(ql, uc, param0, param1, param2, param3, param4, param5)
         except:
             ql.errmsg = 1
-            ql.nprint("SYSCALL: ", linux_syscall_func_list[linux_syscall_index])
+            ql.nprint("SYSCALL: %s", LINUX_SYSCALL_FUNC.__name__)
             
             if ql.output in (QL_OUT_DEBUG, QL_OUT_DUMP):
                 uc.emu_stop()
                 raise
     else:
+        pc = uc.reg_read(UC_X86_REG_RIP)
         ql.nprint("0x%x: syscall number = 0x%x(%d) not implement." %(pc, syscall_num, syscall_num))
         if ql.output in (QL_OUT_DEBUG, QL_OUT_DUMP):
             uc.emu_stop()
@@ -103,6 +89,7 @@ def loader_shellcode(ql):
 def runner(ql):
     ql.uc.reg_write(UC_X86_REG_RSP, ql.stack_address)
     ql_setup(ql)
+    ql_setup_syscall_table(ql, X8664_LINUX_SYSCALL, globals())
     ql.hook_insn(hook_syscall, ql, 1, 0, UC_X86_INS_SYSCALL)
     if not ql.shellcoder: 
         ql_x8664_setup_gdt_segment_ds(ql, ql.uc)
@@ -122,7 +109,7 @@ def runner(ql):
             ql.show_map_info()
 
             buf = ql.uc.mem_read(ql.pc, 8)
-            ql.nprint(">>> ", [hex(_) for _ in buf])
+            ql.nprint(">>> %s", [hex(_) for _ in buf])
             ql_hook_code_disasm(ql.uc, ql.pc, 64, ql)
         ql.errmsg = 1
         ql.nprint("%s" % e)    
@@ -39,7 +39,7 @@ def ql_x86_syscall_set_thread_area(ql, uc, u_info_addr, null0, null1, null2, nul
     limit = ql.unpack32(u_info[8 : 12])
     ql.nprint("|-->>> set_thread_area base : 0x%x limit is : 0x%x" % (base, limit))
     ql_x86_setup_syscall_set_thread_area(ql, uc, base, limit)
-    uc.mem_write(u_info_addr, ql.pack32(12))
+    ql.mem_write(u_info_addr, ql.pack32(12))
     regreturn = 0
     ql_definesyscall_return(ql, uc, regreturn)
 
@@ -16,12 +16,6 @@ import sys
 from unicorn import *
 from unicorn.x86_const import *
 
-from capstone import *
-from capstone.x86_const import *
-
-from keystone import *
-from keystone.x86_const import *
-
 from struct import pack
 import os
 
@@ -44,14 +38,6 @@ QL_X86_EMU_END = 0x8fffffff
 
 def hook_syscall(uc, intno, ql):
     syscall_num  = uc.reg_read(UC_X86_REG_EAX)
-    param0 = uc.reg_read(UC_X86_REG_EAX)
-    param0 = ql.stack_read(4 * 1)
-    param1 = ql.stack_read(4 * 2)
-    param2 = ql.stack_read(4 * 3)
-    param3 = ql.stack_read(4 * 4)
-    param4 = ql.stack_read(4 * 5)
-    param5 = ql.stack_read(4 * 6)
-    pc = uc.reg_read(UC_X86_REG_RIP)
 
     if intno not in (0x80, 0x81, 0x82):
         ql.nprint("got interrupt 0x%x ???" %intno)
@@ -63,25 +49,25 @@ def hook_syscall(uc, intno, ql):
     elif intno == 0x82:
         syscall_num = syscall_num + 0x8200
 
-    macos_syscall_numb_list = []
-    macos_syscall_func_list = []
-
-    for i in X86_MACOS_SYSCALL:
-        macos_syscall_numb_list.append(i[0])
-        macos_syscall_func_list.append(i[1])
+    MACOS_SYSCALL_FUNC = ql.syscall_table.get(syscall_num)
 
-    if any(macos_syscall_numb == syscall_num for macos_syscall_numb in macos_syscall_numb_list):
-        macos_syscall_index = macos_syscall_numb_list.index(syscall_num)
-        MACOS_SYSCALL_FUNC = eval(macos_syscall_func_list[macos_syscall_index])
+    if MACOS_SYSCALL_FUNC is not None:
+        param0 = ql.stack_read(4 * 1)
+        param1 = ql.stack_read(4 * 2)
+        param2 = ql.stack_read(4 * 3)
+        param3 = ql.stack_read(4 * 4)
+        param4 = ql.stack_read(4 * 5)
+        param5 = ql.stack_read(4 * 6)
         try:
             MACOS_SYSCALL_FUNC(ql, uc, param0, param1, param2, param3, param4, param5)
         except:
             ql.errmsg = 1
-            ql.nprint("SYSCALL: ", linux_syscall_func_list[linux_syscall_index])
+            ql.nprint("SYSCALL: %s", MACOS_SYSCALL_FUNC.__name__)
             if ql.output in (QL_OUT_DEBUG, QL_OUT_DUMP):
                 uc.emu_stop()
                 raise
     else:
+        pc = uc.reg_read(UC_X86_REG_EIP)
         ql.nprint("0x%x: syscall number = 0x%x(%d) not implement." %(pc, syscall_num, syscall_num))
         if ql.output in (QL_OUT_DEBUG, QL_OUT_DUMP):
             uc.emu_stop()
@@ -116,6 +102,7 @@ def loader_shellcode(ql):
 def runner(ql):
     ql.uc.reg_write(UC_X86_REG_ESP, ql.stack_address) 
     ql_setup(ql)
+    ql_setup_syscall_table(ql, X86_MACOS_SYSCALL, globals())
     ql.hook_intr(hook_syscall, ql)
     ql_x86_setup_gdt_segment_ds(ql, ql.uc)
     ql_x86_setup_gdt_segment_cs(ql, ql.uc)
@@ -134,7 +121,7 @@ def runner(ql):
             ql.show_map_info()
 
             buf = ql.uc.mem_read(ql.pc, 8)
-            ql.nprint(">>> ", [hex(_) for _ in buf])
+            ql.nprint(">>> %s", [hex(_) for _ in buf])
             ql_hook_code_disasm(ql.uc, ql.pc, 64, ql)
         ql.errmsg = 1
         ql.nprint("%s" % e)  
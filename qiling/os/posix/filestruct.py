@@ -15,14 +15,16 @@ import fcntl
 import socket
 
 class ql_file:
-    def __init__(self, path, fd):
+    def __init__(self, path, fd, flags = os.O_RDWR, mode = 0):
         self.__path = path
         self.__fd = fd
+        self.__flags = flags
+        self.__mode = mode
 
     @classmethod
     def open(self, open_path, open_flags, open_mode):
         fd = os.open(open_path, open_flags, open_mode)
-        return self(open_path, fd)
+        return self(open_path, fd, open_flags, open_mode)
 
     def read(self, read_len):
         return os.read(self.__fd, read_len)
@@ -47,7 +49,7 @@ class ql_file:
     
     def dup(self):
         new_fd = os.dup(self.__fd)
-        new_ql_file = ql_file(self.__path, new_fd)
+        new_ql_file = ql_file(self.__path, new_fd, self.__flags, self.__mode)
         return new_ql_file
     
     def readline(self, end = b'\n'):
@@ -63,6 +65,14 @@ class ql_file:
     def name(self):
         return self.__path
 
+    @property
+    def flags(self):
+        return self.__flags
+
+    @property
+    def mode(self):
+        return self.__mode
+
     
 class ql_socket:
     def __init__(self, socket):
@@ -34,7 +34,9 @@ from qiling.arch.filetype import *
 from qiling.os.linux.thread import *
 from qiling.arch.filetype import *
 from qiling.os.posix.filestruct import *
+from qiling.os.posix.vma import *
 from qiling.utils import *
+from qiling.log import QlLogJoin
 
 def ql_syscall_exit(ql, uc, null0, null1, null2, null3, null4, null5):
     ql.nprint("exit()")
@@ -51,17 +53,20 @@ def ql_syscall_exit(ql, uc, null0, null1, null2, null3, null4, null5):
 
 
 def ql_syscall_munmap(ql, uc, munmap_addr , munmap_len, null0, null1, null2, null3):
-    munmap_len = ((munmap_len + 0x1000 - 1) // 0x1000) * 0x1000
-    uc.mem_unmap(munmap_addr, munmap_len)
-    regreturn = 0
-    ql.nprint("munmap(0x%x, 0x%x) = %d" % (munmap_addr , munmap_len, regreturn))
+    munmap_len = ql_vma_align(munmap_len)
+    if munmap_addr % 0x1000 or munmap_len == 0:
+        regreturn = -1
+    else:
+        ql_vma_unmap(ql, munmap_addr, munmap_len)
+        regreturn = 0
+    ql.nprint("munmap(0x%x, 0x%x) = %d", munmap_addr, munmap_len, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
 def ql_syscall_exit_group(ql, uc, null0, null1, null2, null3, null4, null5):
     ql.exit_code = null0
 
-    ql.nprint("exit_group(%u)" %null0)
+    ql.nprint("exit_group(%u)", null0)
 
     if ql.child_processes == True:
         os._exit(0)
@@ -75,7 +80,7 @@ def ql_syscall_exit_group(ql, uc, null0, null1, null2, null3, null4, null5):
 
 def ql_syscall_madvise(ql, uc, null0, null1, null2, null3, null4, null5):
     regreturn = 0
-    ql.nprint("madvise() = %d" %  regreturn)
+    ql.nprint("madvise() = %d", regreturn)
     ql_definesyscall_return(ql, uc, regreturn)    
 
 
@@ -100,20 +105,20 @@ def ql_syscall_sysinfo(ql, uc, sysinfo_info, null0, null1, null2, null3, null4):
     )
     
     regreturn = 0
-    ql.nprint("sysinfo(0x%x) = %d" % (sysinfo_info, regreturn))
+    ql.nprint("sysinfo(0x%x) = %d", sysinfo_info, regreturn)
     #uc.mem_write(sysinfo_info, data)   
     ql_definesyscall_return(ql, uc, regreturn)    
 
 
 def ql_syscall_sysctl(ql, uc, sysctl_name, sysctl_namelen, sysctl_bytes_oldlenp, sysctl_size_oldlenp, sysctl_bytes_newlen, sysctl_size_newlen):
-    ql.nprint("sysctl(%s)" % sysctl_name)
+    ql.nprint("sysctl(%s)", sysctl_name)
     regreturn = 0
     ql_definesyscall_return(ql, uc, regreturn)
 
 
 def ql_syscall_alarm(ql, uc, alarm_seconds, null0, null1, null2, null3, null4):
     regreturn = 0
-    ql.nprint("alarm(%d) = %d" % (alarm_seconds, regreturn))
+    ql.nprint("alarm(%d) = %d", alarm_seconds, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)    
 
 
@@ -122,7 +127,7 @@ def ql_syscall_issetugid(ql, uc, null0, null1, null2, null3, null4, null5):
         UGID = 0
     else:    
         UGID = 1000    
-    ql.nprint("issetugid(%i)" % UGID)
+    ql.nprint("issetugid(%i)", UGID)
     regreturn = UGID
     ql_definesyscall_return(ql, uc, regreturn)
 
@@ -132,7 +137,7 @@ def ql_syscall_getuid(ql, uc, null0, null1, null2, null3, null4, null5):
         UID = 0
     else:    
         UID = 1000
-    ql.nprint("getuid(%i)" % UID)
+    ql.nprint("getuid(%i)", UID)
     regreturn = UID
     ql_definesyscall_return(ql, uc, regreturn)    
 
@@ -142,7 +147,7 @@ def ql_syscall_geteuid(ql, uc, null0, null1, null2, null3, null4, null5):
         EUID = 0
     else:    
         EUID = 1000
-    ql.nprint("geteuid(%i)" % EUID)
+    ql.nprint("geteuid(%i)", EUID)
     regreturn = EUID
     ql_definesyscall_return(ql, uc, regreturn) 
 
@@ -152,7 +157,7 @@ def ql_syscall_getegid(ql, uc, null0, null1, null2, null3, null4, null5):
         EGID = 0
     else:    
         EGID = 1000
-    ql.nprint("getegid(%i)" % EGID)
+    ql.nprint("getegid(%i)", EGID)
     regreturn = EGID
     ql_definesyscall_return(ql, uc, regreturn) 
 
@@ -162,7 +167,7 @@ def ql_syscall_getgid(ql, uc, null0, null1, null2, null3, null4, null5):
         GID = 0
     else:    
         GID = 1000
-    ql.nprint("getgid(%i)" % GID)
+    ql.nprint("getgid(%i)", GID)
     regreturn = GID
     ql_definesyscall_return(ql, uc, regreturn)    
 
@@ -174,7 +179,7 @@ def ql_syscall_setgroups(ql, uc, gidsetsize, grouplist, null0, null1, null2, nul
         GID = 1000
 
     regreturn = GID
-    ql.nprint("setgroups(0x%x, 0x%x) = %d" % (gidsetsize, grouplist, regreturn))
+    ql.nprint("setgroups(0x%x, 0x%x) = %d", gidsetsize, grouplist, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)    
 
 
@@ -183,7 +188,7 @@ def ql_syscall_setgid(ql, uc, null0, null1, null2, null3, null4, null5):
         GID = 0
     else:    
         GID = 1000
-    ql.nprint("setgid(%i)" % GID)
+    ql.nprint("setgid(%i)", GID)
     regreturn = GID
     ql_definesyscall_return(ql, uc, regreturn)           
 
@@ -193,7 +198,7 @@ def ql_syscall_setuid(ql, uc, null0, null1, null2, null3, null4, null5):
         UID = 0
     else:    
         UID = 1000
-    ql.nprint("setuid(%i)" % UID)
+    ql.nprint("setuid(%i)", UID)
     regreturn = UID
     ql_definesyscall_return(ql, uc, regreturn)     
 
@@ -205,12 +210,12 @@ def ql_syscall_faccessat(ql, uc, faccessat_dfd, faccessat_filename, faccessat_mo
     relative_path = ql_transform_to_relative_path(ql, uc, access_path)
 
     regreturn = -1
-    ql.nprint("facccessat (%d, 0x%x, 0x%x) = %d" %(faccessat_dfd, faccessat_filename, faccessat_mode, regreturn))
+    ql.nprint("facccessat (%d, 0x%x, 0x%x) = %d", faccessat_dfd, faccessat_filename, faccessat_mode, regreturn)
     if os.path.exists(real_path) == False:
-        ql.nprint("|---!!! File Not Found: %s"  % relative_path)
+        ql.nprint("|---!!! File Not Found: %s", relative_path)
         regreturn = -1
     else:
-        ql.nprint("|--->>> Found and Skip, return -1: %s"  % relative_path)
+        ql.nprint("|--->>> Found and Skip, return -1: %s", relative_path)
         regreturn = -1
     ql_definesyscall_return(ql, uc, regreturn)
 
@@ -240,11 +245,11 @@ def ql_syscall_open(ql, uc, filename, flags, mode, null0, null1, null2):
         except:
             regreturn = -1
 
-    ql.nprint("open(%s, 0x%x, 0x%x) = %d" % (relative_path, flags, mode, regreturn))
+    ql.nprint("open(%s, 0x%x, 0x%x) = %d", relative_path, flags, mode, regreturn)
     if regreturn >= 0 and regreturn != 2:
-        ql.dprint("|--->>> Found: %s" % relative_path)
+        ql.dprint("|--->>> Found: %s", relative_path)
     else:
-        ql.dprint("|---!!! File Not Found %s" % relative_path)
+        ql.dprint("|---!!! File Not Found %s", relative_path)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -256,10 +261,10 @@ def ql_syscall_openat(ql, uc, openat_fd, openat_path, openat_flags, openat_mode,
     relative_path = ql_transform_to_relative_path(ql, uc, openat_path)
 
     if os.path.exists(real_path) == False:
-        ql.nprint("|---!!! File Not Found: %s"  % relative_path)
+        ql.nprint("|---!!! File Not Found: %s", relative_path)
         regreturn = -1
     else:
-        ql.nprint("|--->>> File Found: %s"  % relative_path)
+        ql.nprint("|--->>> File Found: %s", relative_path)
 
         idx = -1
         for i in range(256):
@@ -271,31 +276,33 @@ def ql_syscall_openat(ql, uc, openat_fd, openat_path, openat_flags, openat_mode,
         else:
             ql.file_des[idx] = ql_file.open(real_path, openat_flags, openat_mode)
             regreturn = (idx)
-    ql.nprint("openat(%d, %s, 0x%x, 0x%x) = %d" % (openat_fd, relative_path, openat_flags, openat_mode, regreturn))
+    ql.nprint("openat(%d, %s, 0x%x, 0x%x) = %d", openat_fd, relative_path, openat_flags, openat_mode, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
 def ql_syscall_lseek(ql, uc, lseek_fd, lseek_ofset, lseek_origin, null0, null1, null2):
     regreturn = ql.file_des[lseek_fd].lseek(lseek_ofset, lseek_origin)
-    ql.nprint("lseek(%d, 0x%x, 0x%x) = %d" % (lseek_fd, lseek_ofset, lseek_origin, regreturn))
+    ql.nprint("lseek(%d, 0x%x, 0x%x) = %d", lseek_fd, lseek_ofset, lseek_origin, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
 def ql_syscall_brk(ql, uc, brk_input, null0, null1, null2, null3, null4):
-    ql.nprint("brk(0x%x)" % brk_input)
+    ql.nprint("brk(0x%x)", brk_input)
     if brk_input != 0:
-        if brk_input > ql.brk_address:
-            uc.mem_map(ql.brk_address, (int(((brk_input + 0xfff) // 0x1000) * 0x1000 - ql.brk_address)))
-            ql.brk_address = int(((brk_input + 0xfff) // 0x1000) * 0x1000)
+        brk_input = ql_vma_brk(ql, brk_input)
     else:
         brk_input = ql.brk_address
     ql_definesyscall_return(ql, uc, brk_input)
-    ql.dprint("|--->>> brk return(0x%x)" % ql.brk_address)
+    ql.dprint("|--->>> brk return(0x%x)", ql.brk_address)
 
 
 def ql_syscall_mprotect(ql, uc, mprotect_start, mprotect_len, mprotect_prot, null0, null1, null2):
-    regreturn = 0
-    ql.nprint("mprotect(0x%x, 0x%x, 0x%x) = %d" % (mprotect_start, mprotect_len, mprotect_prot, regreturn))
+    mprotect_len = ql_vma_align(mprotect_len)
+    if mprotect_start % 0x1000 == 0 and ql_vma_protect(ql, mprotect_start, mprotect_len, mprotect_prot & UC_PROT_ALL):
+        regreturn = 0
+    else:
+        regreturn = -1
+    ql.nprint("mprotect(0x%x, 0x%x, 0x%x) = %d", mprotect_start, mprotect_len, mprotect_prot, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -307,9 +314,9 @@ def ql_syscall_uname(ql, uc, address, null0, null1, null2, null3, null4):
     buf += b'QiligOS 99.0-RELEASE r1'.ljust(65, b'\x00')
     buf += b'ql_processor'.ljust(65, b'\x00')
     buf += b''.ljust(65, b'\x00')
-    uc.mem_write(address, buf)
+    ql.mem_write(address, buf)
     regreturn = 0
-    ql.nprint("uname(0x%x) = %d" % (address, regreturn))
+    ql.nprint("uname(0x%x) = %d", address, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -326,74 +333,84 @@ def ql_syscall_access(ql, uc, access_path, access_mode, null0, null1, null2, nul
 
     ql_definesyscall_return(ql, uc, regreturn)
 
-    ql.nprint("access(%s, 0x%x) = %d " % (relative_path, access_mode, regreturn))
+    ql.nprint("access(%s, 0x%x) = %d ", relative_path, access_mode, regreturn)
     if regreturn == 0:
-        ql.dprint("|--->>> File: %s" % relative_path)
+        ql.dprint("|--->>> File: %s", relative_path)
     else:
         ql.dprint("|---!!! No such file or directory")
     
 
-def ql_syscall_mmap(ql, uc, mmap2_addr, mmap2_length, mmap2_prot, mmap2_flags, mmap2_fd, mmap2_pgoffset):
-    # this is ugly patch, we might need to get value from elf parse,
-    # is32bit or is64bit value not by arch
-   
-    MAP_ANONYMOUS=32
+# mmap flags and protections shared by the posix targets
+MAP_PRIVATE = 0x02
+MAP_FIXED = 0x10
+PROT_WRITE = 0x2
 
-    if (ql.arch == QL_ARM64) or (ql.arch == QL_X8664):
-        mmap2_fd = ql.unpack64(ql.pack64(mmap2_fd))
-
-    elif (ql.arch == QL_MIPS32EL):
-        mmap2_fd = ql.unpack32s(uc.mem_read(mmap2_fd, 4))
-        mmap2_pgoffset = ql.unpack32(uc.mem_read(mmap2_pgoffset, 4))
-        MAP_ANONYMOUS=2048
-    else:
-        mmap2_fd = ql.unpack32s(ql.pack32(mmap2_fd))
 
+# the part of mmap and mmap2 after their arguments are decoded
+def ql_mmap_common(ql, uc, syscall_name, mmap2_addr, mmap2_length, mmap2_prot, mmap2_flags, mmap2_fd, mmap2_pgoffset, MAP_ANONYMOUS):
+    mmap_size = ql_vma_align(mmap2_length)
 
-    mmap_base = mmap2_addr
-    need_mmap = True
+    if mmap2_flags & MAP_FIXED:
+        mmap_base = mmap2_addr
+    elif mmap2_addr != 0 and mmap2_addr % 0x1000 == 0 and ql_vma_is_free(ql, mmap2_addr, mmap_size):
+        mmap_base = mmap2_addr
+    else:
+        mmap_base = ql_vma_find_free(ql, mmap_size)
 
-    if mmap2_addr != 0 and mmap2_addr < ql.mmap_start:
-        need_mmap = False
-    if mmap2_addr == 0:
-        mmap_base = ql.mmap_start
-        ql.mmap_start = mmap_base + ((mmap2_length + 0x1000 - 1) // 0x1000) * 0x1000
+    ql.dprint("%s(0x%x, %d, 0x%x, 0x%x, %d, %d)", syscall_name, mmap2_addr, mmap2_length, mmap2_prot, mmap2_flags, mmap2_fd, mmap2_pgoffset)
 
-    ql.dprint("mmap(0x%x, %d, 0x%x, 0x%x, %d, %d)" % (mmap2_addr, mmap2_length, mmap2_prot, mmap2_flags, mmap2_fd, mmap2_pgoffset))
-    ql.dprint("|--->>> log mmap2 return addr is : " + hex(mmap_base))
-    ql.dprint("|--->>> log mmap2 addr range is : " + hex(mmap_base) + ' - ' + hex(mmap_base + ((mmap2_length + 0x1000 - 1) // 0x1000) * 0x1000))
+    if mmap_size == 0 or mmap_base == None or mmap_base % 0x1000:
+        regreturn = -1
+        ql.nprint("%s(0x%x, %d, 0x%x, 0x%x, %d, %d) = %d", syscall_name, mmap2_addr, mmap2_length, mmap2_prot, mmap2_flags, mmap2_fd, mmap2_pgoffset, regreturn)
+        ql_definesyscall_return(ql, uc, regreturn)
+        return
 
-    if need_mmap:
-        uc.mem_map(mmap_base, ((mmap2_length + 0x1000 - 1) // 0x1000) * 0x1000)
+    ql.dprint("|--->>> log mmap2 return addr is : 0x%x", mmap_base)
+    ql.dprint("|--->>> log mmap2 addr range is : 0x%x - 0x%x", mmap_base, mmap_base + mmap_size)
 
-    uc.mem_write(mmap_base, b'\x00' * (((mmap2_length + 0x1000 - 1) // 0x1000) * 0x1000))
-    
     mem_s = mmap_base
-    mem_e = mmap_base + ((mmap2_length + 0x1000 - 1) // 0x1000) * 0x1000
+    mem_e = mmap_base + mmap_size
     mem_info = ''
 
-    if ((mmap2_flags & MAP_ANONYMOUS) == 0) and mmap2_fd < 256 and ql.file_des[mmap2_fd] != 0:
-        ql.file_des[mmap2_fd].lseek(mmap2_pgoffset)
-        data = ql.file_des[mmap2_fd].read(mmap2_length)
+    ql_vma_unmap(ql, mem_s, mmap_size)
 
-        ql.dprint("|--->>> log mem wirte : " + hex(len(data)))
-        ql.dprint("|--->>> log mem mmap to " + str(ql.file_des[mmap2_fd].name))
-        uc.mem_write(mmap_base, data)
-        
-        mem_info = ql.file_des[mmap2_fd].name
+    # leading bytes served straight from the host file
+    mapped = 0
+    mmap_file = None
+    if ((mmap2_flags & MAP_ANONYMOUS) == 0) and mmap2_fd < 256 and ql.file_des[mmap2_fd] != 0:
+        mmap_file = ql.file_des[mmap2_fd]
+        if QL_MEM_MAP_FILE and (mmap2_flags & MAP_PRIVATE) and not (mmap2_prot & PROT_WRITE) and isinstance(mmap_file, ql_file):
+            mapped = ql_mem_map_file(ql, uc, mmap_base, mmap2_length, mmap_file.fileno(), mmap2_pgoffset)
+
+    # fresh unicorn memory is zeroed already
+    if mem_e > mem_s + mapped:
+        uc.mem_map(mem_s + mapped, mem_e - mem_s - mapped)
+
+    if mmap_file != None:
+        mmap_file.lseek(mmap2_pgoffset + mapped)
+        data = mmap_file.read(mmap2_length - mapped)
+
+        ql.dprint("|--->>> log mem mapped from file : 0x%x", mapped)
+        ql.dprint("|--->>> log mem wirte : 0x%x", len(data))
+        ql.dprint("|--->>> log mem mmap to %s", mmap_file.name)
+        ql.mem_write(mem_s + mapped, data)
         
+        mem_info = mmap_file.name
+
+    # PROT_READ, PROT_WRITE and PROT_EXEC are the bits of the unicorn permissions
+    uc.mem_protect(mem_s, mmap_size, mmap2_prot & UC_PROT_ALL)
     ql.insert_map_info(mem_s, mem_e, mem_info)
     
     if ql.output == QL_OUT_DEFAULT:
-        ql.nprint("mmap(0x%x, %d, 0x%x, 0x%x, %d, %d) = 0x%x" % (mmap2_addr, mmap2_length, mmap2_prot, mmap2_flags, mmap2_fd, mmap2_pgoffset, mmap_base))
+        ql.nprint("%s(0x%x, %d, 0x%x, 0x%x, %d, %d) = 0x%x", syscall_name, mmap2_addr, mmap2_length, mmap2_prot, mmap2_flags, mmap2_fd, mmap2_pgoffset, mmap_base)
     
     regreturn = mmap_base
-    ql.dprint("|--->>> mmap_base is 0x%x" % regreturn)
+    ql.dprint("|--->>> mmap_base is 0x%x", regreturn)
 
     ql_definesyscall_return(ql, uc, regreturn)
 
 
-def ql_syscall_mmap2(ql, uc, mmap2_addr, mmap2_length, mmap2_prot, mmap2_flags, mmap2_fd, mmap2_pgoffset):
+def ql_syscall_mmap(ql, uc, mmap2_addr, mmap2_length, mmap2_prot, mmap2_flags, mmap2_fd, mmap2_pgoffset):
     # this is ugly patch, we might need to get value from elf parse,
     # is32bit or is64bit value not by arch
    
@@ -404,54 +421,32 @@ def ql_syscall_mmap2(ql, uc, mmap2_addr, mmap2_length, mmap2_prot, mmap2_flags,
 
     elif (ql.arch == QL_MIPS32EL):
         mmap2_fd = ql.unpack32s(uc.mem_read(mmap2_fd, 4))
-        mmap2_pgoffset = ql.unpack32(uc.mem_read(mmap2_pgoffset, 4)) * 4096
+        mmap2_pgoffset = ql.unpack32(uc.mem_read(mmap2_pgoffset, 4))
         MAP_ANONYMOUS=2048
     else:
         mmap2_fd = ql.unpack32s(ql.pack32(mmap2_fd))
-        mmap2_pgoffset = mmap2_pgoffset * 4096
-
-
-    mmap_base = mmap2_addr
-    need_mmap = True
 
-    if mmap2_addr != 0 and mmap2_addr < ql.mmap_start:
-        need_mmap = False
-    if mmap2_addr == 0:
-        mmap_base = ql.mmap_start
-        ql.mmap_start = mmap_base + ((mmap2_length + 0x1000 - 1) // 0x1000) * 0x1000
+    ql_mmap_common(ql, uc, "mmap", mmap2_addr, mmap2_length, mmap2_prot, mmap2_flags, mmap2_fd, mmap2_pgoffset, MAP_ANONYMOUS)
 
-    ql.dprint("mmap2(0x%x, %d, 0x%x, 0x%x, %d, %d)" % (mmap2_addr, mmap2_length, mmap2_prot, mmap2_flags, mmap2_fd, mmap2_pgoffset))
-    ql.dprint("|--->>> log mmap2 return addr is : " + hex(mmap_base))
-    ql.dprint("|--->>> log mmap2 addr range is : " + hex(mmap_base) + ' - ' + hex(mmap_base + ((mmap2_length + 0x1000 - 1) // 0x1000) * 0x1000))
 
-    if need_mmap:
-        uc.mem_map(mmap_base, ((mmap2_length + 0x1000 - 1) // 0x1000) * 0x1000)
-
-    uc.mem_write(mmap_base, b'\x00' * (((mmap2_length + 0x1000 - 1) // 0x1000) * 0x1000))
-    
-    mem_s = mmap_base
-    mem_e = mmap_base + ((mmap2_length + 0x1000 - 1) // 0x1000) * 0x1000
-    mem_info = ''
+def ql_syscall_mmap2(ql, uc, mmap2_addr, mmap2_length, mmap2_prot, mmap2_flags, mmap2_fd, mmap2_pgoffset):
+    # this is ugly patch, we might need to get value from elf parse,
+    # is32bit or is64bit value not by arch
+   
+    MAP_ANONYMOUS=32
 
-    if ((mmap2_flags & MAP_ANONYMOUS) == 0) and mmap2_fd < 256 and ql.file_des[mmap2_fd] != 0:
-        ql.file_des[mmap2_fd].lseek(mmap2_pgoffset)
-        data = ql.file_des[mmap2_fd].read(mmap2_length)
+    if (ql.arch == QL_ARM64) or (ql.arch == QL_X8664):
+        mmap2_fd = ql.unpack64(ql.pack64(mmap2_fd))
 
-        ql.dprint("|--->>> log mem wirte : " + hex(len(data)))
-        ql.dprint("|--->>> log mem mmap to " + str(ql.file_des[mmap2_fd].name))
-        uc.mem_write(mmap_base, data)
-        
-        mem_info = ql.file_des[mmap2_fd].name
-        
-    ql.insert_map_info(mem_s, mem_e, mem_info)
-    
-    if ql.output == QL_OUT_DEFAULT:
-        ql.nprint("mmap2(0x%x, %d, 0x%x, 0x%x, %d, %d) = 0x%x" % (mmap2_addr, mmap2_length, mmap2_prot, mmap2_flags, mmap2_fd, mmap2_pgoffset, mmap_base))
-    
-    regreturn = mmap_base
-    ql.dprint("|--->>> mmap_base is 0x%x" % regreturn)
+    elif (ql.arch == QL_MIPS32EL):
+        mmap2_fd = ql.unpack32s(uc.mem_read(mmap2_fd, 4))
+        mmap2_pgoffset = ql.unpack32(uc.mem_read(mmap2_pgoffset, 4)) * 4096
+        MAP_ANONYMOUS=2048
+    else:
+        mmap2_fd = ql.unpack32s(ql.pack32(mmap2_fd))
+        mmap2_pgoffset = mmap2_pgoffset * 4096
 
-    ql_definesyscall_return(ql, uc, regreturn)
+    ql_mmap_common(ql, uc, "mmap2", mmap2_addr, mmap2_length, mmap2_prot, mmap2_flags, mmap2_fd, mmap2_pgoffset, MAP_ANONYMOUS)
 
 
 def ql_syscall_close(ql, uc, close_fd, null0, null1, null2, null3, null4):
@@ -460,7 +455,7 @@ def ql_syscall_close(ql, uc, close_fd, null0, null1, null2, null3, null4):
         ql.file_des[close_fd].close()
         ql.file_des[close_fd] = 0
         regreturn = 0
-    ql.nprint("close(%d) = %d" % (close_fd, regreturn))
+    ql.nprint("close(%d) = %d", close_fd, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -473,11 +468,11 @@ def ql_syscall_fstatat64(ql, uc, fstatat64_fd, fstatat64_fname, fstatat64_buf, f
     regreturn = -1
     if os.path.exists(real_path) == False:
         regreturn = -1
-    ql.nprint("fstatat64(0x%x, %s) = %d" % (fstatat64_fd, relative_path, regreturn))
+    ql.nprint("fstatat64(0x%x, %s) = %d", fstatat64_fd, relative_path, regreturn)
     if regreturn == 0:
-        ql.dprint("|--->>> Directory Found: %s"  % relative_path)
+        ql.dprint("|--->>> Directory Found: %s", relative_path)
     else:
-        ql.dprint("|---!!! Directory Not Found: %s"  % relative_path)
+        ql.dprint("|---!!! Directory Not Found: %s", relative_path)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -503,12 +498,12 @@ def ql_syscall_fstat64(ql, uc, fstat64_fd, fstat64_add, null0, null1, null2, nul
         fstat64_buf += ql.pack64(int(fstat64_info.st_ctime))
         fstat64_buf += ql.pack64(fstat64_info.st_ino)
 
-        uc.mem_write(fstat64_add, fstat64_buf)
+        ql.mem_write(fstat64_add, fstat64_buf)
         regreturn = 0
     else:
         regreturn = -1
 
-    ql.nprint("fstat64(%d, 0x%x) = %d" % (fstat64_fd, fstat64_add, regreturn))
+    ql.nprint("fstat64(%d, 0x%x) = %d", fstat64_fd, fstat64_add, regreturn)
     if regreturn == 0:
         ql.dprint("|--->>> fstat64 write completed")
     else:
@@ -560,12 +555,12 @@ def ql_syscall_fstat(ql, uc, fstat_fd, fstat_add, null0, null1, null2, null3):
             fstat_buf += ql.pack32(int(fstat_info.st_mtime))
             fstat_buf += ql.pack32(int(fstat_info.st_ctime))
 
-        uc.mem_write(fstat_add, fstat_buf)
+        ql.mem_write(fstat_add, fstat_buf)
         regreturn = 0        
     else:
         regreturn = -1
 
-    ql.nprint("fstat(%d, 0x%x) = %d" % (fstat_fd, fstat_add, regreturn))
+    ql.nprint("fstat(%d, 0x%x) = %d", fstat_fd, fstat_add, regreturn)
     if regreturn == 0:
         ql.dprint("|--->>> fstat write completed")
     else:
@@ -635,10 +630,10 @@ def ql_syscall_stat64(ql, uc, stat64_pathname, stat64_buf_ptr, null0, null1, nul
             stat64_buf += ql.pack64(int(stat64_info.st_ctime))
             stat64_buf += ql.pack64(stat64_info.st_ino)
 
-        uc.mem_write(stat64_buf_ptr, stat64_buf)
+        ql.mem_write(stat64_buf_ptr, stat64_buf)
         regreturn = 0
 
-    ql.nprint("stat64(%s, 0x%x) = %d" % (relative_path, stat64_buf_ptr, regreturn))
+    ql.nprint("stat64(%s, 0x%x) = %d", relative_path, stat64_buf_ptr, regreturn)
     if regreturn == 0:
         ql.dprint("|--->>> stat64 write completed")
     else:
@@ -697,9 +692,9 @@ def ql_syscall_stat(ql, uc, stat_path, stat_buf_ptr, null0, null1, null2, null3)
             stat_buf += ql.pack32(stat_info.st_blocks)
 
         regreturn = 0
-        uc.mem_write(stat_buf_ptr, stat_buf)
+        ql.mem_write(stat_buf_ptr, stat_buf)
 
-    ql.nprint("stat(%s, 0x%x) = %d" % (relative_path, stat_buf_ptr, regreturn))
+    ql.nprint("stat(%s, 0x%x) = %d", relative_path, stat_buf_ptr, regreturn)
     if regreturn == 0:
         ql.dprint("|--->>> stat() write completed")
     else:
@@ -712,13 +707,13 @@ def ql_syscall_read(ql, uc, read_fd, read_buf, read_len, null0, null1, null2):
     if read_fd < 256 and ql.file_des[read_fd] != 0:
         try:
             data = ql.file_des[read_fd].read(read_len)
-            uc.mem_write(read_buf, data)
+            ql.mem_write(read_buf, data)
             regreturn = len(data)
         except:
             regreturn = -1
     else:
         regreturn = -1
-    ql.nprint("read(%d, 0x%x, 0x%x) = %d" % (read_fd, read_buf, read_len, regreturn))
+    ql.nprint("read(%d, 0x%x, 0x%x) = %d", read_fd, read_buf, read_len, regreturn)
 
     if data:
         ql.dprint("|--->>> read() CONTENT:")
@@ -737,7 +732,7 @@ def ql_syscall_write(ql, uc, write_fd, write_buf, write_count, null0, null1, nul
         regreturn = -1
         if ql.output in (QL_OUT_DEBUG, QL_OUT_DUMP):
             raise
-    ql.nprint("write(%d,%x,%i) = %d" % (write_fd, write_buf, write_count, regreturn))
+    ql.nprint("write(%d,%x,%i) = %d", write_fd, write_buf, write_count, regreturn)
     if buf:
         ql.dprint("|--->>> write() CONTENT:")
         ql.dprint(buf)
@@ -746,13 +741,10 @@ def ql_syscall_write(ql, uc, write_fd, write_buf, write_count, null0, null1, nul
 
 def ql_syscall_writev(ql, uc, writev_fd, writev_vec, writev_vien, null0, null1, null2):
     regreturn = 0
-    size_t_len = ql.archbit // 8
-    iov = uc.mem_read(writev_vec, writev_vien * size_t_len * 2)
-    ql.nprint("writev(0x%x, 0x%x, 0x%x)" % (writev_fd, writev_vec, writev_vien))
-    for i in range(writev_vien):
-        addr = ql.unpack(iov[i * size_t_len * 2 : i * size_t_len * 2 + size_t_len])
-        l = ql.unpack(iov[i * size_t_len * 2 + size_t_len : i * size_t_len * 2 + size_t_len * 2])
-        ql.nprint("|--->>> writev() CONTENT : %s" % str(uc.mem_read(addr, l)))
+    iov = ql.mem_read_ptrs(writev_vec, writev_vien * 2)
+    ql.nprint("writev(0x%x, 0x%x, 0x%x)", writev_fd, writev_vec, writev_vien)
+    for buf in ql.mem_read_many(zip(iov[0 : : 2], iov[1 : : 2])):
+        ql.nprint("|--->>> writev() CONTENT : %s", buf)
     ql_definesyscall_return(ql, uc, regreturn)    
     
 
@@ -760,7 +752,7 @@ def ql_syscall_archprctl(ql, uc, null0, ARCH_SET_FS, null1, null2, null3, null4)
     FSMSR = 0xC0000100
     uc.msr_write(FSMSR, ARCH_SET_FS)
     regreturn = 0
-    ql.nprint("archprctl(0x%x) = %d" % (ARCH_SET_FS, regreturn))
+    ql.nprint("archprctl(0x%x) = %d", ARCH_SET_FS, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -777,25 +769,25 @@ def ql_syscall_readlink(ql, uc, path_name, path_buff, path_buffsize, null0, null
         FILEPATH = ql.path
         localpath = os.path.abspath(FILEPATH)
         localpath = bytes(localpath, 'utf-8') + b'\x00'
-        uc.mem_write(path_buff, localpath)
+        ql.mem_write(path_buff, localpath)
         regreturn = (len(localpath)-1)
     else:
         regreturn = 0x0    
     
-    ql.nprint("readlink(%s, 0x%x, 0x%x) = %d" % (relative_path, path_buff, path_buffsize, regreturn))
+    ql.nprint("readlink(%s, 0x%x, 0x%x) = %d", relative_path, path_buff, path_buffsize, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
 def ql_syscall_getcwd(ql, uc, path_buff, path_buffsize, null0, null1, null2, null3):
     localpath = ql_transform_to_relative_path(ql, uc, './')
     localpath = bytes(localpath, 'utf-8') + b'\x00'
-    uc.mem_write(path_buff, localpath)
+    ql.mem_write(path_buff, localpath)
     regreturn = (len(localpath))
 
     pathname = (uc.mem_read(path_buff, 0x100).split(b'\x00'))[0]
     pathname = str(pathname, 'utf-8', errors="ignore")
 
-    ql.nprint("getcwd(%s, 0x%x) = %d" % (pathname, path_buffsize, regreturn))
+    ql.nprint("getcwd(%s, 0x%x) = %d", pathname, path_buffsize, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -811,10 +803,10 @@ def ql_syscall_chdir(ql, uc, path_name, null0, null1, null2, null3, null4):
             pass
         else:
             ql.current_path = relative_path + '/'
-        ql.nprint("chdir(%s) = %d"% (relative_path, regreturn))
+        ql.nprint("chdir(%s) = %d", relative_path, regreturn)
     else:
         regreturn = -1    
-        ql.nprint("chdir(%s) = %d : Not Found" % (relative_path, regreturn))
+        ql.nprint("chdir(%s) = %d : Not Found", relative_path, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)     
 
 
@@ -831,20 +823,20 @@ def ql_syscall_readlinkat(ql, uc, readlinkat_dfd, readlinkat_path, readlinkat_bu
         FILEPATH = ql.path
         localpath = os.path.abspath(FILEPATH)
         localpath = bytes(localpath, 'utf-8') + b'\x00'
-        uc.mem_write(readlinkat_buf, localpath)
+        ql.mem_write(readlinkat_buf, localpath)
         regreturn = (len(localpath)-1)
     else:
         regreturn = 0x0
 
-    ql.nprint("readlinkat(0x%x, 0x%x, 0x%x, 0x%x) = %d" % (readlinkat_dfd, readlinkat_path, readlinkat_buf, readlinkat_bufsiz, regreturn))
+    ql.nprint("readlinkat(0x%x, 0x%x, 0x%x, 0x%x) = %d", readlinkat_dfd, readlinkat_path, readlinkat_buf, readlinkat_bufsiz, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
 def ql_syscall_ugetrlimit(ql, uc, ugetrlimit_resource, ugetrlimit_rlim, null0, null1, null2, null3):
     rlim = resource.getrlimit(ugetrlimit_resource)
-    uc.mem_write(ugetrlimit_rlim, ql.pack32s(rlim[0]) + ql.pack32s(rlim[1]))
+    ql.mem_write(ugetrlimit_rlim, ql.pack32s(rlim[0]) + ql.pack32s(rlim[1]))
     regreturn = 0
-    ql.nprint("ugetrlimit(%d, 0x%x) = %d" % (ugetrlimit_resource, ugetrlimit_rlim, regreturn))
+    ql.nprint("ugetrlimit(%d, 0x%x) = %d", ugetrlimit_resource, ugetrlimit_rlim, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -855,19 +847,19 @@ def ql_syscall_setrlimit(ql, uc, setrlimit_resource, setrlimit_rlim, null0, null
     resource.setrlimit(setrlimit_resource, tmp_rlim)
 
     regreturn = 0
-    ql.nprint("setrlimit(%d, 0x%x) = %d" % (setrlimit_resource, setrlimit_rlim, regreturn))
+    ql.nprint("setrlimit(%d, 0x%x) = %d", setrlimit_resource, setrlimit_rlim, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
 def ql_syscall_rt_sigaction(ql, uc, rt_sigaction_signum, rt_sigaction_act, rt_sigaction_oldact, null0, null1, null2):
     if rt_sigaction_oldact != 0:
         if ql.sigaction_act[rt_sigaction_signum] == 0:
-            uc.mem_write(rt_sigaction_oldact, b'\x00' * 20)
+            ql.mem_write(rt_sigaction_oldact, b'\x00' * 20)
         else:
             data = b''
             for key in ql.sigaction_act[rt_sigaction_signum]:
                 data += ql.pack32(key)
-            uc.mem_write(rt_sigaction_oldact, data)
+            ql.mem_write(rt_sigaction_oldact, data)
 
     if rt_sigaction_act != 0:
         data = []
@@ -876,7 +868,7 @@ def ql_syscall_rt_sigaction(ql, uc, rt_sigaction_signum, rt_sigaction_act, rt_si
         ql.sigaction_act[rt_sigaction_signum] = data
 
     regreturn = 0
-    ql.nprint("rt_sigaction(0x%x, 0x%x, = 0x%x) = %d" % (rt_sigaction_signum, rt_sigaction_act, rt_sigaction_oldact, regreturn))
+    ql.nprint("rt_sigaction(0x%x, 0x%x, = 0x%x) = %d", rt_sigaction_signum, rt_sigaction_act, rt_sigaction_oldact, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -949,9 +941,9 @@ def ql_syscall_ioctl(ql, uc, ioctl_fd, ioctl_cmd, ioctl_arg, null0, null1, null2
     if isinstance(ql.file_des[ioctl_fd], ql_socket) and (ioctl_cmd == SIOCGIFADDR or ioctl_cmd == SIOCGIFNETMASK):
         try:
             tmp_arg = uc.mem_read(ioctl_arg, 64)
-            ql.dprint("|--->>> Query network card : %s" % tmp_arg)
+            ql.dprint("|--->>> Query network card : %s", tmp_arg)
             data = ql.file_des[ioctl_fd].ioctl(ioctl_cmd, bytes(tmp_arg))
-            uc.mem_write(ioctl_arg, data)
+            ql.mem_write(ioctl_arg, data)
             regreturn = 0
         except:
             regreturn = -1
@@ -960,17 +952,17 @@ def ql_syscall_ioctl(ql, uc, ioctl_fd, ioctl_cmd, ioctl_arg, null0, null1, null2
             info = ioctl(ioctl_fd, ioctl_cmd, ioctl_arg)
             if ioctl_cmd == TCGETS:
                 data = struct.pack("BBBB", *info)
-                uc.mem_write(ioctl_arg, data)
+                ql.mem_write(ioctl_arg, data)
             elif ioctl_cmd == TIOCGWINSZ:
                 data = struct.pack("HHHH", *info)
-                uc.mem_write(ioctl_arg, data)
+                ql.mem_write(ioctl_arg, data)
             else:
                 return
             regreturn = 0
         except :
             regreturn = -1
 
-    ql.nprint("ioctl(0x%x, 0x%x, 0x%x) = %d" % (ioctl_fd, ioctl_cmd, ioctl_arg, regreturn))
+    ql.nprint("ioctl(0x%x, 0x%x, 0x%x) = %d", ioctl_fd, ioctl_cmd, ioctl_arg, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -994,48 +986,45 @@ def ql_syscall_rt_sigprocmask(ql, uc, rt_sigprocmask_how, rt_sigprocmask_nset, r
         pass
 
     regreturn = 0
-    ql.nprint("rt_sigprocmask(0x%x, 0x%x, 0x%x, 0x%x) = %d" % (rt_sigprocmask_how, rt_sigprocmask_nset, rt_sigprocmask_oset, rt_sigprocmask_sigsetsize, regreturn))
+    ql.nprint("rt_sigprocmask(0x%x, 0x%x, 0x%x, 0x%x) = %d", rt_sigprocmask_how, rt_sigprocmask_nset, rt_sigprocmask_oset, rt_sigprocmask_sigsetsize, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
 def ql_syscall_vfork(ql, uc, null0, null1, null2, null3, null4, null5):
+    ql.log.flush()
     pid = os.fork()
     
     if pid == 0:
         ql.child_processes = True
         regreturn = 0
-        if ql.thread_management != None:
-            ql.thread_management.cur_thread.set_thread_log_file(ql.log_file_name)
-        else:
-            if ql.log_file_name != None:
-                ql.log_file_fd = open(ql.log_file_name + "_" + str(os.getpid()) + ".qlog", 'w+')
+        ql.log.fork()
     else:
         regreturn = pid
     
     if ql.thread_management != None:
         uc.emu_stop()
         
-    ql.nprint("vfork() = %d" % regreturn)
+    ql.nprint("vfork() = %d", regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
 def ql_syscall_setsid(ql, uc, null0, null1, null2, null3, null4, null5):
     regreturn = os.getpid()
-    ql.nprint("setsid() = %d" % regreturn)
+    ql.nprint("setsid() = %d", regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
 def ql_syscall_time(ql, uc, null0, null1, null2, null3, null4, null5):
     regreturn = int(time.time()) 
-    ql.nprint("time() = %d" % regreturn)
+    ql.nprint("time() = %d", regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
 def ql_syscall_wait4(ql, uc, wait4_pid, wait4_wstatus, wait4_options, wait4_rusage, null0, null1):
     spid, status, rusage = os.wait4(wait4_pid, wait4_options)
-    uc.mem_write(wait4_wstatus, ql.pack32(status))
+    ql.mem_write(wait4_wstatus, ql.pack32(status))
     regreturn = spid
-    ql.nprint("wait4(%d, %d) = %d"% (wait4_pid, wait4_options, regreturn))
+    ql.nprint("wait4(%d, %d) = %d", wait4_pid, wait4_options, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -1047,27 +1036,19 @@ def ql_syscall_execve(ql, uc, execve_pathname, execve_argv, execve_envp, null0,
 
     argv = []
     if execve_argv != 0:
-        while True:
-            argv_addr = ql.unpack32(uc.mem_read(execve_argv, 4))
-            if argv_addr == 0:
-                break
+        for argv_addr in ql.mem_read_ptr_list(execve_argv):
             argv.append(ql_read_string(ql, uc, argv_addr))
-            execve_argv += 4
     
     env = {}
     if execve_envp != 0:
-        while True:
-            env_addr = ql.unpack32(uc.mem_read(execve_envp, 4))
-            if env_addr == 0:
-                break
+        for env_addr in ql.mem_read_ptr_list(execve_envp):
             env_str = ql_read_string(ql, uc, env_addr)
             idx = env_str.index('=')
             key = env_str[ : idx]
             val = env_str[idx + 1 : ]
             env[key] = val
-            execve_envp += 4
     
-    ql.nprint("execve(%s, [%s], [%s])"% (pathname, ', '.join(argv), ', '.join([key + '=' + value for key, value in env.items()])))
+    ql.nprint("execve(%s, [%s], [%s])", pathname, QlLogJoin(', ', argv), QlLogJoin(', ', env.items(), "%s=%s"))
     ql.uc.emu_stop()
 
     if ql.shellcoder:
@@ -1077,7 +1058,7 @@ def ql_syscall_execve(ql, uc, execve_pathname, execve_argv, execve_envp, null0,
         ql.argv = argv
         ql.env = env
         ql.path = real_path
-        ql.map_info = []
+        ql.map_info.clear()
 
         ql.runtype = ql_get_os_module_function(ql.ostype, ql.arch, "runner")
         loader_file = ql_get_os_module_function(ql.ostype, ql.arch, "loader_file")
@@ -1105,7 +1086,7 @@ def ql_syscall_socket(ql, uc, socket_domain, socket_type, socket_protocol, null0
     except:
         regreturn = -1
 
-    ql.nprint("socket(%d, %d, %d) = %d" % (socket_domain, socket_type, socket_protocol, regreturn))
+    ql.nprint("socket(%d, %d, %d) = %d", socket_domain, socket_type, socket_protocol, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -1137,11 +1118,11 @@ def ql_syscall_connect(ql, uc, connect_sockfd, connect_addr, connect_addrlen, nu
     except:
         regreturn = -1
     if s.family == AF_UNIX:
-        ql.nprint("connect(%s) = %d" % (sun_path.decode(), regreturn))
+        ql.nprint("connect(%s) = %d", sun_path.decode(), regreturn)
     elif s.family == AF_INET:
-        ql.nprint("connect(%s, %d) = %d" % (ip, port, regreturn))
+        ql.nprint("connect(%s, %d) = %d", ip, port, regreturn)
     else:
-        ql.nprint("connect() = %d" % (regreturn))
+        ql.nprint("connect() = %d", regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -1160,7 +1141,7 @@ def ql_syscall_dup2(ql, uc, dup2_oldfd, dup2_newfd, null0, null1, null2, null3):
             regreturn = -1
     else:
         regreturn = -1
-    ql.nprint("dup2(%d, %d) = %d" % (dup2_oldfd, dup2_newfd, regreturn))
+    ql.nprint("dup2(%d, %d) = %d", dup2_oldfd, dup2_newfd, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -1182,7 +1163,7 @@ def ql_syscall_fcntl(ql, uc, fcntl_fd, fcntl_cmd, null0, null1, null2, null3):
     elif fcntl_cmd == F_SETFL:
         regreturn = 0
 
-    ql.nprint("fcntl(%d, %d) = %d" % (fcntl_fd, fcntl_cmd, regreturn))
+    ql.nprint("fcntl(%d, %d) = %d", fcntl_fd, fcntl_cmd, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -1198,12 +1179,12 @@ def ql_syscall_fcntl64(ql, uc, fcntl_fd, fcntl_cmd, fcntl_arg, null1, null2, nul
     else:
         regreturn = 0    
 
-    ql.nprint("fcntl64(%d, %d, %d) = %d" % (fcntl_fd, fcntl_cmd, fcntl_arg, regreturn))
+    ql.nprint("fcntl64(%d, %d, %d) = %d", fcntl_fd, fcntl_cmd, fcntl_arg, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
 def ql_syscall_shutdown(ql, uc, shutdown_fd, shutdown_how, null0, null1, null2, null3):
-    ql.nprint("shutdown(%d, %d)" % (shutdown_fd, shutdown_how))
+    ql.nprint("shutdown(%d, %d)", shutdown_fd, shutdown_how)
     if shutdown_fd >=0 and shutdown_fd < 256 and ql.file_des[shutdown_fd] != 0:
         try:
             ql.file_des[shutdown_fd].shutdown(shutdown_how)
@@ -1250,7 +1231,7 @@ def ql_syscall_bind(ql, uc, bind_fd, bind_addr, bind_addrlen,  null0, null1, nul
     if ql.shellcoder:
         regreturn = 0
 
-    ql.nprint("bind(%d,%s:%d,%d) = %d" % (bind_fd, host, port, bind_addrlen,regreturn))
+    ql.nprint("bind(%d,%s:%d,%d) = %d", bind_fd, host, port, bind_addrlen, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -1265,7 +1246,7 @@ def ql_syscall_listen(ql, uc, listen_sockfd, listen_backlog, null0, null1, null2
             regreturn = -1
     else:
         regreturn = -1
-    ql.nprint("listen(%d, %d) = %d" % (listen_sockfd, listen_backlog, regreturn))
+    ql.nprint("listen(%d, %d) = %d", listen_sockfd, listen_backlog, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -1290,7 +1271,7 @@ def ql_syscall_nanosleep(ql, uc, nanosleep_req, nanosleep_rem, null0, null1, nul
         th.set_blocking_condition(nanosleep_block_fuc, [ql.thread_management.runing_time, int(tv_sec * 1000000)])
 
     regreturn = 0
-    ql.nprint("nanosleep(0x%x, 0x%x) = %d" % (nanosleep_req, nanosleep_rem, regreturn))
+    ql.nprint("nanosleep(0x%x, 0x%x) = %d", nanosleep_req, nanosleep_rem, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -1299,7 +1280,7 @@ def ql_syscall_setitimer(ql, uc, setitimer_which, setitimer_new_value, setitimer
     # When any timer expires, a signal is sent to the process, and the timer (potentially) restarts.
     # But I haven’t figured out how to send a signal yet.
     regreturn = 0
-    ql.nprint("setitimer(%d, %x, %x) = %d" % (setitimer_which, setitimer_new_value, setitimer_old_value, regreturn))
+    ql.nprint("setitimer(%d, %x, %x) = %d", setitimer_which, setitimer_new_value, setitimer_old_value, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -1339,23 +1320,23 @@ def ql_syscall__newselect(ql, uc, _newselect_nfds, _newselect_readfds, _newselec
             for i in ans[0]:
                 print("debug : " + str(tmp_r_map[i]))
                 tmp_buf = set_fd_set(tmp_buf, tmp_r_map[i])
-            uc.mem_write(_newselect_readfds, tmp_buf)
+            ql.mem_write(_newselect_readfds, tmp_buf)
 
         if _newselect_writefds != 0:
             tmp_buf = b'\x00' * (_newselect_nfds // 8 + 1)
             for i in ans[1]:
                 tmp_buf = set_fd_set(tmp_buf, tmp_w_map[i])
-            uc.mem_write(_newselect_writefds, tmp_buf)
+            ql.mem_write(_newselect_writefds, tmp_buf)
 
         if _newselect_exceptfds != 0:
             tmp_buf = b'\x00' * (_newselect_nfds // 8 + 1)
             for i in ans[2]:
                 tmp_buf = set_fd_set(tmp_buf, tmp_e_map[i])
-            uc.mem_write(_newselect_exceptfds, tmp_buf)
+            ql.mem_write(_newselect_exceptfds, tmp_buf)
     except:
         if ql.output in (QL_OUT_DEBUG, QL_OUT_DUMP):
             raise
-    ql.nprint("_newselect(%d, %x, %x, %x, %x) = %d" % (_newselect_nfds, _newselect_readfds, _newselect_writefds, _newselect_exceptfds, _newselect_timeout, regreturn))
+    ql.nprint("_newselect(%d, %x, %x, %x, %x) = %d", _newselect_nfds, _newselect_readfds, _newselect_writefds, _newselect_exceptfds, _newselect_timeout, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -1386,13 +1367,13 @@ def ql_syscall_accept(ql, uc, accept_sockfd, accept_addr, accept_addrlen, null0,
             tmp_buf += ql.pack16(address[1])
             tmp_buf += inet_addr(address[0])
             tmp_buf += b'\x00' * 8
-            uc.mem_write(accept_addr, tmp_buf)
-            uc.mem_write(accept_addrlen, ql.pack32(16))
+            ql.mem_write(accept_addr, tmp_buf)
+            ql.mem_write(accept_addrlen, ql.pack32(16))
     except:
         if ql.output in (QL_OUT_DEBUG, QL_OUT_DUMP):
             raise
         regreturn = -1
-    ql.nprint("accep(%d, %x, %x) = %d" %(accept_sockfd, accept_addr, accept_addrlen, regreturn))
+    ql.nprint("accep(%d, %x, %x) = %d", accept_sockfd, accept_addr, accept_addrlen, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -1404,9 +1385,9 @@ def ql_syscall_times(ql, uc, times_tbuf, null0, null1, null2, null3, null4):
         tmp_buf += ql.pack32(int(tmp_times.system * 1000))
         tmp_buf += ql.pack32(int(tmp_times.children_user * 1000))
         tmp_buf += ql.pack32(int(tmp_times.children_sytem * 1000))
-        uc.mem_write(times_tbuf, tmp_buf)
+        ql.mem_write(times_tbuf, tmp_buf)
     regreturn = int(tmp_times.elapsed * 100)
-    ql.nprint('times(%x) = %d' % (times_tbuf, regreturn))
+    ql.nprint('times(%x) = %d', times_tbuf, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -1416,22 +1397,22 @@ def ql_syscall_gettimeofday(ql, uc, gettimeofday_tv, gettimeofday_tz, null0, nul
     tv_usec = int((tmp_time - tv_sec) * 1000000)
 
     if gettimeofday_tv != 0:
-        uc.mem_write(gettimeofday_tv, ql.pack32(tv_sec) + ql.pack32(tv_usec))
+        ql.mem_write(gettimeofday_tv, ql.pack32(tv_sec) + ql.pack32(tv_usec))
     if gettimeofday_tz != 0:
-        uc.mem_write(gettimeofday_tz, b'\x00' * 8)
+        ql.mem_write(gettimeofday_tz, b'\x00' * 8)
     regreturn = 0
-    ql.nprint("gettimeofday(%x, %x) = %d" % (gettimeofday_tv, gettimeofday_tz, regreturn))
+    ql.nprint("gettimeofday(%x, %x) = %d", gettimeofday_tv, gettimeofday_tz, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
 def ql_syscall_recv(ql, uc, recv_sockfd, recv_buf, recv_len, recv_flags, null0, null1):
     if recv_sockfd < 256 and ql.file_des[recv_sockfd] != 0:
         tmp_buf = ql.file_des[recv_sockfd].recv(recv_len, recv_flags)
-        uc.mem_write(recv_buf, tmp_buf)
+        ql.mem_write(recv_buf, tmp_buf)
         regreturn = len(tmp_buf)
     else:
         regreturn = -1
-    ql.nprint("recv(%d, %x, %d, %x) = %d" % (recv_sockfd, recv_buf, recv_len, recv_flags, regreturn))
+    ql.nprint("recv(%d, %x, %d, %x) = %d", recv_sockfd, recv_buf, recv_len, recv_flags, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -1455,7 +1436,7 @@ def ql_syscall_send(ql, uc, send_sockfd, send_buf, send_len, send_flags, null0,
                 raise
     else:
         regreturn = -1
-    ql.nprint("send(%d, %x, %d, %x) = %d" % (send_sockfd, send_buf, send_len, send_flags, regreturn))
+    ql.nprint("send(%d, %x, %d, %x) = %d", send_sockfd, send_buf, send_len, send_flags, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -1484,20 +1465,13 @@ def ql_syscall_socketcall(ql, uc, socketcall_call, socketcall_args, null0, null1
     ql.print("socketcall(%d, %x)" % (socketcall_call, socketcall_args))
 
     if socketcall_call == SOCKETCALL_SYS_SOCKET:
-        socketcall_domain = ql.unpack(uc.mem_read(socketcall_args, ql.byte))
-        socketcall_type = ql.unpack(uc.mem_read(socketcall_args + ql.byte, ql.byte))
-        socketcall_protocol = ql.unpack(uc.mem_read(socketcall_args + ql.byte * 2, ql.byte))
+        socketcall_domain, socketcall_type, socketcall_protocol = ql.mem_read_ptrs(socketcall_args, 3)
         ql_syscall_socket(ql, uc, socketcall_domain, socketcall_type, socketcall_protocol, 0, 0, 0)
     elif socketcall_call == SOCKETCALL_SYS_CONNECT:
-        socketcall_sockfd = ql.unpack(uc.mem_read(socketcall_args, ql.byte))
-        socketcall_addr = ql.unpack(uc.mem_read(socketcall_args + ql.byte, ql.byte))
-        socketcall_addrlen = ql.unpack(uc.mem_read(socketcall_args + ql.byte * 2, ql.byte))
+        socketcall_sockfd, socketcall_addr, socketcall_addrlen = ql.mem_read_ptrs(socketcall_args, 3)
         ql_syscall_connect(ql, uc, socketcall_sockfd, socketcall_addr, socketcall_addrlen, 0, 0, 0)
     elif socketcall_call == SOCKETCALL_SYS_RECV:
-        socketcall_sockfd = ql.unpack(uc.mem_read(socketcall_args, ql.byte))
-        socketcall_buf = ql.unpack(uc.mem_read(socketcall_args + ql.byte, ql.byte))
-        socketcall_len = ql.unpack(uc.mem_read(socketcall_args + ql.byte * 2, ql.byte))
-        socketcall_flags = ql.unpack(uc.mem_read(socketcall_args + ql.byte * 3, ql.byte))
+        socketcall_sockfd, socketcall_buf, socketcall_len, socketcall_flags = ql.mem_read_ptrs(socketcall_args, 4)
         ql_syscall_recv(ql, uc, socketcall_sockfd, socketcall_buf, socketcall_len, socketcall_flags, 0, 0)
     else:
         ql.print("[!] error call %d" % socketcall_call)
@@ -1537,17 +1511,18 @@ def ql_syscall_clone(ql, uc, clone_flags, clone_child_stack, clone_parent_tidptr
 
     # Shared virtual memory
     if clone_flags & CLONE_VM != CLONE_VM:
+        ql.log.flush()
         pid = os.fork()
         if pid != 0:
             regreturn = pid
-            ql.nprint("clone(new_stack = %x, flags = %x, tls = %x, ptidptr = %x, ctidptr = %x) = %d" % (clone_child_stack, clone_flags, clone_newtls, clone_parent_tidptr, clone_child_tidptr, regreturn))
+            ql.nprint("clone(new_stack = %x, flags = %x, tls = %x, ptidptr = %x, ctidptr = %x) = %d", clone_child_stack, clone_flags, clone_newtls, clone_parent_tidptr, clone_child_tidptr, regreturn)
             ql_definesyscall_return(ql, uc, regreturn)
         else:
             ql.child_processes = True
 
             f_th.update_global_thread_id()
             f_th.new_thread_id()
-            f_th.set_thread_log_file(ql.log_file_name)
+            ql.log.fork()
 
             if clone_flags & CLONE_SETTLS == CLONE_SETTLS:
                 if ql.arch == QL_X86:
@@ -1562,7 +1537,7 @@ def ql_syscall_clone(ql, uc, clone_flags, clone_child_stack, clone_parent_tidptr
             if clone_child_stack != 0:
                 ql.archfunc.set_sp(clone_child_stack)
             regreturn = 0
-            ql.nprint("clone(new_stack = %x, flags = %x, tls = %x, ptidptr = %x, ctidptr = %x) = %d" % (clone_child_stack, clone_flags, clone_newtls, clone_parent_tidptr, clone_child_tidptr, regreturn))
+            ql.nprint("clone(new_stack = %x, flags = %x, tls = %x, ptidptr = %x, ctidptr = %x) = %d", clone_child_stack, clone_flags, clone_newtls, clone_parent_tidptr, clone_child_tidptr, regreturn)
             ql_definesyscall_return(ql, uc, regreturn)
         uc.emu_stop()
         return
@@ -1598,8 +1573,8 @@ def ql_syscall_clone(ql, uc, clone_flags, clone_child_stack, clone_parent_tidptr
     th.save()
     
     ql.thread_management.cur_thread = th
-    ql.nprint("[+] Currently running pid is: %d; tid is: %d " % (os.getpid() ,ql.thread_management.cur_thread.get_thread_id()))
-    ql.nprint("clone(new_stack = %x, flags = %x, tls = %x, ptidptr = %x, ctidptr = %x) = %d" % (clone_child_stack, clone_flags, clone_newtls, clone_parent_tidptr, clone_child_tidptr, regreturn))
+    ql.nprint("[+] Currently running pid is: %d; tid is: %d ", os.getpid(), ql.thread_management.cur_thread.get_thread_id())
+    ql.nprint("clone(new_stack = %x, flags = %x, tls = %x, ptidptr = %x, ctidptr = %x) = %d", clone_child_stack, clone_flags, clone_newtls, clone_parent_tidptr, clone_child_tidptr, regreturn)
 
     # Restore the stack and return value of the parent process
     ql.archfunc.set_sp(f_sp)
@@ -1612,14 +1587,14 @@ def ql_syscall_clone(ql, uc, clone_flags, clone_child_stack, clone_parent_tidptr
     f_th.stop_return_val = th
 
     ql.thread_management.cur_thread = f_th
-    ql.nprint("[+] Currently running pid is: %d; tid is: %d " % (os.getpid() ,ql.thread_management.cur_thread.get_thread_id()))
-    ql.nprint("clone(new_stack = %x, flags = %x, tls = %x, ptidptr = %x, ctidptr = %x) = %d" % (clone_child_stack, clone_flags, clone_newtls, clone_parent_tidptr, clone_child_tidptr, regreturn))
+    ql.nprint("[+] Currently running pid is: %d; tid is: %d ", os.getpid(), ql.thread_management.cur_thread.get_thread_id())
+    ql.nprint("clone(new_stack = %x, flags = %x, tls = %x, ptidptr = %x, ctidptr = %x) = %d", clone_child_stack, clone_flags, clone_newtls, clone_parent_tidptr, clone_child_tidptr, regreturn)
 
 
 def ql_syscall_set_tid_address(ql, uc, set_tid_address_tidptr, null0, null1, null2, null3, null4):
     ql.thread_management.cur_thread.set_clear_child_tid_addr(set_tid_address_tidptr)
     regreturn = ql.thread_management.cur_thread.get_thread_id()
-    ql.nprint("set_tid_address(%x) = %d" % (set_tid_address_tidptr, regreturn))
+    ql.nprint("set_tid_address(%x) = %d", set_tid_address_tidptr, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -1627,7 +1602,7 @@ def ql_syscall_set_robust_list(ql, uc, set_robust_list_head_ptr, set_robust_list
     ql.thread_management.cur_thread.robust_list_head_ptr = set_robust_list_head_ptr
     ql.thread_management.cur_thread.robust_list_head_len = set_robust_list_head_len
     regreturn = 0
-    ql.nprint("set_robust_list(%x, %x) = %d"%(set_robust_list_head_ptr, set_robust_list_head_len, regreturn))
+    ql.nprint("set_robust_list(%x, %x) = %d", set_robust_list_head_ptr, set_robust_list_head_len, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -1658,12 +1633,12 @@ def ql_syscall_futex(ql, uc, futex_uaddr, futex_op, futex_val, futex_timeout, fu
         ql.thread_management.cur_thread.blocking()
         ql.thread_management.cur_thread.set_blocking_condition(futex_wait_addr, [futex_uaddr, futex_val])
         regreturn = 0
-        ql.nprint("futex(%x, %d, %d, %x) = %d" % (futex_uaddr, futex_op, futex_val, futex_timeout, regreturn))
+        ql.nprint("futex(%x, %d, %d, %x) = %d", futex_uaddr, futex_op, futex_val, futex_timeout, regreturn)
     elif futex_op & (FUTEX_PRIVATE_FLAG - 1) == FUTEX_WAKE:
         regreturn = 0
-        ql.nprint("futex(%x, %d, %d) = %d" % (futex_uaddr, futex_op, futex_val, regreturn))
+        ql.nprint("futex(%x, %d, %d) = %d", futex_uaddr, futex_op, futex_val, regreturn)
     else:
-        ql.nprint("futex(%x, %d, %d) = ?" % (futex_uaddr, futex_op, futex_val))
+        ql.nprint("futex(%x, %d, %d) = ?", futex_uaddr, futex_op, futex_val)
         uc.emu_stop()
         ql.thread_management.cur_thread.stop()
         ql.thread_management.cur_thread.stop_event = THREAD_EVENT_EXIT_GROUP_EVENT
@@ -1675,7 +1650,7 @@ def ql_syscall_futex(ql, uc, futex_uaddr, futex_op, futex_val, futex_timeout, fu
 def ql_syscall_gettid(ql, uc, null0, null1, null2, null3, null4, null5):
     th = ql.thread_management.cur_thread
     regreturn = th.get_thread_id()    
-    ql.nprint("gettid() = %d" % regreturn)
+    ql.nprint("gettid() = %d", regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -1704,23 +1679,23 @@ def ql_syscall_pipe(ql, uc, pipe_pipefd, null0, null1, null2, null3, null4):
                 uc.reg_write(UC_MIPS_REG_V1, idx2)
                 regreturn = idx1
             else:
-                uc.mem_write(pipe_pipefd, ql.pack32(idx1) + ql.pack32(idx2))
+                ql.mem_write(pipe_pipefd, ql.pack32(idx1) + ql.pack32(idx2))
                 regreturn = 0
     
-    ql.nprint("pipe(%x, [%d, %d]) = %d" % (pipe_pipefd, idx1, idx2, regreturn))
+    ql.nprint("pipe(%x, [%d, %d]) = %d", pipe_pipefd, idx1, idx2, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
 def ql_syscall_nice(ql, uc, nice_inc, null0, null1, null2, null3, null4):
     regreturn = 0
-    ql.nprint("nice(%d) = %d" % (nice_inc, regreturn))
+    ql.nprint("nice(%d) = %d", nice_inc, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
 def ql_syscall_getpriority(ql, uc, getpriority_which, getpriority_who, null1, null2, null3, null4):
     base = os.getpriority(getpriority_which, getpriority_who)
     regreturn = base
-    ql.nprint("getpriority(0x%x, 0x%x) = %d" % (getpriority_which, getpriority_who, regreturn))
+    ql.nprint("getpriority(0x%x, 0x%x) = %d", getpriority_which, getpriority_who, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
 
 
@@ -1732,6 +1707,6 @@ def ql_syscall_sendfile64(ql, uc, sendfile64_out_fd, sendfile64_in_fd, sendfile6
     else:
         regreturn = -1
     
-    ql.nprint("sendfile64(%d, %d, %x, %d) = %d" % (sendfile64_out_fd, sendfile64_in_fd, sendfile64_offest, sendfile64_count, regreturn))
+    ql.nprint("sendfile64(%d, %d, %x, %d) = %d", sendfile64_out_fd, sendfile64_in_fd, sendfile64_offest, sendfile64_count, regreturn)
     ql_definesyscall_return(ql, uc, regreturn)
         
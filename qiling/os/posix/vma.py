@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+#
+# Cross Platform and Multi Architecture Advanced Binary Emulation Framework
+# Built on top of Unicorn emulator (www.unicorn-engine.org)
+#
+# LAU kaijern (xwings) <kj@qiling.io>
+# NGUYEN Anh Quynh <aquynh@gmail.com>
+# DING tianZe (D1iv3) <dddliv3@gmail.com>
+# SUN bowen (w1tcher) <w1tcher.bupt@gmail.com>
+# CHEN huitao (null) <null@qiling.io>
+# YU tong (sp1ke) <spikeinhouse@gmail.com>
+
+"""
+Virtual memory areas of the posix targets, behind mmap, munmap, mprotect and brk.
+The memory mapped in unicorn is the only record of what is in use: new areas go
+into the first gap above ql.mmap_start that fits, unmapped ranges are handed
+back to unicorn and reused, and the labels in ql.map_info and the checkpoint
+tracker are kept in step with every change.
+"""
+
+from unicorn import *
+
+from qiling.arch.filetype import *
+from qiling.os.utils import ql_mem_map_file_release
+
+
+QL_VMA_PAGE_SIZE = 0x1000
+
+# nothing is placed below this, like mmap_min_addr of linux
+QL_VMA_MIN_ADDRESS = 0x10000
+
+
+def ql_vma_align(size):
+    return (size + QL_VMA_PAGE_SIZE - 1) // QL_VMA_PAGE_SIZE * QL_VMA_PAGE_SIZE
+
+
+# end of the user address space areas are placed below
+def ql_vma_top(ql):
+    if ql.archbit == 64:
+        return 1 << 47
+    elif ql.arch == QL_MIPS32EL:
+        return 0x80000000
+    return 1 << 32
+
+
+# mapped memory as sorted (begin, end) pairs, end exclusive
+def ql_vma_regions(ql):
+    return sorted((begin, end + 1) for begin, end, perms in ql.uc.mem_regions())
+
+
+def ql_vma_is_free(ql, address, size):
+    if address + size > ql_vma_top(ql):
+        return False
+    for begin, end in ql_vma_regions(ql):
+        if begin < address + size and end > address:
+            return False
+    return True
+
+
+# first gap of @size bytes at or above ql.mmap_start, None when there is none
+def ql_vma_find_free(ql, size):
+    address = max(ql.mmap_start, QL_VMA_MIN_ADDRESS)
+    for begin, end in ql_vma_regions(ql):
+        if end <= address:
+            continue
+        if begin >= address + size:
+            break
+        address = end
+    if address + size > ql_vma_top(ql):
+        return None
+    return address
+
+
+# map [address, address + size) afresh, zeroed, replacing whatever was there
+def ql_vma_map(ql, address, size, perms = UC_PROT_ALL, info = None):
+    ql_vma_unmap(ql, address, size)
+    ql.uc.mem_map(address, size, perms)
+    if info != None:
+        ql.insert_map_info(address, address + size, info)
+
+
+# unmap what is mapped of [address, address + size), holes are skipped; returns
+# False when nothing was
+def ql_vma_unmap(ql, address, size):
+    if ql.checkpointer != None:
+        ql.checkpointer.remapped(address, size)
+
+    unmapped = False
+    for begin, end in ql_vma_regions(ql):
+        b, e = max(begin, address), min(end, address + size)
+        if b < e:
+            ql.uc.mem_unmap(b, e - b)
+            unmapped = True
+
+    ql.map_info.remove(address, address + size)
+    ql_mem_map_file_release(ql)
+    return unmapped
+
+
+# set the protection of [address, address + size); False, and nothing changed,
+# when part of it is not mapped
+def ql_vma_protect(ql, address, size, perms):
+    covered = []
+    for begin, end in ql_vma_regions(ql):
+        b, e = max(begin, address), min(end, address + size)
+        if b < e:
+            covered.append((b, e))
+    if sum(e - b for b, e in covered) != size:
+        return False
+
+    if ql.checkpointer != None:
+        ql.checkpointer.remapped(address, size)
+    for b, e in covered:
+        ql.uc.mem_protect(b, e - b, perms)
+    return True
+
+
+# move the program break to @brk, returns the new break or the old one when it
+# can not be moved
+def ql_vma_brk(ql, brk):
+    new_brk = ql_vma_align(brk)
+    if new_brk > ql.brk_address:
+        if not ql_vma_is_free(ql, ql.brk_address, new_brk - ql.brk_address):
+            return ql.brk_address
+        ql_vma_map(ql, ql.brk_address, new_brk - ql.brk_address)
+    elif new_brk < ql.brk_address:
+        if new_brk < ql.brk_start:
+            return ql.brk_address
+        ql_vma_unmap(ql, new_brk, ql.brk_address - new_brk)
+    ql.brk_address = new_brk
+    return brk
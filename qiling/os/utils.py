@@ -20,20 +20,95 @@ from unicorn.x86_const import *
 from unicorn.arm64_const import *
 from unicorn.mips_const import *
 
-from capstone import *
-from capstone.arm_const import *
-from capstone.x86_const import *
-from capstone.arm64_const import *
-from capstone.mips_const import *
-
-from keystone import *
-
 from qiling.arch.filetype import *
 from qiling.exception import *
 from qiling.utils import *
 
 import struct
 import os
+import mmap
+import ctypes
+import hashlib
+from collections import OrderedDict
+
+
+# resolved syscall dispatch tables, one per (ostype, arch)
+QL_SYSCALL_TABLES = {}
+
+
+def ql_build_syscall_table(ql, syscall_list, namespace):
+    """
+    Resolve the [number, "handler"] pairs of an OS/arch syscall list against the
+    namespace of its os module. The result is built once per (ostype, arch) and
+    shared by every Qiling instance of that kind.
+    """
+    key = (ql.ostype, ql.arch)
+    table = QL_SYSCALL_TABLES.get(key)
+
+    if table is None:
+        table = {}
+        for syscall_num, syscall_name in syscall_list:
+            # first entry wins, same as the old list.index() lookup
+            table.setdefault(syscall_num, namespace[syscall_name.strip()])
+        QL_SYSCALL_TABLES[key] = table
+
+    return table
+
+
+def ql_setup_syscall_table(ql, syscall_list, namespace):
+    """
+    Give @ql its own dispatch table: the shared OS/arch table plus any handlers
+    installed with ql.set_syscall()
+    """
+    ql.syscall_table = dict(ql_build_syscall_table(ql, syscall_list, namespace))
+    ql.syscall_table.update(ql.user_syscall)
+    if ql.tracer != None:
+        ql.tracer.hook_syscall_table()
+    if ql.stats != None:
+        ql.stats.hook_syscall_table()
+
+
+def ql_wrap_syscall_table(ql, owner, wrap):
+    """
+    Put wrap(syscall_num, func) in front of every handler of ql.syscall_table
+    @owner has not wrapped yet. A wrapper calls the handler through its
+    ql_wrapped attribute, so ql_unwrap_syscall_table() can take it out of the
+    chain again whatever was wrapped around it since.
+    """
+    table = ql.syscall_table
+    for syscall_num, func in table.items():
+        if not ql_syscall_wrapped_by(func, owner):
+            wrapper = wrap(syscall_num, func)
+            wrapper.ql_wrapped = func
+            wrapper.ql_wrapper_owner = owner
+            table[syscall_num] = wrapper
+
+
+def ql_unwrap_syscall_table(ql, owner):
+    table = ql.syscall_table
+    if table == None:
+        return
+    for syscall_num, func in table.items():
+        table[syscall_num] = ql_syscall_unwrap(func, owner)
+
+
+def ql_syscall_wrapped_by(func, owner):
+    while hasattr(func, "ql_wrapped"):
+        if func.ql_wrapper_owner is owner:
+            return True
+        func = func.ql_wrapped
+    return False
+
+
+# @func without the wrappers of @owner
+def ql_syscall_unwrap(func, owner):
+    if not hasattr(func, "ql_wrapped"):
+        return func
+    inner = ql_syscall_unwrap(func.ql_wrapped, owner)
+    if func.ql_wrapper_owner is owner:
+        return inner
+    func.ql_wrapped = inner
+    return func
 
 
 def ql_definesyscall_return(ql, uc, regreturn):
@@ -63,6 +138,88 @@ def ql_definesyscall_return(ql, uc, regreturn):
         uc.reg_write(UC_MIPS_REG_V0, regreturn)
         uc.reg_write(UC_MIPS_REG_A3, a3return)
 
+# unicorn 1 picks the wrong backing block when it splits a region on a partial
+# mem_protect or mem_unmap and corrupts memory once a block was mapped with
+# mem_map_ptr, so mmap and the library loaders only map files in place from
+# unicorn 2 on
+QL_MEM_MAP_FILE = uc_version()[0] >= 2
+
+
+def ql_mem_map_file(ql, uc, address, size, fd, offset):
+    """
+    Map the host file @fd from @offset at @address without copying it: unicorn
+    is handed a private host mapping of the file, so pages are read from the page
+    cache and the first guest write to one gives it its own copy. Only whole
+    pages the file covers are mapped this way and memory already mapped there is
+    replaced. Returns the number of bytes mapped, 0 when the file can not be.
+    """
+    if not hasattr(mmap, "MAP_PRIVATE") or address % 0x1000 or offset % mmap.ALLOCATIONGRANULARITY:
+        return 0
+    try:
+        size = min(size, os.fstat(fd).st_size - offset) // 0x1000 * 0x1000
+    except OSError:
+        return 0
+    if size <= 0:
+        return 0
+
+    try:
+        mm = mmap.mmap(fd, size, flags = mmap.MAP_PRIVATE, prot = mmap.PROT_READ | mmap.PROT_WRITE, offset = offset)
+    except (OSError, ValueError):
+        return 0
+
+    for begin, end, perms in list(uc.mem_regions()):
+        b, e = max(begin, address), min(end + 1, address + size)
+        if b < e:
+            uc.mem_unmap(b, e - b)
+
+    ptr = ctypes.c_char.from_buffer(mm)
+    uc.mem_map_ptr(address, size, UC_PROT_ALL, ctypes.addressof(ptr))
+    ql_mem_map_file_release(ql)
+    ql.mmap_ptrs.append((address, size, mm, ptr))
+    return size
+
+
+# drop the host mappings of ql_mem_map_file no guest page is backed by any more
+def ql_mem_map_file_release(ql):
+    if not ql.mmap_ptrs:
+        return
+    regions = list(ql.uc.mem_regions())
+    ql.mmap_ptrs = [m for m in ql.mmap_ptrs
+                    if any(begin < m[0] + m[1] and end >= m[0] for begin, end, perms in regions)]
+
+
+def ql_mem_map_image(ql, uc, address, data, prefix):
+    """
+    Map the library image @data at @address from a file shared by every emulator
+    that loads the same bytes, in this process or any other. The image is staged
+    once, page aligned, in a file named after @prefix and a digest of @data, then
+    mapped with ql_mem_map_file: all of them read the same page cache pages and a
+    page the guest writes becomes a private copy. Returns the number of bytes
+    mapped, 0 when the image has to be written the usual way.
+    """
+    data = bytes(data)
+    size = (len(data) + 0xfff) // 0x1000 * 0x1000
+    path = "%s.%s.image" % (prefix, hashlib.sha1(data).hexdigest()[ : 16])
+    try:
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            # staged aside and renamed, so no process maps a half written image
+            tmp = "%s.%d.tmp" % (path, os.getpid())
+            with open(tmp, "wb") as f:
+                f.write(data)
+                f.truncate(size)
+            os.replace(tmp, path)
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return 0
+
+    try:
+        if ql_mem_map_file(ql, uc, address, size, fd, 0) != size:
+            return 0
+    finally:
+        os.close(fd)
+    return size
+
+
 def ql_bin_to_ipv4(ip):
     return "%d.%d.%d.%d" % (
         (ip & 0xff000000) >> 24,
@@ -71,16 +228,36 @@ def ql_bin_to_ipv4(ip):
         (ip & 0xff))
 
 
+def ql_read_terminated(uc, address, unit = 1, cache = None):
+    """
+    Bytes at @address up to the first terminator of @unit zero bytes, aligned to
+    @unit. Memory is read up to the end of a page at a time, so the read never
+    runs into an unmapped page before the terminator. With @cache, a dict kept
+    for one syscall or api call, a string read before is not read again.
+    """
+    if cache != None and (address, unit) in cache:
+        return cache[(address, unit)]
+
+    terminator = b"\x00" * unit
+    data = bytearray()
+    pos = 0
+    while True:
+        data += uc.mem_read(address + len(data), 0x1000 - ((address + len(data)) & 0xfff))
+        i = data.find(terminator, pos)
+        while i >= 0 and i % unit:
+            i = data.find(terminator, i + 1)
+        if i >= 0:
+            break
+        pos = len(data) - unit + 1
+
+    data = bytes(data[ : i])
+    if cache != None:
+        cache[(address, unit)] = data
+    return data
+
+
 def ql_read_string(ql, uc, address):
-    ret = ""
-    c = uc.mem_read(address, 1)[0]
-    read_bytes = 1
-
-    while c != 0x0:
-        ret += chr(c)
-        c = uc.mem_read(address + read_bytes, 1)[0]
-        read_bytes += 1
-    return ret
+    return ql_read_terminated(uc, address).decode("latin-1")
 
 
 def ql_parse_sock_address(sock_addr):
@@ -106,91 +283,122 @@ def ql_hook_block_disasm(uc, address, size, ql):
         ql.nprint(">>> Tracing basic block at 0x%x" %(address))
 
 
-def ql_hook_code_disasm(uc, address, size, ql):
-    tmp = uc.mem_read(address, size)
+# registers shown on every disasm line: syscall number first, then six arguments
+QL_DISASM_REGS = {
+    QL_ARM: ((UC_ARM_REG_R7, "R7"), (UC_ARM_REG_R0, "R0"), (UC_ARM_REG_R1, "R1"), (UC_ARM_REG_R2, "R2"),
+             (UC_ARM_REG_R3, "R3"), (UC_ARM_REG_R4, "R4"), (UC_ARM_REG_R5, "R5")),
+    QL_X86: ((UC_X86_REG_EAX, "EAX"), (UC_X86_REG_EBX, "EBX"), (UC_X86_REG_ECX, "ECX"), (UC_X86_REG_EDX, "EDX"),
+             (UC_X86_REG_ESI, "ESI"), (UC_X86_REG_EDI, "EDI"), (UC_X86_REG_EBP, "EBP")),
+    QL_X8664: ((UC_X86_REG_RAX, "RAX"), (UC_X86_REG_RDI, "RDI"), (UC_X86_REG_RSI, "RSI"), (UC_X86_REG_RDX, "RDX"),
+               (UC_X86_REG_R10, "R10"), (UC_X86_REG_R8, "R8"), (UC_X86_REG_R9, "R9")),
+    QL_ARM64: ((UC_ARM64_REG_X0, "X7"), (UC_ARM64_REG_X0, "X0"), (UC_ARM64_REG_X1, "X1"), (UC_ARM64_REG_X2, "X2"),
+               (UC_ARM64_REG_X3, "X3"), (UC_ARM64_REG_X4, "X4"), (UC_ARM64_REG_X5, "X5")),
+    QL_MIPS32EL: ((UC_MIPS_REG_V0, "V0"), (UC_MIPS_REG_A0, "A0"), (UC_MIPS_REG_A1, "A1"), (UC_MIPS_REG_A2, "A2"),
+                  (UC_MIPS_REG_A3, "A3"), (UC_MIPS_REG_SP, "SP+0x10"), (UC_MIPS_REG_SP, "SP+0x14")),
+}
+
+QL_X86_MACOS_DISASM_REGS = ((UC_X86_REG_EAX, "EAX"),) + \
+    tuple((UC_X86_REG_ESP + 4 * i, "ESP_%i" % i) for i in range(1, 7))
+
+# decoded instruction lines kept per Qiling instance
+QL_DISASM_CACHE_SIZE = 0x1000
+
+
+# capstone is only imported once something is disassembled
+def ql_get_disasm_engine(ql, mode):
+    md = ql.disasm_engines.get(mode)
+
+    if md is None:
+        from capstone import Cs
+        md = Cs(*mode)
+        ql.disasm_engines[mode] = md
+
+    return md
+
+
+def ql_disasm_line(ql, address, code, mode):
+    """
+    Format the ">>> address  bytes  instruction" line for code at address. Lines are
+    kept in a LRU cache keyed by address, bytes and mode, so code rewritten by the
+    guest never hits a stale entry.
+    """
+    key = (address, code, mode)
+    cache = ql.disasm_cache
+    line = cache.get(key)
+
+    if line is None:
+        line = ">>> 0x%x\t %s" % (address, "".join(" %02x" % i for i in code))
+        if len(code) < 4:
+            line += "\t  "
+        line += "\n".join("\t%s \t%s" % (i.mnemonic, i.op_str) for i in ql_get_disasm_engine(ql, mode).disasm(code, address))
+
+        cache[key] = line
+        if len(cache) > QL_DISASM_CACHE_SIZE:
+            cache.popitem(last = False)
+    else:
+        cache.move_to_end(key)
 
-    if (ql.arch == QL_ARM): # QL_ARM
-        reg_cpsr = uc.reg_read(UC_ARM_REG_CPSR)
-        mode = CS_MODE_ARM
-        # ql.nprint("cpsr : " + bin(reg_cpsr))
-        if reg_cpsr & 0b100000 != 0:
-            mode = CS_MODE_THUMB
-        md = Cs(CS_ARCH_ARM, mode)
-        syscall_num = [uc.reg_read(UC_ARM_REG_R7),"R7"]
-        arg_0 = [uc.reg_read(UC_ARM_REG_R0),"R0"]
-        arg_1 = [uc.reg_read(UC_ARM_REG_R1),"R1"]
-        arg_2 = [uc.reg_read(UC_ARM_REG_R2),"R2"]
-        arg_3 = [uc.reg_read(UC_ARM_REG_R3),"R3"]
-        arg_4 = [uc.reg_read(UC_ARM_REG_R4),"R4"]
-        arg_5 = [uc.reg_read(UC_ARM_REG_R5),"R5"]
+    return line
 
-    elif (ql.arch == QL_X86): # QL_X86
-        md = Cs(CS_ARCH_X86, CS_MODE_32)
-        if ql.ostype == QL_MACOS:
-            syscall_num = [uc.reg_read(UC_X86_REG_EAX),"EAX"]
-            arg_0 = [uc.reg_read(UC_X86_REG_ESP + 4 * 1),"ESP_1"]
-            arg_1 = [uc.reg_read(UC_X86_REG_ESP + 4 * 2),"ESP_2"]
-            arg_2 = [uc.reg_read(UC_X86_REG_ESP + 4 * 3),"ESP_3"]
-            arg_3 = [uc.reg_read(UC_X86_REG_ESP + 4 * 4),"ESP_4"]
-            arg_4 = [uc.reg_read(UC_X86_REG_ESP + 4 * 5),"ESP_5"]
-            arg_5 = [uc.reg_read(UC_X86_REG_ESP + 4 * 6),"ESP_6"]
-        else:
-            syscall_num = [uc.reg_read(UC_X86_REG_EAX),"EAX"]
-            arg_0 = [uc.reg_read(UC_X86_REG_EBX),"EBX"]
-            arg_1 = [uc.reg_read(UC_X86_REG_ECX),"ECX"]
-            arg_2 = [uc.reg_read(UC_X86_REG_EDX),"EDX"]
-            arg_3 = [uc.reg_read(UC_X86_REG_ESI),"ESI"]
-            arg_4 = [uc.reg_read(UC_X86_REG_EDI),"EDI"]
-            arg_5 = [uc.reg_read(UC_X86_REG_EBP),"EBP"]
 
-    elif (ql.arch == QL_X8664): # QL_X86_64
-        md = Cs(CS_ARCH_X86, CS_MODE_64)
-        syscall_num = [uc.reg_read(UC_X86_REG_RAX),"RAX"]
-        arg_0 = [uc.reg_read(UC_X86_REG_RDI),"RDI"]
-        arg_1 = [uc.reg_read(UC_X86_REG_RSI),"RSI"]
-        arg_2 = [uc.reg_read(UC_X86_REG_RDX),"RDX"]
-        arg_3 = [uc.reg_read(UC_X86_REG_R10),"R10"]
-        arg_4 = [uc.reg_read(UC_X86_REG_R8),"R8"]
-        arg_5 = [uc.reg_read(UC_X86_REG_R9),"R9"]
+# arch => capstone (arch, mode), filled on first use by ql_get_disasm_mode
+QL_DISASM_MODES = {}
 
-    elif (ql.arch == QL_ARM64): # QL_ARM64
-        md = Cs(CS_ARCH_ARM64, CS_MODE_ARM)
-        syscall_num = [uc.reg_read(UC_ARM64_REG_X0),"X7"]
-        arg_0 = [uc.reg_read(UC_ARM64_REG_X0),"X0"]
-        arg_1 = [uc.reg_read(UC_ARM64_REG_X1),"X1"]
-        arg_2 = [uc.reg_read(UC_ARM64_REG_X2),"X2"]
-        arg_3 = [uc.reg_read(UC_ARM64_REG_X3),"X3"]
-        arg_4 = [uc.reg_read(UC_ARM64_REG_X4),"X4"]
-        arg_5 = [uc.reg_read(UC_ARM64_REG_X5),"X5"]
-
-    elif (ql.arch == QL_MIPS32EL): # QL_MIPS32EL
-        md = Cs(CS_ARCH_MIPS, CS_MODE_MIPS32 + CS_MODE_LITTLE_ENDIAN)
-        syscall_num = [uc.reg_read(UC_MIPS_REG_V0),"V0"]
-        arg_0 = [uc.reg_read(UC_MIPS_REG_A0),"A0"]
-        arg_1 = [uc.reg_read(UC_MIPS_REG_A1),"A1"]
-        arg_2 = [uc.reg_read(UC_MIPS_REG_A2),"A2"]
-        arg_3 = [uc.reg_read(UC_MIPS_REG_A3),"A3"]
-        arg_4 = uc.reg_read(UC_MIPS_REG_SP)
-        arg_4 = [arg_4 + 0x10, "SP+0x10"]
-        arg_5 = uc.reg_read(UC_MIPS_REG_SP)
-        arg_5 = [arg_5 + 0x14, "SP+0x14"]
 
-    else:
+# capstone (arch, mode) of the code currently executed
+def ql_get_disasm_mode(ql, uc):
+    if not QL_DISASM_MODES:
+        import capstone
+        QL_DISASM_MODES.update({
+            QL_ARM: (capstone.CS_ARCH_ARM, capstone.CS_MODE_ARM),
+            QL_ARM_THUMB: (capstone.CS_ARCH_ARM, capstone.CS_MODE_THUMB),
+            QL_X86: (capstone.CS_ARCH_X86, capstone.CS_MODE_32),
+            QL_X8664: (capstone.CS_ARCH_X86, capstone.CS_MODE_64),
+            QL_ARM64: (capstone.CS_ARCH_ARM64, capstone.CS_MODE_ARM),
+            QL_MIPS32EL: (capstone.CS_ARCH_MIPS, capstone.CS_MODE_MIPS32 + capstone.CS_MODE_LITTLE_ENDIAN),
+        })
+
+    arch = ql.arch
+    if arch == QL_ARM:
+        if uc.reg_read(UC_ARM_REG_CPSR) & 0b100000 != 0:
+            arch = QL_ARM_THUMB
+
+    mode = QL_DISASM_MODES.get(arch)
+    if mode is None:
         raise QlErrorArch("Unknown arch defined in utils.py (debug output mode)")
 
-    ql.nprint("|--->>> %s= 0x%x %s= 0x%x %s= 0x%x %s= 0x%x %s= 0x%x %s= 0x%x %s= 0x%x" % \
-            (syscall_num[1], syscall_num[0], arg_0[1], arg_0[0], arg_1[1], arg_1[0], arg_2[1], arg_2[0], arg_3[1], arg_3[0], arg_4[1], arg_4[0], arg_5[1], arg_5[0]))
+    return mode
+
+
+# instructions in the block of @size bytes at @address, memoized in the dict
+# @cache by address, size and disasm mode
+def ql_block_insns(ql, uc, address, size, cache):
+    mode = ql_get_disasm_mode(ql, uc)
+    key = (address, size, mode)
+    insns = cache.get(key)
+    if insns is None:
+        code = bytes(uc.mem_read(address, size))
+        insns = sum(1 for _ in ql_get_disasm_engine(ql, mode).disasm_lite(code, address))
+        cache[key] = insns
+    return insns
+
+
+def ql_hook_code_disasm(uc, address, size, ql):
+    tmp = bytes(uc.mem_read(address, size))
+    mode = ql_get_disasm_mode(ql, uc)
+
+    if ql.arch == QL_X86 and ql.ostype == QL_MACOS:
+        regs = QL_X86_MACOS_DISASM_REGS
+    else:
+        regs = QL_DISASM_REGS[ql.arch]
 
-    insn = md.disasm(tmp, address)
-    opsize = int(size)
-    ql.nprint(">>> 0x%x\t " %(address), end = "")
+    values = [uc.reg_read(reg) for reg, _ in regs]
+    if ql.arch == QL_MIPS32EL:
+        values[5] += 0x10
+        values[6] += 0x14
 
-    for i in tmp:
-        ql.nprint(" %02x" %i, end = "")
-    if opsize < 4:
-        ql.nprint("\t  ", end ="")
-    for i in insn:
-        ql.nprint('\t%s \t%s' %(i.mnemonic, i.op_str))
+    ql.nprint("|--->>> " + " ".join("%s= 0x%x" % (name, value) for (_, name), value in zip(regs, values)) + \
+            "\n" + ql_disasm_line(ql, address, tmp, mode))
 
 def ql_setup(ql):
     if ql.output in (QL_OUT_DISASM, QL_OUT_DUMP):
@@ -200,6 +408,9 @@ def ql_setup(ql):
 
 
 def ql_asm2bytes(ql, archtype, runcode, arm_thumb):
+    # keystone is only needed here, do not load it with qiling
+    from keystone import Ks, KsError, KS_ARCH_X86, KS_ARCH_MIPS, KS_ARCH_ARM, KS_ARCH_ARM64, \
+            KS_MODE_32, KS_MODE_64, KS_MODE_MIPS32, KS_MODE_LITTLE_ENDIAN, KS_MODE_ARM, KS_MODE_THUMB
 
     def ks_convert(arch):
         adapter = {
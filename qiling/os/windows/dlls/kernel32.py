@@ -175,6 +175,43 @@ def hook_HeapAlloc(ql, address, params):
     return ret
 
 
+# BOOL HeapFree(
+#   HANDLE                 hHeap,
+#   DWORD                  dwFlags,
+#   _Frees_ptr_opt_ LPVOID lpMem
+# );
+@winapi(x86=X86_STDCALL, x8664=X8664_FASTCALL, params={
+    "hHeap": HANDLE,
+    "dwFlags": DWORD,
+    "lpMem": POINTER
+})
+def hook_HeapFree(ql, address, params):
+    # freeing NULL is allowed
+    if params["lpMem"] == 0 or ql.heap.mem_free(params["lpMem"]):
+        ret = 1
+    else:
+        ret = 0
+    return ret
+
+
+# SIZE_T HeapSize(
+#   HANDLE  hHeap,
+#   DWORD   dwFlags,
+#   LPCVOID lpMem
+# );
+@winapi(x86=X86_STDCALL, x8664=X8664_FASTCALL, params={
+    "hHeap": HANDLE,
+    "dwFlags": DWORD,
+    "lpMem": POINTER
+})
+def hook_HeapSize(ql, address, params):
+    size = ql.heap.mem_size(params["lpMem"])
+    if size == 0:
+        # (SIZE_T)-1
+        return (1 << (ql.pointersize * 8)) - 1
+    return size
+
+
 # LPVOID VirtualAlloc(
 #   LPVOID lpAddress,
 #   SIZE_T dwSize,
@@ -253,7 +290,7 @@ def hook_SetHandleCount(ql, address, params):
 def hook_GetCommandLineA(ql, address, params):
     cmdline = ql.PE.cmdline + b"\x00"
     addr = ql.heap.mem_alloc(len(cmdline))
-    ql.uc.mem_write(addr, cmdline)
+    ql.mem_write(addr, cmdline)
     return addr
 
 
@@ -263,7 +300,7 @@ def hook_GetCommandLineA(ql, address, params):
 def hook_GetEnvironmentStrings(ql, address, params):
     cmdline = b"\x00"
     addr = ql.heap.mem_alloc(len(cmdline))
-    ql.uc.mem_write(addr, cmdline)
+    ql.mem_write(addr, cmdline)
     return addr
 
 
@@ -331,7 +368,7 @@ def hook_GetStringTypeExA(ql, address, params):
 def hook_GetEnvironmentStringsW(ql, address, params):
     cmdline = b"\x00\x00"
     addr = ql.heap.mem_alloc(len(cmdline))
-    ql.uc.mem_write(addr, cmdline)
+    ql.mem_write(addr, cmdline)
     return addr
 
 
@@ -367,7 +404,7 @@ def hook_WideCharToMultiByte(ql, address, params):
         ret = align(ret // 2, 2)
     else:
         s = bytes(s_lpWideCharStr, 'ascii').decode('utf-16le') + "\x00"
-        ql.uc.mem_write(lpMultiByteStr, bytes(s, 'ascii'))
+        ql.mem_write(lpMultiByteStr, bytes(s, 'ascii'))
         ret = len(s)
 
     return ret
@@ -449,7 +486,7 @@ def hook_GetModuleFileNameA(ql, address, params):
             ret = nSize
         else:
             ret = filename_len
-        ql.uc.mem_write(lpFilename, filename + b"\x00")
+        ql.mem_write(lpFilename, filename + b"\x00")
     else:
         raise QlErrorNotImplemented("not implemented")
     return ret
@@ -483,13 +520,13 @@ def hook_ReadFile(ql, address, params):
         if slen > nNumberOfBytesToRead:
             s = s[:nNumberOfBytesToRead]
             read_len = nNumberOfBytesToRead
-        ql.uc.mem_write(lpBuffer, s)
-        ql.uc.mem_write(lpNumberOfBytesRead, ql.pack(read_len))
+        ql.mem_write(lpBuffer, s)
+        ql.mem_write(lpNumberOfBytesRead, ql.pack(read_len))
     else:
         f = ql.handle_manager.get(hFile).file
         data = f.read(nNumberOfBytesToRead)
-        ql.uc.mem_write(lpBuffer, data)
-        ql.uc.mem_write(lpNumberOfBytesRead, ql.pack32(lpNumberOfBytesRead))
+        ql.mem_write(lpBuffer, data)
+        ql.mem_write(lpNumberOfBytesRead, ql.pack32(lpNumberOfBytesRead))
     return ret
 
 
@@ -517,12 +554,12 @@ def hook_WriteFile(ql, address, params):
     if hFile == STD_OUTPUT_HANDLE:
         s = ql.uc.mem_read(lpBuffer, nNumberOfBytesToWrite)
         ql.stdout.write(s)
-        ql.uc.mem_write(lpNumberOfBytesWritten, ql.pack(nNumberOfBytesToWrite))
+        ql.mem_write(lpNumberOfBytesWritten, ql.pack(nNumberOfBytesToWrite))
     else:
         f = ql.handle_manager.get(hFile).file
         buffer = ql.uc.mem_read(lpBuffer, nNumberOfBytesToWrite)
         f.write(bytes(buffer))
-        ql.uc.mem_write(lpNumberOfBytesWritten, ql.pack32(nNumberOfBytesToWrite))
+        ql.mem_write(lpNumberOfBytesWritten, ql.pack32(nNumberOfBytesToWrite))
     return ret
 
 
@@ -711,6 +748,8 @@ def hook_WaitForSingleObject(ql, address, params):
     dwMilliseconds = params["dwMilliseconds"]
     target_thread = ql.handle_manager.get(hHandle).thread
     ql.thread_manager.current_thread.waitfor(target_thread)
+    if ql.thread_manager.current_thread.has_waitfor():
+        ql.thread_manager.need_schedule()
     return ret
 
 
@@ -733,12 +772,13 @@ def hook_WaitForMultipleObjects(ql, address, params):
     bWaitAll = params["bWaitAll"]
     dwMilliseconds = params["dwMilliseconds"]
 
-    for i in range(nCount):
-        handle_value = ql.unpack(ql.mem_read(lpHandles + i * ql.pointersize, ql.pointersize))
+    for handle_value in ql.mem_read_ptrs(lpHandles, nCount):
         if handle_value != 0:
             thread = ql.handle_manager.get(handle_value).thread
             ql.thread_manager.current_thread.waitfor(thread)
 
+    if ql.thread_manager.current_thread.has_waitfor():
+        ql.thread_manager.need_schedule()
     return ret
 
 
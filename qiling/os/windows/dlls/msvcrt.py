@@ -87,15 +87,17 @@ def hook_atexit(ql, address, params):
 @winapi(x86=X86_CDECL, x8664=X8664_FASTCALL, params={})
 def hook___p__environ(ql, address, params):
     ret = ql.heap.mem_alloc(ql.pointersize * len(ql.env))
-    count = 0
+    writes = []
+    pointers = []
     for key in ql.env:
         pointer = ql.heap.mem_alloc(ql.pointersize)
         env = key + "=" + ql.env[key]
         env_addr = ql.heap.mem_alloc(len(env)+1)
-        ql.mem_write(env_addr, bytes(env, 'ascii') + b'\x00')
-        ql.mem_write(pointer, ql.pack(env_addr))
-        ql.mem_write(ret + count * ql.pointersize, ql.pack(pointer))
-        count += 1
+        writes.append((env_addr, bytes(env, 'ascii') + b'\x00'))
+        writes.append((pointer, ql.pack(env_addr)))
+        pointers.append(pointer)
+    ql.mem_write_many(writes)
+    ql.mem_write_ptrs(ret, pointers)
     return ret
 
 
@@ -156,14 +158,16 @@ def hook__initterm_e(ql, address, params):
 @winapi(x86=X86_CDECL, x8664=X8664_FASTCALL, params={})
 def hook___p___argv(ql, address, params):
     ret = ql.heap.mem_alloc(ql.pointersize * len(ql.argv))
-    count = 0
+    writes = []
+    pointers = []
     for each in ql.argv:
         arg_pointer = ql.heap.mem_alloc(ql.pointersize)
         arg = ql.heap.mem_alloc(len(each)+1)
-        ql.mem_write(arg, bytes(each, 'ascii') + b'\x00')
-        ql.mem_write(arg_pointer, ql.pack(arg))
-        ql.mem_write(ret + count * ql.pointersize, ql.pack(arg_pointer))
-        count += 1
+        writes.append((arg, bytes(each, 'ascii') + b'\x00'))
+        writes.append((arg_pointer, ql.pack(arg)))
+        pointers.append(arg_pointer)
+    ql.mem_write_many(writes)
+    ql.mem_write_ptrs(ret, pointers)
     return ret
 
 
@@ -193,13 +197,7 @@ def printf(ql, address, fmt, params_addr, name):
     count = fmt.count("%")
     params = []
     if count > 0:
-        for i in range(count):
-            params.append(ql.unpack(
-                ql.uc.mem_read(
-                    params_addr + i * ql.pointersize,
-                    ql.pointersize
-                )
-            ))
+        params = list(ql.mem_read_ptrs(params_addr, count))
 
         formats = fmt.split("%")[1:]
         index = 0
@@ -342,6 +340,16 @@ def hook_malloc(ql, address, params):
     return addr
 
 
+# void free(
+#    void *memblock
+# );
+@winapi(x86=X86_CDECL, x8664=X8664_FASTCALL, params={
+    "memblock": POINTER
+})
+def hook_free(ql, address, params):
+    ql.heap.mem_free(params['memblock'])
+
+
 # _onexit_t _onexit(
 #    _onexit_t function
 # );
@@ -351,7 +359,7 @@ def hook_malloc(ql, address, params):
 def hook__onexit(ql, address, params):
     function = params['function']
     addr = ql.heap.mem_alloc(ql.pointersize)
-    ql.uc.mem_write(addr, ql.pack(function))
+    ql.mem_write(addr, ql.pack(function))
     return addr
 
 
@@ -369,7 +377,7 @@ def hook_memset(ql, address, params):
     dest = params["dest"]
     c = params["c"]
     count = params["count"]
-    ql.uc.mem_write(dest, bytes(c) * count)
+    ql.mem_write(dest, bytes(c) * count)
     return dest
 
 
@@ -56,7 +56,7 @@ def hook_GetDlgItemTextA(ql, address, params):
     ql.stdout.write(b"Input DlgItemText :\n")
     string = ql.stdin.readline().strip()[:cchMax]
     ret = len(string)
-    ql.uc.mem_write(lpString, string)
+    ql.mem_write(lpString, string)
 
     return ret
 
@@ -12,9 +12,12 @@
 
 # function calling convention
 
+import time
+
 from unicorn.x86_const import *
 from qiling.os.windows.utils import *
 from qiling.exception import *
+from qiling.log import *
 
 
 X86_STDCALL = 1
@@ -36,6 +39,8 @@ WSTRING = 5
 
 def set_params(ql, in_params, out_params):
     index = 0
+    # strings read for this call, by address
+    strings = {}
     for each in in_params:
         if in_params[each] == DWORD or in_params[each] == POINTER:
             out_params[each] = get_params_by_index(ql, index)
@@ -52,18 +57,20 @@ def set_params(ql, in_params, out_params):
             if ptr == 0:
                 out_params[each] = 0
             else:
-                out_params[each] = read_cstring(ql, ptr)
+                out_params[each] = read_cstring(ql, ptr, strings)
         elif in_params[each] == WSTRING:
             ptr = get_params_by_index(ql, index)
             if ptr == 0:
                 out_params[each] = 0
             else:
-                out_params[each] = read_wstring(ql, ptr)
+                out_params[each] = read_wstring(ql, ptr, strings)
         index += 1
     return index
 
 
 def print_function(ql, address, function_name, params, ret):
+    if not ql.log.enabled(QL_LOG_INFO):
+        return
     function_name = function_name.replace('hook_', '')
     if function_name == "__stdio_common_vfprintf" or function_name == "printf":
         return
@@ -81,6 +88,17 @@ def print_function(ql, address, function_name, params, ret):
     ql.nprint(log)
 
 
+# ret => pop eip. unicorn ignores emu_stop once a hook writes pc, so when the api asked
+# the thread manager for a switch, the manager sets pc after emu_start returns
+def set_return_address(ql, ret_addr):
+    if ql.thread_manager.switch:
+        ql.thread_manager.return_address = ret_addr
+    elif ql.arch == QL_X86:
+        ql.uc.reg_write(UC_X86_REG_EIP, ret_addr)
+    elif ql.arch == QL_X8664:
+        ql.uc.reg_write(UC_X86_REG_RIP, ret_addr)
+
+
 def x86_stdcall(ql, param_num, params, func, args, kwargs):
     # get ret addr
     ret_addr = ql.stack_read(0)
@@ -99,7 +117,7 @@ def x86_stdcall(ql, param_num, params, func, args, kwargs):
     ql.uc.reg_write(UC_X86_REG_ESP, esp + (param_num + 1) * 4)
     # ret => pop eip
     if ql.RUN:
-        ql.uc.reg_write(UC_X86_REG_EIP, ret_addr)
+        set_return_address(ql, ret_addr)
     return result
 
 
@@ -117,7 +135,7 @@ def x86_cdecl(ql, param_num, params, func, args, kwargs):
     # ret => pop eip
     if ql.RUN:
         ret_addr = ql.stack_pop()
-        ql.uc.reg_write(UC_X86_REG_EIP, ret_addr)
+        set_return_address(ql, ret_addr)
     return result
 
 
@@ -142,7 +160,7 @@ def x8664_fastcall(ql, param_num, params, func, args, kwargs):
         ql.uc.reg_write(UC_X86_REG_RSP, rsp + 8)
     # ret => pop rip
     if ql.RUN:
-        ql.uc.reg_write(UC_X86_REG_RIP, ret_addr)
+        set_return_address(ql, ret_addr)
     return result
 
 
@@ -152,8 +170,7 @@ def winapi(x86, x8664, param_num=None, params=None):
     @param_num: the number of function params
     """
     def decorator(func):
-        def wrapper(*args, **kwargs):
-            ql = args[0]
+        def call(ql, args, kwargs):
             if ql.arch == QL_X86:
                 if x86 == X86_STDCALL:
                     return x86_stdcall(ql, param_num, params, func, args, kwargs)
@@ -164,5 +181,19 @@ def winapi(x86, x8664, param_num=None, params=None):
                     return x8664_fastcall(ql, param_num, params, func, args, kwargs)
             else:
                 raise QlErrorArch("unknown ql.arch")
+
+        # hook_GetProcAddress => GetProcAddress
+        name = func.__name__.replace("hook_", "")
+
+        def wrapper(*args, **kwargs):
+            ql = args[0]
+            if ql.stats == None or not ql.stats.running:
+                return call(ql, args, kwargs)
+            # count the call and the time spent in the handler for ql.stats
+            begin = time.perf_counter()
+            try:
+                return call(ql, args, kwargs)
+            finally:
+                ql.stats.winapi_call(name, time.perf_counter() - begin)
         return wrapper
     return decorator
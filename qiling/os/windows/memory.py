@@ -10,6 +10,8 @@
 # CHEN huitao (null) <null@qiling.io>
 # YU tong (sp1ke) <spikeinhouse@gmail.com>
 
+import bisect
+
 from qiling.arch.filetype import *
 from qiling.exception import *
 
@@ -17,6 +19,13 @@ def align(size, unit):
     return (size // unit + (1 if size % unit else 0)) * unit
 
 
+# chunks up to this size have a free list per size, larger ones one per power of two
+QL_HEAP_SMALL_MAX = 0x200
+
+# a free chunk is only split when at least this much is left over
+QL_HEAP_MIN_SPLIT = 0x20
+
+
 # A Simple Heap Implementation
 class Chunk():
     def __init__(self, address, size):
@@ -24,15 +33,16 @@ class Chunk():
         self.address = address
         self.size = size
 
-    @staticmethod
-    def compare(chunk):
-        return chunk.size
-
 
 class Heap:
+    """
+    Segregated free list allocator. Free chunks sit in a bin per size class, a
+    chunk is found by address in a dict on free, is merged there with free
+    neighbours and given back to the top of the heap when it ends there. A bigger
+    free chunk is split when it is reused for a smaller allocation.
+    """
     def __init__(self, ql, start_address, end_address):
         self.ql = ql
-        self.chunks = []
         self.start_address = start_address
         self.end_address = end_address
         # unicorn needs 0x1000
@@ -41,46 +51,165 @@ class Heap:
         self.current_alloc = 0
         # curent use memory size
         self.current_use = 0
+        # address => chunk, and chunk end => chunk, for every chunk below the top
+        self.chunks = {}
+        self.chunk_ends = {}
+        # size class => {address: free chunk}, and the classes with free chunks, sorted
+        self.bins = {}
+        self.bin_classes = []
+        self.stats = {"allocs": 0, "frees": 0, "failed_allocs": 0, "bad_frees": 0,
+                      "splits": 0, "merges": 0, "in_use": 0, "peak_in_use": 0}
 
-    def mem_alloc(self, size):
+    def __unit(self):
         if self.ql.arch == QL_X86:
-            size = align(size, 4)
+            return 4
         elif self.ql.arch == QL_X8664:
-            size = align(size, 8)
-        else:
-            raise QlErrorArch("unknown ql.arch")
-
-        # Find the heap chunks that best matches size 
-        self.chunks.sort(key=Chunk.compare)
-        for chunk in self.chunks:
-            if chunk.inuse is False and chunk.size > size:
-                chunk.inuse = True
-                return chunk.address
-
-        chunk = None
-        # If we need mem_map new memory
-        if self.current_use + size > self.current_alloc:
-            real_size = align(size, self.page_size)
-            # If the heap is not enough
-            if self.start_address + self.current_use + real_size > self.end_address:
-                return 0
-            self.ql.uc.mem_map(self.start_address + self.current_alloc, real_size)
-            chunk = Chunk(self.start_address + self.current_use, size)
-            self.current_alloc += real_size
-            self.current_use += size
-            self.chunks.append(chunk)
+            return 8
+        raise QlErrorArch("unknown ql.arch")
+
+    def __size_class(self, size):
+        if size <= QL_HEAP_SMALL_MAX:
+            return size
+        return QL_HEAP_SMALL_MAX + size.bit_length()
+
+    def __bin_add(self, chunk):
+        size_class = self.__size_class(chunk.size)
+        free = self.bins.get(size_class)
+        if not free:
+            free = self.bins[size_class] = {}
+            bisect.insort(self.bin_classes, size_class)
+        free[chunk.address] = chunk
+
+    def __bin_del(self, chunk):
+        size_class = self.__size_class(chunk.size)
+        free = self.bins[size_class]
+        del free[chunk.address]
+        if not free:
+            del self.bins[size_class]
+            del self.bin_classes[bisect.bisect_left(self.bin_classes, size_class)]
+
+    def __add(self, chunk):
+        self.chunks[chunk.address] = chunk
+        self.chunk_ends[chunk.address + chunk.size] = chunk
+
+    def __del(self, chunk):
+        del self.chunks[chunk.address]
+        del self.chunk_ends[chunk.address + chunk.size]
+
+    # smallest free chunk class that fits size: the exact one first, then larger
+    def __find_free(self, size):
+        size_class = self.__size_class(size)
+        free = self.bins.get(size_class)
+        if free:
+            for chunk in free.values():
+                if chunk.size >= size:
+                    return chunk
+
+        i = bisect.bisect_right(self.bin_classes, size_class)
+        if i < len(self.bin_classes):
+            return next(iter(self.bins[self.bin_classes[i]].values()))
+        return None
+
+    def mem_alloc(self, size):
+        size = align(max(size, 1), self.__unit())
+
+        chunk = self.__find_free(size)
+        if chunk != None:
+            self.__bin_del(chunk)
+            if chunk.size - size >= QL_HEAP_MIN_SPLIT:
+                self.__del(chunk)
+                rest = Chunk(chunk.address + size, chunk.size - size)
+                rest.inuse = False
+                chunk.size = size
+                self.__add(chunk)
+                self.__add(rest)
+                self.__bin_add(rest)
+                self.stats["splits"] += 1
+            chunk.inuse = True
         else:
+            # If we need mem_map new memory
+            if self.current_use + size > self.current_alloc:
+                real_size = align(self.current_use + size - self.current_alloc, self.page_size)
+                # If the heap is not enough
+                if self.start_address + self.current_alloc + real_size > self.end_address:
+                    self.stats["failed_allocs"] += 1
+                    return 0
+                self.ql.uc.mem_map(self.start_address + self.current_alloc, real_size)
+                self.current_alloc += real_size
             chunk = Chunk(self.start_address + self.current_use, size)
             self.current_use += size
-            self.chunks.append(chunk)
+            self.__add(chunk)
 
-        chunk.inuse = True
+        self.stats["allocs"] += 1
+        self.stats["in_use"] += chunk.size
+        self.stats["peak_in_use"] = max(self.stats["peak_in_use"], self.stats["in_use"])
         # print("heap.mem_alloc addresss: " + hex(chunk.address))
         return chunk.address
 
     def mem_free(self, addr):
-        for chunk in self.chunks:
-            if addr == chunk.address and chunk.inuse:
-                chunk.inuse = False
-                return True
-        return False
+        chunk = self.chunks.get(addr)
+        if chunk == None or not chunk.inuse:
+            self.stats["bad_frees"] += 1
+            return False
+
+        chunk.inuse = False
+        self.stats["frees"] += 1
+        self.stats["in_use"] -= chunk.size
+
+        prev = self.chunk_ends.get(chunk.address)
+        if prev != None and not prev.inuse:
+            self.__bin_del(prev)
+            self.__del(prev)
+            self.__del(chunk)
+            prev.size += chunk.size
+            chunk = prev
+            self.__add(chunk)
+            self.stats["merges"] += 1
+
+        following = self.chunks.get(chunk.address + chunk.size)
+        if following != None and not following.inuse:
+            self.__bin_del(following)
+            self.__del(following)
+            self.__del(chunk)
+            chunk.size += following.size
+            self.__add(chunk)
+            self.stats["merges"] += 1
+
+        # the top of the heap just moves down, its pages stay mapped
+        if chunk.address + chunk.size == self.start_address + self.current_use:
+            self.__del(chunk)
+            self.current_use = chunk.address - self.start_address
+        else:
+            self.__bin_add(chunk)
+        return True
+
+    # size of the chunk allocated at addr, 0 when there is none
+    def mem_size(self, addr):
+        chunk = self.chunks.get(addr)
+        if chunk == None or not chunk.inuse:
+            return 0
+        return chunk.size
+
+    def save(self):
+        saved_state = {}
+        saved_state["chunks"] = [(chunk.address, chunk.size, chunk.inuse) for chunk in self.chunks.values()]
+        saved_state["current_alloc"] = self.current_alloc
+        saved_state["current_use"] = self.current_use
+        return saved_state
+
+    def restore(self, saved_state):
+        self.chunks = {}
+        self.chunk_ends = {}
+        self.bins = {}
+        self.bin_classes = []
+        self.stats["in_use"] = 0
+        for address, size, inuse in saved_state["chunks"]:
+            chunk = Chunk(address, size)
+            chunk.inuse = inuse
+            self.__add(chunk)
+            if inuse:
+                self.stats["in_use"] += size
+            else:
+                self.__bin_add(chunk)
+        self.current_alloc = saved_state["current_alloc"]
+        self.current_use = saved_state["current_use"]
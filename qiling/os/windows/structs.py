@@ -54,25 +54,25 @@ class TEB:
         self.HardErrorMode = HardErrorMode
 
     def bytes(self):
-        s = b''
-        s += self.ql.pack(self.ExceptionList)          # 0x00
-        s += self.ql.pack(self.StackBase)              # 0x04
-        s += self.ql.pack(self.StackLimit)             # 0x08
-        s += self.ql.pack(self.SubSystemTib)           # 0x0c
-        s += self.ql.pack(self.FiberData)              # 0x10
-        s += self.ql.pack(self.ArbitraryUserPointer)   # 0x14
-        s += self.ql.pack(self.Self)                   # 0x18
-        s += self.ql.pack(self.EnvironmentPointer)     # 0x1c
-        s += self.ql.pack(self.ClientIdUniqueProcess)  # 0x20
-        s += self.ql.pack(self.ClientIdUniqueThread)   # 0x24
-        s += self.ql.pack(self.RpcHandle)              # 0x28
-        s += self.ql.pack(self.Tls_Storage)            # 0x2c
-        s += self.ql.pack(self.PEB_Address)            # 0x30
-        s += self.ql.pack(self.LastErrorValue)         # 0x34
-        s += self.ql.pack(self.LastStatusValue)        # 0x38
-        s += self.ql.pack(self.Count_Owned_Locks)      # 0x3c
-        s += self.ql.pack(self.HardErrorMode)          # 0x40
-        return s
+        return self.ql.pack_ptrs([
+            self.ExceptionList,           # 0x00
+            self.StackBase,               # 0x04
+            self.StackLimit,              # 0x08
+            self.SubSystemTib,            # 0x0c
+            self.FiberData,               # 0x10
+            self.ArbitraryUserPointer,    # 0x14
+            self.Self,                    # 0x18
+            self.EnvironmentPointer,      # 0x1c
+            self.ClientIdUniqueProcess,   # 0x20
+            self.ClientIdUniqueThread,    # 0x24
+            self.RpcHandle,               # 0x28
+            self.Tls_Storage,             # 0x2c
+            self.PEB_Address,             # 0x30
+            self.LastErrorValue,          # 0x34
+            self.LastStatusValue,         # 0x38
+            self.Count_Owned_Locks,       # 0x3c
+            self.HardErrorMode,           # 0x40
+        ])
 
 
 class PEB:
@@ -101,18 +101,18 @@ class PEB:
         self.IFEOKey = IFEOKey
 
     def bytes(self):
-        s = b''
-        s += self.ql.pack(self.flag)                # 0x0 / 0x0
-        s += self.ql.pack(self.Mutant)              # 0x4 / 0x8
-        s += self.ql.pack(self.ImageBaseAddress)    # 0x8 / 0x10
-        s += self.ql.pack(self.LdrAddress)          # 0xc / 0x18
-        s += self.ql.pack(self.ProcessParameters)
-        s += self.ql.pack(self.SubSystemData)
-        s += self.ql.pack(self.ProcessHeap)
-        s += self.ql.pack(self.FastPebLock)
-        s += self.ql.pack(self.AtlThunkSListPtr)
-        s += self.ql.pack(self.IFEOKey)
-        return s
+        return self.ql.pack_ptrs([
+            self.flag,                # 0x0 / 0x0
+            self.Mutant,              # 0x4 / 0x8
+            self.ImageBaseAddress,    # 0x8 / 0x10
+            self.LdrAddress,          # 0xc / 0x18
+            self.ProcessParameters,
+            self.SubSystemData,
+            self.ProcessHeap,
+            self.FastPebLock,
+            self.AtlThunkSListPtr,
+            self.IFEOKey,
+        ])
 
 
 class LDR_DATA:
@@ -139,19 +139,20 @@ class LDR_DATA:
         self.selfShutdownThreadId = ShutdownThreadId
 
     def bytes(self):
-        s = b''
-        s += self.ql.pack32(self.Length)                                   # 0x0
+        s = self.ql.pack32(self.Length)                                    # 0x0
         s += self.ql.pack32(self.Initialized)                              # 0x4
-        s += self.ql.pack(self.SsHandle)                                   # 0x8
-        s += self.ql.pack(self.InLoadOrderModuleList['Flink'])             # 0x0c
-        s += self.ql.pack(self.InLoadOrderModuleList['Blink'])
-        s += self.ql.pack(self.InMemoryOrderModuleList['Flink'])           # 0x14
-        s += self.ql.pack(self.InMemoryOrderModuleList['Blink'])
-        s += self.ql.pack(self.InInitializationOrderModuleList['Flink'])   # 0x1C
-        s += self.ql.pack(self.InInitializationOrderModuleList['Blink'])
-        s += self.ql.pack(self.EntryInProgress)
-        s += self.ql.pack(self.ShutdownInProgress)
-        s += self.ql.pack(self.selfShutdownThreadId)
+        s += self.ql.pack_ptrs([
+            self.SsHandle,                                                 # 0x8
+            self.InLoadOrderModuleList['Flink'],                           # 0x0c
+            self.InLoadOrderModuleList['Blink'],
+            self.InMemoryOrderModuleList['Flink'],                         # 0x14
+            self.InMemoryOrderModuleList['Blink'],
+            self.InInitializationOrderModuleList['Flink'],                 # 0x1C
+            self.InInitializationOrderModuleList['Blink'],
+            self.EntryInProgress,
+            self.ShutdownInProgress,
+            self.selfShutdownThreadId,
+        ])
         return s
 
 
@@ -195,14 +196,17 @@ class LDR_DATA_TABLE_ENTRY:
         self.FullDllName['Length'] = len(FullDllName)
         self.FullDllName['MaximumLength'] = len(FullDllName) + 2
         self.FullDllName['BufferPtr'] = ql.heap.mem_alloc(self.FullDllName['MaximumLength'])
-        ql.uc.mem_write(self.FullDllName['BufferPtr'], FullDllName + b"\x00\x00")
 
         BaseDllName = BaseDllName.encode("utf-16le")
         self.BaseDllName = {}
         self.BaseDllName['Length'] = len(BaseDllName)
         self.BaseDllName['MaximumLength'] = len(BaseDllName) + 2
         self.BaseDllName['BufferPtr'] = ql.heap.mem_alloc(self.BaseDllName['MaximumLength'])
-        ql.uc.mem_write(self.BaseDllName['BufferPtr'], BaseDllName + b"\x00\x00")
+
+        ql.mem_write_many([
+            (self.FullDllName['BufferPtr'], FullDllName + b"\x00\x00"),
+            (self.BaseDllName['BufferPtr'], BaseDllName + b"\x00\x00"),
+        ])
 
         self.Flags = Flags
         self.LoadCount = LoadCount
@@ -228,41 +232,42 @@ class LDR_DATA_TABLE_ENTRY:
         return "[{}:{}]".format(self.__class__.__name__, self.attrs())
 
     def bytes(self):
-        s = b''
-        s += self.ql.pack(self.InLoadOrderLinks['Flink'])             # 0x0
-        s += self.ql.pack(self.InLoadOrderLinks['Blink'])
-        s += self.ql.pack(self.InMemoryOrderLinks['Flink'])           # 0x8
-        s += self.ql.pack(self.InMemoryOrderLinks['Blink'])
-        s += self.ql.pack(self.InInitializationOrderLinks['Flink'])   # 0x10
-        s += self.ql.pack(self.InInitializationOrderLinks['Blink'])
-        s += self.ql.pack(self.DllBase)                               # 0x18
-        s += self.ql.pack(self.EntryPoint)                            # 0x1c
-        s += self.ql.pack(self.SizeOfImage)                           # 0x20
-        s += self.ql.pack16(self.FullDllName['Length'])               # 0x24
-        s += self.ql.pack16(self.FullDllName['MaximumLength'])        # 0x26
-        if self.ql.arch == QL_X8664:
-            s += self.ql.pack32(0)
-        s += self.ql.pack(self.FullDllName['BufferPtr'])              # 0x28
-        s += self.ql.pack16(self.BaseDllName['Length'])
-        s += self.ql.pack16(self.BaseDllName['MaximumLength']) 
+        s = self.ql.pack_ptrs([
+            self.InLoadOrderLinks['Flink'],             # 0x0
+            self.InLoadOrderLinks['Blink'],
+            self.InMemoryOrderLinks['Flink'],           # 0x8
+            self.InMemoryOrderLinks['Blink'],
+            self.InInitializationOrderLinks['Flink'],   # 0x10
+            self.InInitializationOrderLinks['Blink'],
+            self.DllBase,                               # 0x18
+            self.EntryPoint,                            # 0x1c
+            self.SizeOfImage,                           # 0x20
+        ])
+        s += self.unicode_string(self.FullDllName)      # 0x24
+        s += self.unicode_string(self.BaseDllName)
+        s += self.ql.pack_ptrs([
+            self.Flags,
+            self.LoadCount,
+            self.TlsIndex,
+            self.HashLinks,
+            self.SectionPointer,
+            self.CheckSum,
+            self.TimeDateStamp,
+            self.LoadedImports,
+            self.EntryPointActivationContext,
+            self.PatchInformation,
+            self.ForwarderLinks,
+            self.ServiceTagLinks,
+            self.StaticLinks,
+            self.ContextInformation,
+            self.OriginalBase,
+            self.LoadTime,
+        ])
+        return s
+
+    # UNICODE_STRING: Length, MaximumLength, padded on x64, then Buffer
+    def unicode_string(self, us):
+        s = self.ql.pack16(us['Length']) + self.ql.pack16(us['MaximumLength'])
         if self.ql.arch == QL_X8664:
             s += self.ql.pack32(0)
-        s += self.ql.pack(self.BaseDllName['BufferPtr'])
-        s += self.ql.pack(self.Flags)
-        s += self.ql.pack(self.LoadCount)
-        s += self.ql.pack(self.TlsIndex)
-        s += self.ql.pack(self.HashLinks)
-        s += self.ql.pack(self.SectionPointer)
-        s += self.ql.pack(self.CheckSum)
-        s += self.ql.pack(self.TimeDateStamp)
-        s += self.ql.pack(self.LoadedImports)
-        s += self.ql.pack(self.EntryPointActivationContext)
-        s += self.ql.pack(self.PatchInformation)
-        s += self.ql.pack(self.ForwarderLinks)
-        s += self.ql.pack(self.ServiceTagLinks)
-        s += self.ql.pack(self.StaticLinks)
-        s += self.ql.pack(self.ContextInformation)
-        s += self.ql.pack(self.OriginalBase)
-        s += self.ql.pack(self.LoadTime)
-
-        return s
+        return s + self.ql.pack(us['BufferPtr'])
@@ -10,18 +10,17 @@
 # CHEN huitao (null) <null@qiling.io>
 # YU tong (sp1ke) <spikeinhouse@gmail.com>
 
+import time
+
 from unicorn.x86_const import *
 from qiling.os.windows.utils import *
 from qiling.exception import *
 
 
+# hooked on THREAD_RET_ADDR only: the current thread returned from its start routine
 def thread_scheduler(uc, address, size, ql):
-    if ql.pc == ql.thread_manager.THREAD_RET_ADDR:
-        ql.thread_manager.current_thread.stop()
-        ql.thread_manager.do_schedule()
-    else:
-        ql.thread_manager.ins_count += 1
-        ql.thread_manager.do_schedule()
+    ql.thread_manager.current_thread.stop()
+    ql.thread_manager.need_schedule()
 
 
 class Context:
@@ -99,42 +98,115 @@ class Context:
 
 # A Simple Thread Manager
 class ThreadManager:
+    # instructions a thread runs before the next one is scheduled
     TIME_SLICE = 10
 
-    def __init__(self, ql, current_thread):
+    def __init__(self, ql, current_thread, time_slice = TIME_SLICE):
         self.ql = ql
+        self.time_slice = time_slice
         # main thread
         self.current_thread = current_thread
         self.threads = [self.current_thread]
-        self.ins_count = 0
+        # set when the current thread stopped or blocked before its slice ran out
+        self.switch = False
+        # return address of an api that asked for a switch, see set_return_address
+        self.return_address = None
+        self.thread_ret_hooked = False
         self.THREAD_RET_ADDR = self.ql.heap.mem_alloc(8)
         # write nop to THREAD_RET_ADDR
         self.ql.mem_write(self.THREAD_RET_ADDR, b"\x90"*8)
-        self.ql.hook_code(thread_scheduler, ql)
+
+    # nothing can return to THREAD_RET_ADDR before the first thread is created
+    def hook_thread_ret(self):
+        if not self.thread_ret_hooked:
+            self.ql.hook_code(thread_scheduler, self.ql, self.THREAD_RET_ADDR, self.THREAD_RET_ADDR)
+            self.thread_ret_hooked = True
 
     def append(self, thread):
+        self.hook_thread_ret()
         self.threads.append(thread)
+        # leave the unbounded emu_start of a single thread, slices are counted from now on
+        self.need_schedule()
 
+    # stop the current slice, e.g. the thread exited or waits for another one
     def need_schedule(self):
-        return self.current_thread.is_stop() or self.ins_count % ThreadManager.TIME_SLICE == 0
+        self.switch = True
+        self.ql.uc.emu_stop()
 
     def do_schedule(self):
-        if self.current_thread.is_stop() or self.ins_count % ThreadManager.TIME_SLICE == 0:
-            if len(self.threads) <= 1:
-                return
+        for i in range(1, len(self.threads)):
+            next_id = (self.current_thread.id + i) % len(self.threads)
+            next_thread = self.threads[next_id]
+            # find next thread
+            if next_thread.status == Thread.RUNNING and (not next_thread.has_waitfor()):
+                if not self.current_thread.is_stop():
+                    self.current_thread.suspend()
+                next_thread.resume()
+                self.current_thread = next_thread
+                return True
+        return False
+
+    def save(self):
+        saved_state = {}
+        saved_state["threads"] = [thread.save() for thread in self.threads]
+        saved_state["current_thread"] = self.threads.index(self.current_thread)
+        saved_state["thread_ret_hooked"] = self.thread_ret_hooked
+        return saved_state
+
+    def restore(self, saved_state):
+        saved_threads = saved_state["threads"]
+        # a hook added after the snapshot went with the other hooks of that run
+        self.thread_ret_hooked = saved_state["thread_ret_hooked"]
+        # threads created after the snapshot are dropped, missing ones created again
+        del self.threads[len(saved_threads):]
+        while len(self.threads) < len(saved_threads):
+            self.threads.append(Thread(self.ql))
+        if len(self.threads) > 1:
+            self.hook_thread_ret()
+
+        for thread, saved_thread in zip(self.threads, saved_threads):
+            thread.restore(saved_thread, self.threads)
+        self.current_thread = self.threads[saved_state["current_thread"]]
+        self.switch = False
+        self.return_address = None
+
+    # a single thread runs in one emu_start without any hook, several threads are
+    # switched every time_slice instructions through the count of emu_start
+    def run(self, begin, end, timeout=0):
+        pc = begin
+        deadline = time.time() + timeout / 1000000
+
+        while True:
+            if len(self.threads) > 1:
+                count = self.time_slice
             else:
-                for i in range(1, len(self.threads)):
-                    next_id = (self.current_thread.id + i) % len(self.threads)
-                    next_thread = self.threads[next_id]
-                    # find next thread
-                    if next_thread.status == Thread.RUNNING and (not next_thread.has_waitfor()):
-                        if self.current_thread.is_stop():
-                            pass
-                        else:
-                            self.current_thread.suspend()
-                        next_thread.resume()
-                        self.current_thread = next_thread
-                        break
+                count = 0
+
+            if timeout:
+                remain = int((deadline - time.time()) * 1000000)
+                if remain <= 0:
+                    break
+            else:
+                remain = 0
+
+            self.switch = False
+            self.ql.uc.emu_start(pc, end, remain, count)
+
+            if self.return_address is not None:
+                self.ql.pc = self.return_address
+                self.return_address = None
+
+            if not self.ql.RUN or self.ql.pc == end:
+                break
+
+            # an unbounded run only comes back by itself when emulation is over
+            if count == 0 and not self.switch:
+                break
+
+            if not self.do_schedule() and self.current_thread.is_stop():
+                break
+
+            pc = self.ql.pc
 
 
 class Thread:
@@ -194,6 +266,20 @@ class Thread:
     def is_stop(self):
         return self.status == Thread.TERMINATED
 
+    def save(self):
+        saved_state = {}
+        saved_state["id"] = self.id
+        saved_state["status"] = self.status
+        saved_state["context"] = dict((k, v) for k, v in self.context.__dict__.items() if k != "ql")
+        saved_state["waitforthreads"] = [self.ql.thread_manager.threads.index(thread) for thread in self.waitforthreads]
+        return saved_state
+
+    def restore(self, saved_state, threads):
+        self.id = saved_state["id"]
+        self.status = saved_state["status"]
+        self.context.__dict__.update(saved_state["context"])
+        self.waitforthreads = [threads[i] for i in saved_state["waitforthreads"]]
+
     def waitfor(self, thread):
         self.waitforthreads.append(thread)
 
@@ -85,24 +85,13 @@ def get_params(ql, number):
         return _x8664_get_args(ql, number)
 
 
-def read_cstring(ql, address):
-    result = ""
-    char = ql.uc.mem_read(address, 1)
-    while char.decode() != "\x00":
-        address += 1
-        result += char.decode()
-        char = ql.uc.mem_read(address, 1)
-    return result
-
-
-def read_wstring(ql, address):
-    result = ""
-    char = ql.uc.mem_read(address, 2)
-    while char.decode() != "\x00\x00":
-        address += 2
-        result += char.decode()
-        char = ql.uc.mem_read(address, 2)
-    return result
+def read_cstring(ql, address, cache = None):
+    return ql_read_terminated(ql.uc, address, 1, cache).decode()
+
+
+# the utf-16le code units are kept as they are, w2cstring() decodes them
+def read_wstring(ql, address, cache = None):
+    return ql_read_terminated(ql.uc, address, 2, cache).decode()
 
 
 def w2cstring(string):
@@ -42,6 +42,14 @@ def hook_winapi(uc, address, size, ql):
             print("[!]", e, "\t is not implemented")
 
 
+# only code inside the loaded dll images can reach an export, so bound the hook
+# to them instead of calling back into python for every guest instruction
+def ql_hook_winapi(ql):
+    # begin > end would make unicorn hook the whole address space
+    if ql.DLL_LAST_ADDR > ql.DLL_BASE_ADDR:
+        ql.hook_code(hook_winapi, ql, ql.DLL_BASE_ADDR, ql.DLL_LAST_ADDR - 1)
+
+
 def windows_setup64(ql):
 
     ql.GS_SEGMENT_ADDR = 0x6000
@@ -91,7 +99,8 @@ def loader_file(ql):
     ql.PE = PE(ql, ql.path)
     ql.PE.load()
 
-    ql.hook_code(hook_winapi, ql)
+    # hook win api
+    ql_hook_winapi(ql)
 
 def loader_shellcode(ql):
     uc = Uc(UC_ARCH_X86, UC_MODE_64)
@@ -111,7 +120,7 @@ def loader_shellcode(ql):
     ql.PE.load()
 
     # hook win api
-    ql.hook_code(hook_winapi, ql)
+    ql_hook_winapi(ql)
 
 
 def runner(ql):
@@ -120,16 +129,16 @@ def runner(ql):
         ql.until_addr = QL_X8664_WINSOWS_EMU_END
     try:
         if ql.shellcoder:
-            ql.uc.emu_start(ql.code_address, ql.code_address + len(ql.shellcoder))
+            ql.thread_manager.run(ql.code_address, ql.code_address + len(ql.shellcoder))
         else:
-            ql.uc.emu_start(ql.entry_point, ql.until_addr, ql.timeout)
+            ql.thread_manager.run(ql.entry_point, ql.until_addr, ql.timeout)
     except UcError as e:
         if ql.output in (QL_OUT_DEBUG, QL_OUT_DUMP):
             ql.nprint(">>> PC= " + hex(ql.pc))
             ql.show_map_info()
 
             buf = ql.uc.mem_read(ql.pc, 8)
-            ql.nprint(">>> ", [hex(_) for _ in buf])
+            ql.nprint(">>> %s", [hex(_) for _ in buf])
             ql_hook_code_disasm(ql.uc, ql.pc, 64, ql)
         ql.errmsg = 1
         ql.nprint("%s" % e)
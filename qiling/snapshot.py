@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+#
+# Cross Platform and Multi Architecture Advanced Binary Emulation Framework
+# Built on top of Unicorn emulator (www.unicorn-engine.org)
+#
+# LAU kaijern (xwings) <kj@qiling.io>
+# NGUYEN Anh Quynh <aquynh@gmail.com>
+# DING tianZe (D1iv3) <dddliv3@gmail.com>
+# SUN bowen (w1tcher) <w1tcher.bupt@gmail.com>
+# CHEN huitao (null) <null@qiling.io>
+# YU tong (sp1ke) <spikeinhouse@gmail.com>
+
+"""
+Emulator snapshots: cpu context, mapped memory, the fd table, the heap and
+thread manager of Windows targets and the threads of Linux ones, so a loaded
+emulator can be reused.
+"""
+
+import os, copy, pickle, bisect
+
+from unicorn import *
+
+from qiling.os.posix.filestruct import *
+from qiling.os.utils import ql_mem_map_file_release
+
+
+# loader and os bookkeeping that changes while the target runs
+QL_SNAPSHOT_ATTRS = ("brk_address", "brk_start", "mmap_start", "current_path", "RUN", "exit_code", "errmsg",
+                     "DLL_LAST_ADDR", "STRUCTERS_LAST_ADDR")
+
+
+def ql_save_fd(ql):
+    saved_fd = []
+    for f in ql.file_des:
+        if isinstance(f, ql_file):
+            try:
+                offset = f.lseek(0, os.SEEK_CUR)
+            except OSError:
+                offset = None
+            saved_fd.append((f, f.name, offset, f.flags, f.mode))
+        elif f:
+            saved_fd.append((f, None, None, None, None))
+        else:
+            saved_fd.append(None)
+    return saved_fd
+
+
+def ql_restore_fd(ql, saved_fd):
+    current = set(id(f) for f in ql.file_des)
+    file_des = []
+
+    for entry in saved_fd:
+        if entry == None:
+            file_des.append(0)
+            continue
+
+        f, path, offset, flags, mode = entry
+        # files closed since the snapshot, or saved to disk, are opened again by path
+        # with the flags they were opened with, short of truncating or creating anew
+        if id(f) not in current:
+            if path == None:
+                file_des.append(0)
+                continue
+            f = ql_file.open(path, flags & ~(os.O_TRUNC | os.O_EXCL), mode)
+
+        if offset != None:
+            f.lseek(offset)
+        file_des.append(f)
+
+    # files opened since the snapshot would leak otherwise
+    kept = set(id(f) for f in file_des)
+    for f in ql.file_des:
+        if f and id(f) not in kept and f not in (ql.stdin, ql.stdout, ql.stderr):
+            try:
+                f.close()
+            except OSError:
+                pass
+
+    ql.file_des = file_des
+
+
+def ql_save(ql):
+    saved_states = {}
+    saved_states["reg"] = ql.uc.context_save()
+    saved_states["mem"] = [(begin, end, perms, bytes(ql.uc.mem_read(begin, end - begin + 1)))
+                           for begin, end, perms in ql.uc.mem_regions()]
+    saved_states["map_info"] = ql.map_info.copy()
+    saved_states["attr"] = dict((attr, getattr(ql, attr)) for attr in QL_SNAPSHOT_ATTRS if hasattr(ql, attr))
+    saved_states["sigaction"] = list(ql.sigaction_act)
+    # hooks added after this, e.g. by run(), are removed again on restore
+    saved_states["hooks"] = len(ql.uc_hooks)
+
+    if ql.file_des:
+        saved_states["fd"] = ql_save_fd(ql)
+    if getattr(ql, "heap", None) != None:
+        saved_states["heap"] = ql.heap.save()
+    if getattr(ql, "thread_manager", None) != None:
+        saved_states["thread"] = ql.thread_manager.save()
+    # the linux thread manager is kept along with its state, run() may replace it
+    if ql.thread_management != None:
+        saved_states["thread_management"] = (ql.thread_management, ql.thread_management.save())
+    else:
+        saved_states["thread_management"] = None
+
+    return saved_states
+
+
+def ql_restore(ql, saved_states, mem = True):
+    if "hooks" in saved_states:
+        for h in ql.uc_hooks[saved_states["hooks"] : ]:
+            ql.uc.hook_del(h)
+        del ql.uc_hooks[saved_states["hooks"] : ]
+
+    if mem:
+        for begin, end, perms in list(ql.uc.mem_regions()):
+            ql.uc.mem_unmap(begin, end - begin + 1)
+        ql.mmap_ptrs = []
+
+        for begin, end, perms, data in saved_states["mem"]:
+            ql.uc.mem_map(begin, end - begin + 1, perms)
+            ql.uc.mem_write(begin, data)
+
+    ql.uc.context_restore(saved_states["reg"])
+    ql.map_info = saved_states["map_info"].copy()
+    for attr, value in saved_states["attr"].items():
+        setattr(ql, attr, value)
+    if "sigaction" in saved_states:
+        ql.sigaction_act = list(saved_states["sigaction"])
+
+    if "fd" in saved_states:
+        ql_restore_fd(ql, saved_states["fd"])
+    if "heap" in saved_states:
+        ql.heap.restore(saved_states["heap"])
+    if "thread" in saved_states:
+        ql.thread_manager.restore(saved_states["thread"])
+    if "thread_management" in saved_states:
+        if saved_states["thread_management"] != None:
+            thread_management, saved_thread_management = saved_states["thread_management"]
+            thread_management.restore(saved_thread_management)
+            ql.thread_management = thread_management
+        else:
+            ql.thread_management = None
+
+
+QL_PAGE_SIZE = 0x1000
+
+
+class QlCheckpoint:
+    """
+    Snapshot that is rolled back by rewriting only the pages written since. The
+    writable regions are write protected, the first guest write to a page faults
+    into __hook_write_prot which records the page and lifts the protection again.
+    Writes done by qiling itself go through ql.mem_write, which calls dirty().
+    Pages the guest unmaps, maps again or changes the protection of are reported
+    with remapped(): they are restored too and keep the guest's protection.
+    """
+    def __init__(self, ql):
+        self.ql = ql
+        self.saved_states = ql_save(ql)
+        self.regions = sorted(self.saved_states["mem"])
+        self.begins = [begin for begin, end, perms, data in self.regions]
+        self.dirty_pages = set()
+        # pages whose protection is the guest's, not the checkpoint's
+        self.protected = set()
+        self.hook = None
+
+    def start(self):
+        self.hook = self.ql.uc.hook_add(UC_HOOK_MEM_WRITE_PROT, self.__hook_write_prot)
+        for begin, end, perms, data in self.regions:
+            if perms & UC_PROT_WRITE:
+                self.ql.uc.mem_protect(begin, end - begin + 1, perms & ~UC_PROT_WRITE)
+
+    def stop(self):
+        if self.hook != None:
+            self.ql.uc.hook_del(self.hook)
+            self.hook = None
+        for begin, end, perms in list(self.ql.uc.mem_regions()):
+            region = self.__region(begin)
+            if not self.protected:
+                if region != None and region[2] != perms:
+                    self.ql.uc.mem_protect(begin, end - begin + 1, region[2])
+                continue
+
+            # give back the saved protection in runs, skipping the guest's pages
+            page = begin
+            while page <= end:
+                region = self.__region(page)
+                run = page
+                while page <= end and page not in self.protected and self.__region(page) is region:
+                    page += QL_PAGE_SIZE
+                if page > run and region != None and region[2] != perms:
+                    self.ql.uc.mem_protect(run, page - run, region[2])
+                if page == run:
+                    page += QL_PAGE_SIZE
+
+    # saved region holding address, None for memory mapped after the checkpoint
+    def __region(self, address):
+        i = bisect.bisect_right(self.begins, address) - 1
+        if i >= 0 and address <= self.regions[i][1]:
+            return self.regions[i]
+        return None
+
+    def dirty(self, address, size):
+        page = address & ~(QL_PAGE_SIZE - 1)
+        while page < address + size:
+            region = self.__region(page)
+            if region != None and region[2] & UC_PROT_WRITE:
+                self.dirty_pages.add(page)
+            page += QL_PAGE_SIZE
+
+    # the guest unmapped, mapped or protected [address, address + size) itself
+    def remapped(self, address, size):
+        page = address & ~(QL_PAGE_SIZE - 1)
+        while page < address + size:
+            if self.__region(page) != None:
+                self.dirty_pages.add(page)
+                self.protected.add(page)
+            page += QL_PAGE_SIZE
+
+    def __hook_write_prot(self, uc, access, address, size, value, user_data):
+        page = address & ~(QL_PAGE_SIZE - 1)
+        last = (address + size - 1) & ~(QL_PAGE_SIZE - 1)
+        handled = False
+        while page <= last:
+            region = self.__region(page)
+            # a real write to read-only memory, let unicorn report it
+            if region != None and region[2] & UC_PROT_WRITE and page not in self.protected:
+                self.dirty_pages.add(page)
+                uc.mem_protect(page, QL_PAGE_SIZE, region[2])
+                handled = True
+            page += QL_PAGE_SIZE
+        return handled
+
+    def rollback(self):
+        uc = self.ql.uc
+
+        # drop memory mapped since the checkpoint, map again what was unmapped
+        mapped = {}
+        for begin, end, perms in list(uc.mem_regions()):
+            region = self.__region(begin)
+            if region == None or end > region[1]:
+                uc.mem_unmap(begin, end - begin + 1)
+            else:
+                mapped[region[0]] = mapped.get(region[0], 0) + end - begin + 1
+
+        for begin, end, perms, data in self.regions:
+            if mapped.get(begin, 0) != end - begin + 1:
+                for b, e, p in list(uc.mem_regions()):
+                    if b >= begin and e <= end:
+                        uc.mem_unmap(b, e - b + 1)
+                uc.mem_map(begin, end - begin + 1, perms & ~UC_PROT_WRITE)
+                uc.mem_write(begin, data)
+
+        for page in self.dirty_pages:
+            begin, end, perms, data = self.__region(page)
+            uc.mem_write(page, data[page - begin : page - begin + QL_PAGE_SIZE])
+            uc.mem_protect(page, QL_PAGE_SIZE, perms & ~UC_PROT_WRITE)
+        self.dirty_pages = set()
+        self.protected = set()
+        ql_mem_map_file_release(self.ql)
+
+        ql_restore(self.ql, self.saved_states, mem = False)
+
+
+# open files and sockets can not leave the process, only the path and offset of
+# regular files is written so they are opened again on restore
+def ql_dump_snapshot(saved_states, snapshot):
+    saved_states = dict(saved_states)
+    if "fd" in saved_states:
+        saved_states["fd"] = [(None,) + entry[1:] if entry != None and entry[1] != None else None
+                              for entry in saved_states["fd"]]
+        # stdin, stdout and stderr stay with the restoring process
+        saved_states["fd"][:3] = [None] * 3
+    # hook handles belong to the emulator that saved them, and linux threads hold
+    # unicorn contexts that do not leave the process either
+    saved_states.pop("hooks", None)
+    saved_states.pop("thread_management", None)
+
+    with open(snapshot, "wb") as f:
+        pickle.dump(saved_states, f, pickle.HIGHEST_PROTOCOL)
+
+
+def ql_load_snapshot(ql, snapshot):
+    with open(snapshot, "rb") as f:
+        saved_states = pickle.load(f)
+
+    if "fd" in saved_states:
+        for i, f in enumerate(ql.file_des[:3]):
+            if f:
+                saved_states["fd"][i] = (f, None, None, None, None)
+
+    return saved_states
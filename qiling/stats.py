@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+#
+# Cross Platform and Multi Architecture Advanced Binary Emulation Framework
+# Built on top of Unicorn emulator (www.unicorn-engine.org)
+#
+# LAU kaijern (xwings) <kj@qiling.io>
+# NGUYEN Anh Quynh <aquynh@gmail.com>
+# DING tianZe (D1iv3) <dddliv3@gmail.com>
+# SUN bowen (w1tcher) <w1tcher.bupt@gmail.com>
+# CHEN huitao (null) <null@qiling.io>
+# YU tong (sp1ke) <spikeinhouse@gmail.com>
+
+"""
+Runtime counters: syscalls by number and handler, WinAPI calls, the wall time
+spent in their handlers, emulated blocks and instructions, the time spent in
+ql.run() and the allocator counters of the Windows heap. Read them with dump()
+or write them as a text exposition file with dump_text().
+"""
+
+import time, functools
+
+from unicorn import *
+
+from qiling.os.utils import *
+
+
+class QlStats:
+    def __init__(self, ql, blocks = True, path = None):
+        self.ql = ql
+        self.blocks = blocks
+        # dump_text() to path at the end of every ql.run()
+        self.path = path
+        # syscall number => [calls, seconds, handler name]
+        self.syscalls = {}
+        # api name => [calls, seconds]
+        self.winapi = {}
+        self.block_count = 0
+        self.instruction_count = 0
+        self.run_time = 0
+        # (address, size, mode) => instructions in the block
+        self.block_insns = {}
+        self.hook = None
+        # counting, between start() and stop()
+        self.running = False
+
+
+    def start(self):
+        self.running = True
+        if self.blocks:
+            self.hook = self.ql.uc.hook_add(UC_HOOK_BLOCK, self.__hook_block)
+        if self.ql.syscall_table != None:
+            self.hook_syscall_table()
+
+
+    def stop(self):
+        self.running = False
+        if self.hook != None:
+            self.ql.uc.hook_del(self.hook)
+            self.hook = None
+        ql_unwrap_syscall_table(self.ql, self)
+
+
+    # count and time syscalls by wrapping the handlers of ql.syscall_table
+    def hook_syscall_table(self):
+        if self.running:
+            ql_wrap_syscall_table(self.ql, self, self.__counted_syscall)
+
+
+    def __counted_syscall(self, syscall_num, func):
+        entry = self.syscalls.setdefault(syscall_num, [0, 0, func.__name__])
+        entry[2] = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(ql, uc, *args):
+            begin = time.perf_counter()
+            try:
+                return wrapper.ql_wrapped(ql, uc, *args)
+            finally:
+                entry[0] += 1
+                entry[1] += time.perf_counter() - begin
+        return wrapper
+
+
+    # called by the winapi decorator of qiling.os.windows.fncc
+    def winapi_call(self, name, seconds):
+        entry = self.winapi.get(name)
+        if entry is None:
+            entry = self.winapi[name] = [0, 0]
+        entry[0] += 1
+        entry[1] += seconds
+
+
+    def __hook_block(self, uc, address, size, user_data):
+        self.block_count += 1
+        self.instruction_count += ql_block_insns(self.ql, uc, address, size, self.block_insns)
+
+
+    def dump(self):
+        syscalls = dict((num, {"handler": name, "calls": calls, "seconds": seconds})
+                        for num, (calls, seconds, name) in self.syscalls.items() if calls)
+        handlers = {}
+        for num, (calls, seconds, name) in self.syscalls.items():
+            if calls:
+                entry = handlers.setdefault(name, {"calls": 0, "seconds": 0})
+                entry["calls"] += calls
+                entry["seconds"] += seconds
+
+        return {
+            "syscalls": syscalls,
+            "syscall_handlers": handlers,
+            "syscall_calls": sum(calls for calls, seconds, name in self.syscalls.values()),
+            "syscall_seconds": sum(seconds for calls, seconds, name in self.syscalls.values()),
+            "winapi": dict((name, {"calls": calls, "seconds": seconds}) for name, (calls, seconds) in self.winapi.items()),
+            "winapi_calls": sum(calls for calls, seconds in self.winapi.values()),
+            "winapi_seconds": sum(seconds for calls, seconds in self.winapi.values()),
+            "blocks": self.block_count,
+            "instructions": self.instruction_count,
+            "run_seconds": self.run_time,
+            "heap": self.__heap_stats(),
+        }
+
+
+    # allocator counters of the windows heap, empty for other targets
+    def __heap_stats(self):
+        heap = getattr(self.ql, "heap", None)
+        if heap == None:
+            return {}
+        stats = dict(heap.stats)
+        stats["mapped"] = heap.current_alloc
+        return stats
+
+
+    # one "name{labels} value" line per counter, in the text format of Prometheus
+    def dump_text(self, path):
+        lines = []
+
+        lines.append("# TYPE qiling_syscall_calls_total counter")
+        for num, (calls, seconds, name) in sorted(self.syscalls.items()):
+            if calls:
+                lines.append('qiling_syscall_calls_total{num="%d",handler="%s"} %d' % (num, name, calls))
+        lines.append("# TYPE qiling_syscall_seconds_total counter")
+        for num, (calls, seconds, name) in sorted(self.syscalls.items()):
+            if calls:
+                lines.append('qiling_syscall_seconds_total{num="%d",handler="%s"} %.9f' % (num, name, seconds))
+
+        lines.append("# TYPE qiling_winapi_calls_total counter")
+        for name, (calls, seconds) in sorted(self.winapi.items()):
+            lines.append('qiling_winapi_calls_total{api="%s"} %d' % (name, calls))
+        lines.append("# TYPE qiling_winapi_seconds_total counter")
+        for name, (calls, seconds) in sorted(self.winapi.items()):
+            lines.append('qiling_winapi_seconds_total{api="%s"} %.9f' % (name, seconds))
+
+        lines.append("# TYPE qiling_blocks_total counter")
+        lines.append("qiling_blocks_total %d" % self.block_count)
+        lines.append("# TYPE qiling_instructions_total counter")
+        lines.append("qiling_instructions_total %d" % self.instruction_count)
+        lines.append("# TYPE qiling_run_seconds_total counter")
+        lines.append("qiling_run_seconds_total %.9f" % self.run_time)
+
+        heap = self.__heap_stats()
+        if heap:
+            lines.append("# TYPE qiling_heap_operations_total counter")
+            for name in ("allocs", "frees", "failed_allocs", "bad_frees", "splits", "merges"):
+                lines.append('qiling_heap_operations_total{op="%s"} %d' % (name, heap[name]))
+            lines.append("# TYPE qiling_heap_bytes gauge")
+            for name in ("in_use", "peak_in_use", "mapped"):
+                lines.append('qiling_heap_bytes{kind="%s"} %d' % (name, heap[name]))
+
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+#
+# Cross Platform and Multi Architecture Advanced Binary Emulation Framework
+# Built on top of Unicorn emulator (www.unicorn-engine.org)
+#
+# LAU kaijern (xwings) <kj@qiling.io>
+# NGUYEN Anh Quynh <aquynh@gmail.com>
+# DING tianZe (D1iv3) <dddliv3@gmail.com>
+# SUN bowen (w1tcher) <w1tcher.bupt@gmail.com>
+# CHEN huitao (null) <null@qiling.io>
+# YU tong (sp1ke) <spikeinhouse@gmail.com>
+
+"""
+Binary execution trace. Every event is one fixed-width record
+
+    kind     uint32
+    size     uint32   block size in bytes, or memory access size
+    address  uint64   block start, syscall pc or accessed address
+    value    uint64   instructions in the block, syscall number or value written
+
+collected in an array and copied into a memory-mapped file behind a small header.
+ql_trace_load() maps the file back as a NumPy structured array.
+"""
+
+import mmap, struct, functools
+from array import array
+
+from unicorn import *
+
+from qiling.os.utils import *
+
+
+QL_TRACE_BLOCK      = 1
+QL_TRACE_SYSCALL    = 2
+QL_TRACE_MEM_READ   = 3
+QL_TRACE_MEM_WRITE  = 4
+
+QL_TRACE_MAGIC = b"QLTRACE1"
+QL_TRACE_HEADER = struct.Struct("<8sII")
+QL_TRACE_RECORD_SIZE = 24
+
+# records buffered in memory before they are copied into the file
+QL_TRACE_BUFFER_RECORDS = 0x10000
+
+
+class QlTrace:
+    def __init__(self, ql, path, mem = False):
+        self.ql = ql
+        self.path = path
+        self.mem = mem
+        self.buffer = array("Q")
+        self.hooks = []
+        # (address, size, mode) => instructions in the block
+        self.block_insns = {}
+        self.fd = open(path, "w+b")
+        self.fd.write(QL_TRACE_HEADER.pack(QL_TRACE_MAGIC, QL_TRACE_RECORD_SIZE, 0))
+        self.fd.flush()
+        self.offset = QL_TRACE_HEADER.size
+        self.map = None
+        self.map_size = 0
+
+
+    def start(self):
+        self.hooks.append(self.ql.uc.hook_add(UC_HOOK_BLOCK, self.__hook_block))
+        if self.mem:
+            self.hooks.append(self.ql.uc.hook_add(UC_HOOK_MEM_READ, self.__hook_mem, QL_TRACE_MEM_READ))
+            self.hooks.append(self.ql.uc.hook_add(UC_HOOK_MEM_WRITE, self.__hook_mem, QL_TRACE_MEM_WRITE))
+        if self.ql.syscall_table != None:
+            self.hook_syscall_table()
+
+
+    def stop(self):
+        for h in self.hooks:
+            self.ql.uc.hook_del(h)
+        self.hooks = []
+        ql_unwrap_syscall_table(self.ql, self)
+        self.close()
+
+
+    # record syscalls by wrapping the handlers of ql.syscall_table
+    def hook_syscall_table(self):
+        ql_wrap_syscall_table(self.ql, self, self.__traced_syscall)
+
+
+    def __traced_syscall(self, syscall_num, func):
+        @functools.wraps(func)
+        def wrapper(ql, uc, *args):
+            self.buffer.extend((QL_TRACE_SYSCALL, ql.pc, syscall_num))
+            if len(self.buffer) >= QL_TRACE_BUFFER_RECORDS * 3:
+                self.flush()
+            return wrapper.ql_wrapped(ql, uc, *args)
+        return wrapper
+
+
+    def __hook_block(self, uc, address, size, user_data):
+        insns = ql_block_insns(self.ql, uc, address, size, self.block_insns)
+        self.buffer.extend((QL_TRACE_BLOCK | size << 32, address, insns))
+        if len(self.buffer) >= QL_TRACE_BUFFER_RECORDS * 3:
+            self.flush()
+
+
+    def __hook_mem(self, uc, access, address, size, value, kind):
+        self.buffer.extend((kind | size << 32, address, value & 0xffffffffffffffff))
+        if len(self.buffer) >= QL_TRACE_BUFFER_RECORDS * 3:
+            self.flush()
+
+
+    # copy the buffered records into the mapped file
+    def flush(self):
+        if not self.buffer:
+            return
+
+        data = memoryview(self.buffer).cast("B")
+        end = self.offset + len(data)
+
+        if end > self.map_size:
+            if self.map != None:
+                self.map.close()
+            self.map_size = max(end, self.map_size * 2, mmap.ALLOCATIONGRANULARITY)
+            self.fd.truncate(self.map_size)
+            self.map = mmap.mmap(self.fd.fileno(), self.map_size)
+
+        self.map[self.offset : end] = data
+        self.offset = end
+        del data
+        self.buffer = array("Q")
+        self.map[: QL_TRACE_HEADER.size] = QL_TRACE_HEADER.pack(QL_TRACE_MAGIC, QL_TRACE_RECORD_SIZE,
+                (self.offset - QL_TRACE_HEADER.size) // QL_TRACE_RECORD_SIZE)
+
+
+    def close(self):
+        if self.fd == None:
+            return
+
+        self.flush()
+        if self.map != None:
+            self.map.close()
+            self.map = None
+        self.fd.truncate(self.offset)
+        self.fd.close()
+        self.fd = None
+
+
+def ql_trace_load(path):
+    """
+    Map a trace written by QlTrace as a NumPy structured array with the fields
+    kind, size, address and value.
+    """
+    import numpy
+
+    with open(path, "rb") as f:
+        magic, record_size, count = QL_TRACE_HEADER.unpack(f.read(QL_TRACE_HEADER.size))
+
+    if magic != QL_TRACE_MAGIC or record_size != QL_TRACE_RECORD_SIZE:
+        raise QlErrorBase("%s is not a qiling trace" % path)
+
+    dtype = numpy.dtype([("kind", "<u4"), ("size", "<u4"), ("address", "<u8"), ("value", "<u8")])
+    if count == 0:
+        return numpy.zeros(0, dtype = dtype)
+    return numpy.memmap(path, dtype = dtype, mode = "r", offset = QL_TRACE_HEADER.size, shape = (count,))
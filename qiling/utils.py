@@ -20,7 +20,15 @@ import sys
 from qiling.exception import *
 from qiling.arch.filetype import *
 
+# (ostype, arch, function_name) => function, resolved once per process
+QL_OS_MODULE_FUNCTIONS = {}
+
 def ql_get_os_module_function(ostype, arch, function_name):
+    key = (ostype, arch, function_name)
+    module_function = QL_OS_MODULE_FUNCTIONS.get(key)
+    if module_function is not None:
+        return module_function
+
     if not ql_is_valid_ostype(ostype):
         raise QlErrorOsType(f"Invalid OSType {ostype}")
 
@@ -28,7 +36,9 @@ def ql_get_os_module_function(ostype, arch, function_name):
         raise QlErrorArch(f"Invalid Arch {arch}")
 
     module_name = ql_build_module_import_name("os", ostype, arch)
-    return ql_get_module_function(module_name, function_name)
+    module_function = ql_get_module_function(module_name, function_name)
+    QL_OS_MODULE_FUNCTIONS[key] = module_function
+    return module_function
 
 def ql_get_arch_module_function(arch, function_name):
     if not ql_is_valid_arch(arch):
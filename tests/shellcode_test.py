@@ -1,4 +1,4 @@
-import unittest
+import unittest, struct
 from binascii import unhexlify
 from qiling import *
 from qiling.exception import *
@@ -12,6 +12,7 @@ X8664_WIN = unhexlify('fc4881e4f0ffffffe8d0000000415141505251564831d265488b52603
 ARM_LIN = unhexlify('01108fe211ff2fe102200121921a0f02193701df061c08a11022023701df3f270221301c01df0139fbd505a0921a05b469460b2701dfc046020012340a0002022f73797374656d2f62696e2f736800')
 ARM64_LIN = unhexlify('420002ca210080d2400080d2c81880d2010000d4e60300aa01020010020280d2681980d2010000d4410080d2420002cae00306aa080380d2010000d4210400f165ffff54e0000010420002ca210001caa81b80d2010000d4020004d27f0000012f62696e2f736800')
 X8664_FBSD = unhexlify('6a61586a025f6a015e990f054897baff02aaaa80f2ff524889e699046680c2100f05046a0f05041e4831f6990f0548976a035852488d7424f080c2100f0548b8523243427730637257488d3e48af74084831c048ffc00f055f4889d04889fe48ffceb05a0f0575f799043b48bb2f62696e2f2f73685253545f5257545e0f05')
+X8664_FUZZ = unhexlify('48c7c6000010018a063c4175054831d2880290')
 X8664_macos = unhexlify('4831f65648bf2f2f62696e2f7368574889e74831d24831c0b00248c1c828b03b0f05')
 
 class ShellcodeTest(unittest.TestCase):
@@ -65,6 +66,396 @@ class ShellcodeTest(unittest.TestCase):
         ql = Qiling(shellcoder = X8664_macos, archtype = "x8664", ostype = "macos", output = "off")
         ql.run()
 
+    def test_linux_x64_set_syscall(self):
+        print("Replacing a syscall handler")
+        called = []
+        def my_execve(ql, uc, pathname, argv, envp, null0, null1, null2):
+            called.append(pathname)
+        ql = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off")
+        ql.set_syscall(0x3b, my_execve)
+        ql.run()
+        self.assertEqual(len(called), 1)
+
+    def test_linux_x64_hook_address(self):
+        print("Hooking single addresses")
+        hit = []
+        def my_hook(ql):
+            hit.append(ql.pc)
+        ql = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off")
+        ql.hook_address(my_hook, ql.stack_address, ql.stack_address + 2)
+        ql.run()
+        self.assertEqual(hit, [ql.stack_address, ql.stack_address + 2])
+
+    def test_linux_x64_trace(self):
+        print("Binary block and syscall trace")
+        import os, struct, tempfile
+        from qiling.trace import QL_TRACE_HEADER, QL_TRACE_BLOCK, QL_TRACE_SYSCALL
+        from qiling.os.utils import ql_syscall_wrapped_by
+        path = os.path.join(tempfile.mkdtemp(), "shellcode.trace")
+        ql = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off")
+        ql.trace_start(path)
+        ql.run()
+        ql.trace_stop()
+        # a stopped trace gives the syscall handlers back
+        self.assertFalse(hasattr(ql.syscall_table[0x3b], "ql_wrapped"))
+        ql.trace_start(path + ".new")
+        self.assertTrue(ql_syscall_wrapped_by(ql.syscall_table[0x3b], ql.tracer))
+        ql.trace_stop()
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, record_size, count = QL_TRACE_HEADER.unpack_from(data)
+        self.assertEqual(len(data), QL_TRACE_HEADER.size + count * record_size)
+        records = [struct.unpack_from("<IIQQ", data, QL_TRACE_HEADER.size + i * record_size) for i in range(count)]
+        self.assertEqual(records[0][:3], (QL_TRACE_BLOCK, len(X8664_LIN), ql.stack_address))
+        self.assertEqual([r[3] for r in records if r[0] == QL_TRACE_SYSCALL], [0x3b])
+
+    def test_linux_x64_save_restore(self):
+        print("Saving and restoring a snapshot")
+        import os, tempfile
+        path = os.path.join(tempfile.mkdtemp(), "shellcode.snapshot")
+        ql = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off")
+        saved_states = ql.save(snapshot = path)
+        ql.mem_write(ql.stack_address, b"\x90" * len(X8664_LIN))
+        ql.restore(saved_states)
+        self.assertEqual(bytes(ql.mem_read(ql.stack_address, len(X8664_LIN))), X8664_LIN)
+        ql.mem_write(ql.stack_address, b"\x90" * len(X8664_LIN))
+        ql.restore(snapshot = path)
+        self.assertEqual(bytes(ql.mem_read(ql.stack_address, len(X8664_LIN))), X8664_LIN)
+        ql.run()
+
+    def test_linux_x64_restore_run(self):
+        print("Running again after a restore")
+        import os
+        from qiling.os.posix.syscall import ql_syscall_write
+        rootfs = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "rootfs", "x8664_linux")
+        written = []
+        def my_write(ql, uc, write_fd, write_buf, write_count, null0, null1, null2):
+            written.append(bytes(ql.mem_read(write_buf, write_count)))
+            ql_syscall_write(ql, uc, write_fd, write_buf, write_count, null0, null1, null2)
+        ql = Qiling([os.path.join(rootfs, "bin", "x8664_hello")], rootfs, output = "off")
+        ql.set_syscall(1, my_write)
+        saved_states = ql.save()
+        hooks = len(ql.uc_hooks)
+        ql.run()
+        ql.restore(saved_states)
+        self.assertEqual(len(ql.uc_hooks), hooks)
+        ql.run()
+        self.assertEqual(written, [b"Hello, World!\n"] * 2)
+
+    def test_linux_x86_restore_threads(self):
+        print("Snapshot of linux threads")
+        from qiling.os.linux import thread as linux_thread
+        from qiling.os.linux.thread import Thread, ThreadManagement
+        ql = Qiling(shellcoder = X86_LIN, archtype = "x86", ostype = "linux", output = "off")
+        no_threads = ql.save()
+        thread_management = ThreadManagement(ql)
+        ql.thread_management = thread_management
+        main_thread = Thread(ql, thread_management)
+        thread_management.set_main_thread(main_thread)
+        saved_states = ql.save()
+        thread_id = linux_thread.GLOBAL_THREAD_ID
+        # what a run changes: tids handed out, threads added and stopped, a new manager
+        main_thread.set_clear_child_tid_addr(ql.stack_address)
+        main_thread.stop()
+        thread_management.add_running_thread(Thread(ql, thread_management))
+        ql.thread_management = ThreadManagement(ql)
+        ql.restore(saved_states)
+        self.assertIs(ql.thread_management, thread_management)
+        self.assertEqual(thread_management.running_thread_list, [main_thread])
+        self.assertTrue(main_thread.is_running())
+        self.assertEqual(main_thread.clear_child_tid_address, None)
+        self.assertEqual(linux_thread.GLOBAL_THREAD_ID, thread_id)
+        ql.restore(no_threads)
+        self.assertEqual(ql.thread_management, None)
+
+    def test_linux_x64_restore_fd(self):
+        print("Snapshot of an open file")
+        import os, fcntl, tempfile
+        from qiling.os.posix.filestruct import ql_file
+        tmp = tempfile.mkdtemp()
+        path = os.path.join(tmp, "shellcode.snapshot")
+        log = os.path.join(tmp, "append.log")
+        ql = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off")
+        ql.file_des[3] = ql_file.open(log, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_TRUNC, 0o600)
+        ql.file_des[3].write(b"abc")
+        ql.save(snapshot = path)
+        ql.file_des[3].close()
+        ql.file_des[3] = 0
+        ql.restore(snapshot = path)
+        f = ql.file_des[3]
+        self.assertEqual(fcntl.fcntl(f.fileno(), fcntl.F_GETFL) & (os.O_ACCMODE | os.O_APPEND), os.O_WRONLY | os.O_APPEND)
+        f.lseek(0)
+        f.write(b"def")
+        f.close()
+        with open(log, "rb") as data:
+            self.assertEqual(data.read(), b"abcdef")
+
+    def test_linux_x64_checkpoint(self):
+        print("Checkpoint and rollback of a run")
+        ql = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off")
+        ql.checkpoint()
+        ql.mem_write(ql.stack_address, b"\x90" * len(X8664_LIN))
+        ql.run()
+        ql.rollback()
+        self.assertEqual(bytes(ql.mem_read(ql.stack_address, len(X8664_LIN))), X8664_LIN)
+        ql.run()
+        ql.rollback()
+        self.assertEqual(bytes(ql.mem_read(ql.stack_address, len(X8664_LIN))), X8664_LIN)
+
+    def test_linux_x64_checkpoint_stack(self):
+        print("Rollback of stack writes")
+        ql = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off")
+        ql.sp = ql.stack_address - 0x100
+        ql.stack_write(0, 0x4343434343434343)
+        ql.checkpoint()
+        original = ql.stack_read(0)
+        below = bytes(ql.mem_read(ql.sp - 8, 8))
+        ql.stack_write(0, 0x4141414141414141)
+        ql.stack_push(0x4242424242424242)
+        self.assertEqual(ql.stack_read(8), 0x4141414141414141)
+        ql.rollback()
+        self.assertEqual(ql.stack_read(0), original)
+        self.assertEqual(bytes(ql.mem_read(ql.sp - 8, 8)), below)
+
+    def test_linux_x64_fuzz(self):
+        print("Fuzzing a compare in shellcode")
+        import random
+        from qiling.fuzz import QlFuzzer
+        def place_input(ql, data):
+            ql.mem_write(0x1100000, data + b"\x00")
+        ql = Qiling(shellcoder = X8664_FUZZ, archtype = "x8664", ostype = "linux", output = "off")
+        fuzzer = QlFuzzer(ql, ql.stack_address + 7, ql.stack_address + len(X8664_FUZZ), place_input, seeds = [b"B"])
+        fuzzer.start()
+        self.assertEqual(fuzzer.run_one(b"B"), None)
+        self.assertNotEqual(fuzzer.run_one(b"A"), None)
+        self.assertEqual(fuzzer.run_one(b"B"), None)
+        random.seed(0)
+        fuzzer.run(iterations = 3000)
+        self.assertEqual(len(fuzzer.crashes), 1)
+
+    def test_linux_x64_coverage(self):
+        print("Block coverage bitmap")
+        import os, tempfile
+        path = os.path.join(tempfile.mkdtemp(), "shellcode.drcov")
+        ql = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off")
+        ql.insert_map_info(ql.stack_address, ql.stack_address + len(X8664_LIN), "shellcode")
+        ql.coverage_start()
+        ql.run()
+        ql.coverage_stop()
+        self.assertEqual(ql.coverage.blocks, {ql.stack_address: len(X8664_LIN)})
+        self.assertEqual(sum(ql.coverage.bitmap), 1)
+        ql.coverage.dump_drcov(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        self.assertTrue(data.startswith(b"DRCOV VERSION: 2\n"))
+        self.assertTrue(data.endswith(b"BB Table: 1 bbs\n" + struct.pack("<IHH", 0, len(X8664_LIN), 0)))
+
+    def test_linux_x64_stats(self):
+        print("Syscall and instruction stats")
+        import os, tempfile
+        path = os.path.join(tempfile.mkdtemp(), "shellcode.prom")
+        ql = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off")
+        ql.stats_start(path = path)
+        ql.run()
+        stats = ql.stats.dump()
+        self.assertEqual(stats["syscalls"][0x3b]["calls"], 1)
+        self.assertEqual(stats["syscall_handlers"]["ql_syscall_execve"]["calls"], 1)
+        self.assertEqual(stats["blocks"], 1)
+        self.assertEqual(stats["instructions"], 13)
+        with open(path) as f:
+            self.assertIn('qiling_syscall_calls_total{num="59",handler="ql_syscall_execve"} 1\n', f.read())
+        # stopped counters stay as they are, new ones count from zero
+        old = ql.stats
+        ql.stats_stop()
+        self.assertFalse(hasattr(ql.syscall_table[0x3b], "ql_wrapped"))
+        ql.stats_start()
+        self.assertEqual(ql.syscall_table[0x3b].ql_wrapper_owner, ql.stats)
+        ql.run()
+        self.assertGreaterEqual(ql.stats.dump()["syscalls"][0x3b]["calls"], 1)
+        self.assertEqual(old.dump()["syscalls"][0x3b]["calls"], 1)
+
+    def test_linux_x64_reset(self):
+        print("Reset between runs")
+        called = []
+        def my_execve(ql, uc, pathname, argv, envp, null0, null1, null2):
+            called.append(pathname)
+        ql = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off", reusable = True)
+        other = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off")
+        self.assertIsNot(ql.sigaction_act, other.sigaction_act)
+        self.assertEqual(len(ql.sigaction_act), 256)
+        ql.set_syscall(0x3b, my_execve)
+        ql.run()
+        hooks = len(ql.uc_hooks)
+        ql.mem_write(ql.stack_address, b"\x90" * len(X8664_LIN))
+        ql.reset()
+        self.assertEqual(bytes(ql.mem_read(ql.stack_address, len(X8664_LIN))), X8664_LIN)
+        ql.run()
+        self.assertEqual(len(ql.uc_hooks), hooks)
+        self.assertEqual(len(called), 2)
+
+    def test_linux_x64_map_info(self):
+        print("Memory map bookkeeping")
+        ql = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off")
+        ql.insert_map_info(0x1000, 0x5000, "[a]")
+        ql.insert_map_info(0x5000, 0x6000, "[a]")
+        ql.insert_map_info(0x2000, 0x3000, "[b]")
+        self.assertEqual(list(ql.map_info), [(0x1000, 0x2000, "[a]"), (0x2000, 0x3000, "[b]"), (0x3000, 0x6000, "[a]")])
+        self.assertEqual(ql.mem_region_at(0x2fff), (0x2000, 0x3000, "[b]"))
+        self.assertEqual(ql.mem_region_at(0x5800), (0x3000, 0x6000, "[a]"))
+        self.assertEqual(ql.mem_region_at(0x6000), None)
+        ql.insert_map_info(0x2000, 0x3000, "[a]")
+        self.assertEqual(list(ql.map_info), [(0x1000, 0x6000, "[a]")])
+
+    def test_linux_x64_mem_map_file(self):
+        print("Mapping files into memory")
+        import tempfile
+        from qiling.os.utils import ql_mem_map_file, ql_mem_map_file_release
+        ql = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off")
+        data = bytes(range(256)) * 0x21
+        with tempfile.TemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            self.assertEqual(ql_mem_map_file(ql, ql.uc, 0x10000000, len(data), f.fileno(), 0), 0x2000)
+            self.assertEqual(bytes(ql.mem_read(0x10000000, 0x2000)), data[ : 0x2000])
+            ql.mem_write(0x10000000, b"\x90" * 4)
+            f.seek(0)
+            self.assertEqual(f.read(4), data[ : 4])
+        self.assertEqual(len(ql.mmap_ptrs), 1)
+        ql.uc.mem_unmap(0x10000000, 0x2000)
+        ql_mem_map_file_release(ql)
+        self.assertEqual(ql.mmap_ptrs, [])
+
+    def test_linux_x64_mem_map_image(self):
+        print("Sharing loaded images")
+        import os, tempfile
+        from qiling.os.utils import ql_mem_map_image
+        data = bytes(range(256)) * 0x18
+        with tempfile.TemporaryDirectory() as d:
+            prefix = os.path.join(d, "kernel32.dll")
+            for i in range(2):
+                ql = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off")
+                self.assertEqual(ql_mem_map_image(ql, ql.uc, 0x10000000, data, prefix), 0x2000)
+                self.assertEqual(bytes(ql.mem_read(0x10000000, len(data))), data)
+                self.assertEqual(bytes(ql.mem_read(0x10000000 + len(data), 0x800)), b"\x00" * 0x800)
+                # written pages are private to the emulator
+                ql.mem_write(0x10000000, b"\x90" * 4)
+            images = os.listdir(d)
+            self.assertEqual(len(images), 1)
+            with open(os.path.join(d, images[0]), "rb") as f:
+                self.assertEqual(f.read(4), data[ : 4])
+
+    def test_linux_x64_vma(self):
+        print("mmap, munmap and mprotect areas")
+        from unicorn import UC_PROT_READ, UC_PROT_WRITE
+        from qiling.os.posix.vma import ql_vma_find_free, ql_vma_map, ql_vma_unmap, ql_vma_protect
+        ql = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off")
+        ql.mmap_start = 0x10000000
+        address = ql_vma_find_free(ql, 0x3000)
+        self.assertEqual(address, 0x10000000)
+        ql_vma_map(ql, address, 0x3000, UC_PROT_READ | UC_PROT_WRITE, "[anon]")
+        self.assertEqual(ql_vma_find_free(ql, 0x1000), address + 0x3000)
+        ql.mem_write(address, b"A" * 0x3000)
+        ql.checkpoint()
+        self.assertTrue(ql_vma_protect(ql, address + 0x1000, 0x1000, UC_PROT_READ))
+        self.assertFalse(ql_vma_protect(ql, address + 0x2000, 0x2000, UC_PROT_READ))
+        ql_vma_unmap(ql, address + 0x2000, 0x1000)
+        self.assertEqual(ql_vma_find_free(ql, 0x1000), address + 0x2000)
+        self.assertEqual(ql.mem_region_at(address + 0x2000), None)
+        ql.rollback()
+        self.assertEqual(bytes(ql.mem_read(address, 0x3000)), b"A" * 0x3000)
+        self.assertEqual(ql.mem_region_at(address + 0x2000), (address, address + 0x3000, "[anon]"))
+        ql.checkpointer.stop()
+        perms = [p for b, e, p in ql.uc.mem_regions() if address <= b < address + 0x3000]
+        self.assertEqual(set(perms), {UC_PROT_READ | UC_PROT_WRITE})
+
+    def test_linux_x64_read_string(self):
+        print("Reading strings from memory")
+        from qiling.os.utils import ql_read_string, ql_read_terminated
+        ql = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off")
+        # across a page boundary
+        address = ql.stack_address - 5
+        ql.mem_write(address, b"/bin/sh\x00")
+        self.assertEqual(ql_read_string(ql, ql.uc, address), "/bin/sh")
+        ql.mem_write(address, "sh".encode("utf-16le") + b"\x00\x00")
+        self.assertEqual(ql_read_terminated(ql.uc, address, 2), b"s\x00h\x00")
+        strings = {}
+        ql_read_terminated(ql.uc, address, 2, strings)
+        self.assertEqual(strings, {(address, 2): b"s\x00h\x00"})
+
+    def test_linux_x64_mem_many(self):
+        print("Batched memory reads and writes")
+        ql = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off")
+        address = ql.stack_address - 0x2000
+        # the later write wins where they overlap
+        ql.mem_write_many([(address + 4, b"efgh"), (address, b"abcd"), (address + 6, b"XY"), (address + 0x1800, b"z")])
+        self.assertEqual(ql.mem_read_many([(address + 0x1800, 1), (address, 8), (address + 2, 0)]), [b"z", b"abcdefXY", b""])
+        ql.mem_write_ptrs(address, [address + 0x10, address + 0x20, 0])
+        self.assertEqual(ql.mem_read_ptrs(address, 2), (address + 0x10, address + 0x20))
+        self.assertEqual(ql.mem_read_ptr_list(address), (address + 0x10, address + 0x20))
+
+    def test_linux_x64_mem_search(self):
+        print("Searching memory")
+        import re
+        ql = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off")
+        address = ql.stack_address - 0x3000
+        ql.mem_write(address + 0xffe, b"KEY=1234;")
+        ql.mem_write(address + 0x2000, b"KEY=99;")
+        regions = [(address, address + 0x3000)]
+        # small chunks, the first match crosses from one into the next
+        self.assertEqual(list(ql.mem_search(b"KEY=", regions, chunk_size = 0x1000)), [address + 0xffe, address + 0x2000])
+        self.assertEqual(list(ql.mem_search(re.compile(rb"KEY=\d+;"), regions, chunk_size = 0x1000)), [address + 0xffe, address + 0x2000])
+        self.assertIn(address + 0x2000, ql.mem_search(b"KEY=99;"))
+        self.assertEqual(list(ql.mem_search(b"KEY=", [(address + 0x1000, address + 0x2000)])), [])
+        # bytes overlap, regex matches do not, not even across chunks
+        ql.mem_write(address + 0x2800, b"ZZZZ")
+        self.assertEqual(list(ql.mem_search(b"ZZ", regions)), [address + 0x2800, address + 0x2801, address + 0x2802])
+        self.assertEqual(list(ql.mem_search("ZZ", regions)), [address + 0x2800, address + 0x2802])
+        self.assertEqual(list(ql.mem_search("Z+", regions, chunk_size = 0x1401)), [address + 0x2800])
+        # a regex matching at every offset of a zeroed megabyte
+        zeros = [(ql.stack_address - 0x1f0000, ql.stack_address - 0xf0000)]
+        self.assertEqual(list(ql.mem_search(re.compile(rb"\x00+"), zeros)), [zeros[0][0]])
+        self.assertEqual(len(list(ql.mem_search(re.compile(rb"\x00"), zeros))), 0x100000)
+
+    def test_linux_x64_elf_parse(self):
+        print("Parsing ELF headers")
+        import os
+        from qiling.loader.elf import ELFParse, PT_INTERP, PT_LOAD
+        rootfs = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "rootfs")
+        ql = Qiling(shellcoder = X8664_LIN, archtype = "x8664", ostype = "linux", output = "off")
+        elf = ELFParse(os.path.join(rootfs, "x8664_linux", "bin", "x8664_hello"), ql)
+        self.assertEqual(elf.shdrs, None)
+        interp = [P for P in elf.parse_program_header(ql) if P['p_type'] == PT_INTERP][0]
+        self.assertEqual(elf.getelfdata(interp['p_offset'], interp['p_filesz']), b"/lib64/ld-linux-x86-64.so.2\x00")
+        self.assertEqual(elf.get_section(".interp")['data'], b"/lib64/ld-linux-x86-64.so.2\x00")
+        self.assertEqual(elf.get_section(".text")['sh_addr'], elf.parse_header(ql)['e_entry'])
+        elf.close()
+        libc = ELFParse(os.path.join(rootfs, "x8664_linux", "lib", "libc.so.6"), ql)
+        self.assertEqual(libc.get_symbol("puts")['st_size'], 512)
+        libc.close()
+        # 45 bytes, the program header overlaps the ELF header
+        ql = Qiling(shellcoder = X86_LIN, archtype = "x86", ostype = "linux", output = "off")
+        tiny = ELFParse(os.path.join(rootfs, "x86_linux", "bin", "tiny-i386"), ql)
+        self.assertEqual([P['p_type'] for P in tiny.parse_program_header(ql)], [PT_LOAD])
+        tiny.close()
+
+    def test_log_write_error(self):
+        print("Log output that can not be written")
+        import threading
+        from qiling.log import QlLogWriter
+        class FullDisk:
+            def write(self, line):
+                raise OSError(28, "No space left on device")
+            def flush(self):
+                pass
+        writer = QlLogWriter()
+        writer.put(FullDisk(), "lost\n")
+        # flush() comes back once the writer gave up on the line
+        flushed = threading.Thread(target = writer.flush, daemon = True)
+        flushed.start()
+        flushed.join(10)
+        self.assertFalse(flushed.is_alive())
+        self.assertRaises(OSError, writer.put, FullDisk(), "lost\n")
+
     def test_invalid_os(self):
         print("Testing Unknown OS")
         self.assertRaises(QlErrorOsType,  Qiling, shellcoder = test, archtype = "arm64", ostype = "qilingos", output = "default" )
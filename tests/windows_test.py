@@ -0,0 +1,56 @@
+import unittest
+import sys
+sys.path.append("..")
+from unicorn import *
+from qiling.arch.filetype import *
+from qiling.os.windows.memory import Heap
+
+# the heap only needs the arch and the unicorn of a Qiling, the Windows loader
+# needs the dlls of a rootfs on top
+class HeapHost:
+    def __init__(self, arch):
+        self.arch = arch
+        self.uc = Uc(UC_ARCH_X86, UC_MODE_32 if arch == QL_X86 else UC_MODE_64)
+
+class WindowsHeapTest(unittest.TestCase):
+    def setUp(self):
+        self.heap = Heap(HeapHost(QL_X8664), 0x5000000, 0x5000000 + 0x100000)
+
+    def test_heap_merge_split(self):
+        print("Windows heap merge and split of free chunks")
+        heap = self.heap
+        a, b, c = heap.mem_alloc(0x100), heap.mem_alloc(0x100), heap.mem_alloc(0x100)
+        self.assertEqual((b - a, c - b), (0x100, 0x100))
+        self.assertTrue(heap.mem_free(a))
+        self.assertTrue(heap.mem_free(b))
+        self.assertFalse(heap.mem_free(b))
+        self.assertEqual(heap.stats["merges"], 1)
+        # the merged chunk is split for a smaller allocation
+        self.assertEqual(heap.mem_alloc(0x80), a)
+        self.assertEqual(heap.mem_alloc(0x180), a + 0x80)
+        self.assertEqual(heap.mem_size(a + 0x80), 0x180)
+        self.assertEqual(heap.mem_alloc(0x200000), 0)
+        self.assertEqual(heap.stats["in_use"], 0x300)
+
+    def test_heap_save_restore(self):
+        print("Windows heap save and restore")
+        heap = self.heap
+        a = heap.mem_alloc(0x100)
+        saved = heap.save()
+        heap.mem_free(a)
+        heap.mem_alloc(0x40)
+        heap.restore(saved)
+        self.assertEqual(heap.stats["in_use"], 0x100)
+        self.assertEqual(heap.mem_size(a), 0x100)
+        self.assertFalse(heap.mem_free(a + 0x100))
+
+    def test_heap_x86(self):
+        print("Windows heap on x86")
+        heap = Heap(HeapHost(QL_X86), 0x5000000, 0x5000000 + 0x100000)
+        a, b = heap.mem_alloc(3), heap.mem_alloc(1)
+        # sizes are rounded up to the pointer size
+        self.assertEqual(b - a, 4)
+        self.assertEqual(heap.mem_size(a), 4)
+
+if __name__ == "__main__":
+    unittest.main()